@@ -1,25 +1,32 @@
-from . import (
-    applications,
-    connection,
-    layout,
-    layout_creation,
-    layout_files,
-    main,
-    marks,
-    matching,
-    notifications,
-    utils,
-)
+import importlib
+from types import ModuleType
 
 __all__ = [
     "applications",
+    "autosave",
+    "client",
     "connection",
+    "daemon",
+    "dbus",
+    "forwarding",
+    "launch_history",
     "layout",
+    "layout_cache",
     "layout_files",
     "layout_creation",
     "main",
     "marks",
     "matching",
     "notifications",
+    "processes",
+    "snapshots",
     "utils",
 ]
+
+
+def __getattr__(name: str) -> ModuleType:
+    # The submodules are imported on first use, so that the client does not
+    # import the dependencies of the others.
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
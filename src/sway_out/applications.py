@@ -2,17 +2,32 @@
 
 import logging
 import time
+from collections.abc import Generator
 
-from i3ipc import Con, Connection
+from i3ipc import Con, WindowEvent
 
-from .connection import check_replies
+from .connection import (
+    AsyncConnection,
+    SwayConnection,
+    SyncConnectionAdapter,
+    check_replies,
+    run_sync,
+)
+from .launch_history import LaunchHistory
 from .layout_files import (
     ApplicationLaunchConfig,
     ContainerConfig,
     WindowMatchExpression,
     WorkspaceLayout,
+    get_launch_configs,
+)
+from .matching import (
+    WindowIndex,
+    find_current_workspace_async,
+    find_windows_on_workspace,
+    get_matcher,
+    is_window_matching,
 )
-from .matching import find_current_workspace, find_windows_on_workspace
 from .utils import get_con_description
 
 logger = logging.getLogger(__name__)
@@ -20,12 +35,18 @@ logger = logging.getLogger(__name__)
 LAUNCH_TIMEOUT_SECONDS = 10
 """How long to wait for the application to launch before giving up.
 
+This is the timeout for applications without enough launches in the
+[LaunchHistory][sway_out.launch_history.LaunchHistory].
+
 See also:
   - [wait_for_window][sway_out.applications.wait_for_window]
 """
 
 LAUNCH_CHECK_INTERVAL_SECONDS = 0.5
-"""How long to wait between checks for the application window.
+"""How long to wait between checks of the tree for the application window.
+
+New windows are normally detected through `window` events. Checking the tree
+is only a fallback in case an event is missed or events are not available.
 
 See also:
   - [wait_for_window][sway_out.applications.wait_for_window]
@@ -38,6 +59,15 @@ def match_existing_windows(workspace: Con, layout: WorkspaceLayout) -> None:
     This function updates the con_id of the launch configurations in the layout
     to match existing windows on the current workspace.
 
+    All launch configurations are matched at once as a minimum-cost bipartite
+    assignment. As many launch configurations as possible get a window, so
+    that as few applications as possible have to be launched. Among those
+    assignments, windows preferably go to the most specific match expression,
+    i.e. the one matching the fewest windows or with the longest literal
+    parts. Windows also preferably go to launch configurations at the same
+    position in the layout as the window in the tree, so that fewer windows
+    have to be moved.
+
     Parameters:
         workspace: The workspace to search for existing windows.
         layout: The layout containing the applications to match.
@@ -46,36 +76,152 @@ def match_existing_windows(workspace: Con, layout: WorkspaceLayout) -> None:
         This function modifies its argument.
     """
 
-    def match_element(
-        element_layout: ApplicationLaunchConfig | ContainerConfig,
-    ) -> None:
-        if isinstance(element_layout, ApplicationLaunchConfig):
-            matching_windows = [
-                con
-                for con in find_windows_on_workspace(element_layout.match, workspace)
-                if con.id not in matched_con_ids
-            ]
-            if matching_windows:
-                con = matching_windows[0]
-                element_layout._con_id = con.id
-                matched_con_ids.add(con.id)
-                logger.info(f"Matched existing window {get_con_description(con)}")
-            else:
-                logger.debug(f"No matching window found for {element_layout.cmd}")
+    launch_configs = list(get_launch_configs(layout))
+    windows = _get_windows_in_tree_order(workspace)
+    index = WindowIndex(windows)
+    positions = {window.id: position for position, window in enumerate(windows)}
+
+    # Build the candidate graph with a column per window that matches anything.
+    candidates = [index.find(config.match) for config in launch_configs]
+    columns = list({w.id: w for matches in candidates for w in matches}.values())
+    column_indices = {window.id: column for column, window in enumerate(columns)}
+
+    # Rank the launch configurations by specificity: match expressions that
+    # match fewer windows come first, ties are broken by the expressions.
+    specificity_keys = [
+        (len(matches), -get_matcher(config.match).specificity)
+        for config, matches in zip(launch_configs, candidates)
+    ]
+    specificity_ranks = {
+        key: rank for rank, key in enumerate(sorted(set(specificity_keys)))
+    }
+
+    # The position costs of all launch configurations together are smaller
+    # than a step in specificity, and the specificity costs of all of them are
+    # smaller than leaving a launch configuration without a window. So the
+    # total cost compares the assignments like a tuple of these criteria.
+    max_position_cost = max(len(launch_configs), len(windows))
+    specificity_weight = len(launch_configs) * max_position_cost + 1
+    unmatched_cost = (
+        len(launch_configs) * specificity_weight * (len(launch_configs) + 1)
+    )
+    costs: list[list[int | None]] = []
+    for config_position, matches in enumerate(candidates):
+        specificity_cost = (
+            specificity_ranks[specificity_keys[config_position]] * specificity_weight
+        )
+        row: list[int | None] = [None] * len(columns)
+        for window in matches:
+            row[column_indices[window.id]] = specificity_cost + abs(
+                positions[window.id] - config_position
+            )
+        # Every launch configuration can stay without a window.
+        row.extend([unmatched_cost] * len(launch_configs))
+        costs.append(row)
+
+    assignment = _solve_assignment(costs)
+
+    matched_count = 0
+    for config, column in zip(launch_configs, assignment):
+        if column < len(columns):
+            con = columns[column]
+            config._con_id = con.id
+            matched_count += 1
+            logger.info(f"Matched existing window {get_con_description(con)}")
         else:
-            assert isinstance(element_layout, ContainerConfig)
-            for child in element_layout.children:
-                match_element(child)
+            logger.debug(f"No matching window found for {config.cmd}")
 
-    matched_con_ids: set[int] = set()
+    logger.debug(f"Matched {matched_count} existing windows in the layout")
 
-    for child in layout.children:
-        match_element(child)
 
-    logger.debug(f"Matched {len(matched_con_ids)} existing windows in the layout")
+def _get_windows_in_tree_order(con: Con) -> list[Con]:
+    """Get the tiled windows below a container in depth-first order."""
+
+    if not con.nodes:
+        return [con] if con.type == "con" else []
+    return [
+        window for child in con.nodes for window in _get_windows_in_tree_order(child)
+    ]
+
+
+def _solve_assignment(costs: list[list[int | None]]) -> list[int]:
+    """Solve a rectangular assignment problem with the Hungarian algorithm.
+
+    Parameters:
+        costs: The cost of assigning each row to each column, `None` if the row
+            cannot be assigned to the column. There have to be at least as
+            many columns as rows and every row has to have a feasible column.
 
+    Returns:
+        The column assigned to each row such that the total cost is minimal.
+    """
 
-def launch_applications_from_layout(connection: Connection, layout: WorkspaceLayout):
+    row_count = len(costs)
+    if not row_count:
+        return []
+    column_count = len(costs[0])
+    assert column_count >= row_count, "There have to be at least as many columns"
+    infinity = float("inf")
+
+    # Potentials and the matching use 1-based indices, 0 is a virtual column.
+    row_potential = [0.0] * (row_count + 1)
+    column_potential = [0.0] * (column_count + 1)
+    column_owner = [0] * (column_count + 1)
+    previous_column = [0] * (column_count + 1)
+    for row in range(1, row_count + 1):
+        column_owner[0] = row
+        column = 0
+        min_slack = [infinity] * (column_count + 1)
+        used = [False] * (column_count + 1)
+        while True:
+            used[column] = True
+            owner = column_owner[column]
+            delta = infinity
+            next_column = 0
+            for candidate in range(1, column_count + 1):
+                if used[candidate]:
+                    continue
+                cost = costs[owner - 1][candidate - 1]
+                slack = (
+                    infinity
+                    if cost is None
+                    else cost - row_potential[owner] - column_potential[candidate]
+                )
+                if slack < min_slack[candidate]:
+                    min_slack[candidate] = slack
+                    previous_column[candidate] = column
+                if min_slack[candidate] < delta:
+                    delta = min_slack[candidate]
+                    next_column = candidate
+            assert next_column, "Every row has to have a feasible column"
+            for candidate in range(column_count + 1):
+                if used[candidate]:
+                    row_potential[column_owner[candidate]] += delta
+                    column_potential[candidate] -= delta
+                else:
+                    min_slack[candidate] -= delta
+            column = next_column
+            if column_owner[column] == 0:
+                break
+        # Flip the augmenting path.
+        while column:
+            previous = previous_column[column]
+            column_owner[column] = column_owner[previous]
+            column = previous
+
+    assignment = [0] * row_count
+    for column in range(1, column_count + 1):
+        if column_owner[column]:
+            assignment[column_owner[column] - 1] = column - 1
+    return assignment
+
+
+def launch_applications_from_layout(
+    connection: SwayConnection,
+    layout: WorkspaceLayout,
+    concurrent: bool = False,
+    history: LaunchHistory | None = None,
+):
     """Launch the applications contained in the given layout.
 
     The con_id of the launched applications are stored in
@@ -84,29 +230,294 @@ def launch_applications_from_layout(connection: Connection, layout: WorkspaceLay
     Parameters:
         connection: A connection to Sway.
         layout: The layout containing the applications to launch.
+        concurrent: Launch all applications at once instead of waiting for
+            the window of each application before launching the next one.
+        history: The history to take the timeouts from and to record the
+            launch times in.
 
     Note:
         This function modifies its argument.
 
     See also:
         - [sway_out.applications.launch_application][]
+        - [sway_out.applications.launch_applications_concurrently][]
     """
 
-    def go(container: ApplicationLaunchConfig | ContainerConfig) -> None:
+    run_sync(
+        launch_applications_from_layout_async(
+            SyncConnectionAdapter(connection), layout, concurrent, history
+        )
+    )
+
+
+async def launch_applications_from_layout_async(
+    connection: AsyncConnection,
+    layout: WorkspaceLayout,
+    concurrent: bool = False,
+    history: LaunchHistory | None = None,
+):
+    """Asynchronous version of [launch_applications_from_layout][sway_out.applications.launch_applications_from_layout]."""
+
+    if concurrent:
+        await launch_applications_concurrently_async(connection, layout, history)
+        return
+
+    async def go(container: ApplicationLaunchConfig | ContainerConfig) -> None:
         if isinstance(container, ApplicationLaunchConfig):
             if hasattr(container, "_con_id"):
                 logger.debug(
                     f"Skipping launch of {container.cmd} because it matched an existing window"
                 )
             else:
-                launch_application(connection, container)
+                await launch_application_async(connection, container, history)
         else:
             assert isinstance(container, ContainerConfig)
             for child in container.children:
-                go(child)
+                await go(child)
 
     for child in layout.children:
-        go(child)
+        await go(child)
+
+
+def launch_applications_concurrently(
+    connection: SwayConnection,
+    layout: WorkspaceLayout,
+    history: LaunchHistory | None = None,
+) -> None:
+    """Launch all applications of the layout at once.
+
+    All applications that have not been matched to an existing window are
+    launched up front. The new windows are then assigned to the launch
+    configurations as they appear. Because windows can appear in any order and
+    match expressions can overlap, the assignment is a maximum matching
+    between the launch configurations and the new windows, so a window is only
+    taken by one configuration if no other configuration depends on it.
+
+    With a history, the applications that took longest to open their window
+    before are launched first, and every application gets its own timeout
+    (see [LaunchHistory.get_timeout][sway_out.launch_history.LaunchHistory.get_timeout]).
+
+    Parameters:
+        connection: A connection to Sway.
+        layout: The layout containing the applications to launch.
+        history: The history to take the launch order and the timeouts from
+            and to record the launch times in.
+
+    Raises:
+        RuntimeError:
+            If at least one application fails to start. The remaining
+            applications are still launched and assigned.
+
+    Note:
+        This function modifies its argument.
+    """
+
+    run_sync(
+        launch_applications_concurrently_async(
+            SyncConnectionAdapter(connection), layout, history
+        )
+    )
+
+
+async def launch_applications_concurrently_async(
+    connection: AsyncConnection,
+    layout: WorkspaceLayout,
+    history: LaunchHistory | None = None,
+) -> None:
+    """Asynchronous version of [launch_applications_concurrently][sway_out.applications.launch_applications_concurrently]."""
+
+    def go(
+        container: ApplicationLaunchConfig | ContainerConfig,
+    ) -> Generator[ApplicationLaunchConfig]:
+        if isinstance(container, ApplicationLaunchConfig):
+            if hasattr(container, "_con_id"):
+                logger.debug(
+                    f"Skipping launch of {container.cmd} because it matched an existing window"
+                )
+            else:
+                yield container
+        else:
+            assert isinstance(container, ContainerConfig)
+            for child in container.children:
+                yield from go(child)
+
+    pending = [config for child in layout.children for config in go(child)]
+    if not pending:
+        return
+    if history is not None:
+        # Start the slowest applications first, so that they overlap with the
+        # others. Applications without history keep their order at the end.
+        pending.sort(key=lambda c: -(history.get_expected_seconds(c) or 0))
+
+    workspace = await find_current_workspace_async(connection)
+    if workspace is None:
+        logger.warning("No focused workspace found to search for windows.")
+        raise RuntimeError("No focused workspace found to search for windows.")
+    logger.debug(
+        f"Preparing to launch {len(pending)} command(s) on focused workspace: {workspace.name}"
+    )
+
+    # All windows that exist before the launch are not candidates.
+    known_window_ids = {leaf.id for leaf in workspace.leaves()}
+    new_windows: dict[int, Con] = {}
+    # When a window was first assigned to a launch configuration. A window
+    # may appear before it matches, e.g. before its title is set.
+    assigned_times: dict[tuple[int, int], float] = {}
+    launched: list[ApplicationLaunchConfig] = []
+    launch_times: list[float] = []
+    deadlines: list[float] = []
+    failures: list[str] = []
+
+    def add_window(window: Con) -> None:
+        new_windows[window.id] = window
+
+    async def check_tree() -> None:
+        workspace_tree = (await connection.get_tree()).find_by_id(workspace.id)
+        if workspace_tree is None:
+            raise RuntimeError("The workspace has disappeared")
+        for leaf in workspace_tree.leaves():
+            if leaf.id not in known_window_ids:
+                add_window(leaf)
+
+    async def is_candidate(event: WindowEvent) -> bool:
+        if event.change not in ("new", "title"):
+            return False
+        if event.container.id in known_window_ids:
+            return False
+        if not any(is_window_matching(event.container, c.match) for c in launched):
+            return False
+        # The event does not tell where the window is, so look it up.
+        window = (await connection.get_tree()).find_by_id(event.container.id)
+        window_workspace = window.workspace() if window is not None else None
+        return window_workspace is not None and window_workspace.id == workspace.id
+
+    with connection.record_window_events():
+        for config in pending:
+            cmd = _get_command(config)
+            logger.debug(f"Launching application with: '{cmd}'")
+            launch_time = time.monotonic()
+            try:
+                check_replies(await connection.command("exec " + cmd))
+            except RuntimeError as e:
+                failures.append(f"Failed to launch application '{cmd}': {e}")
+            else:
+                launched.append(config)
+                launch_times.append(launch_time)
+                deadlines.append(launch_time + _get_timeout(config, history))
+
+        next_check = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_check:
+                await check_tree()
+                next_check = now + LAUNCH_CHECK_INTERVAL_SECONDS
+            assignment = _assign_windows(launched, list(new_windows.values()))
+            for index, window in assignment.items():
+                assigned_times.setdefault((index, window.id), now)
+            # Wait as long as one of the missing applications is within its
+            # timeout.
+            deadline = max(
+                (d for i, d in enumerate(deadlines) if i not in assignment),
+                default=now,
+            )
+            if now >= deadline:
+                break
+            for event in await connection.wait_for_window_events(
+                min(next_check, deadline) - now
+            ):
+                if await is_candidate(event):
+                    logger.debug(
+                        f"New window through a window::{event.change} event: "
+                        + f"{event.container.name}"
+                    )
+                    add_window(event.container)
+
+    for index, config in enumerate(launched):
+        cmd = _get_command(config)
+        if index in assignment:
+            window = assignment[index]
+            config._con_id = window.id
+            logger.info(f"'{cmd}' successfully launched with con_id {config._con_id}")
+            if history is not None:
+                history.record(
+                    config, assigned_times[index, window.id] - launch_times[index]
+                )
+        else:
+            timeout = deadlines[index] - launch_times[index]
+            failures.append(
+                f"Failed to launch application '{cmd}': Application did not "
+                + f"launch within {timeout:.3g} seconds."
+            )
+            if history is not None:
+                history.record_timeout(config, timeout)
+
+    if failures:
+        for failure in failures:
+            logger.error(failure)
+        raise RuntimeError("\n".join(failures))
+
+
+def _assign_windows(
+    launch_configs: list[ApplicationLaunchConfig], windows: list[Con]
+) -> dict[int, Con]:
+    """Assign windows to launch configurations.
+
+    This computes a maximum bipartite matching with augmenting paths.
+    Earlier launch configurations take precedence if there are several
+    maximum matchings.
+
+    Parameters:
+        launch_configs: The launch configurations to assign windows to.
+        windows: The candidate windows.
+
+    Returns:
+        A mapping from the index of the launch configuration to its window.
+    """
+
+    candidates = [
+        [
+            window_index
+            for window_index, window in enumerate(windows)
+            if is_window_matching(window, config.match)
+        ]
+        for config in launch_configs
+    ]
+    window_owner: dict[int, int] = {}
+
+    def augment(config_index: int, visited: set[int]) -> bool:
+        for window_index in candidates[config_index]:
+            if window_index in visited:
+                continue
+            visited.add(window_index)
+            owner = window_owner.get(window_index)
+            if owner is None or augment(owner, visited):
+                window_owner[window_index] = config_index
+                return True
+        return False
+
+    for config_index in range(len(launch_configs)):
+        augment(config_index, set())
+
+    return {
+        config_index: windows[window_index]
+        for window_index, config_index in window_owner.items()
+    }
+
+
+def _get_timeout(
+    launch_config: ApplicationLaunchConfig, history: LaunchHistory | None
+) -> float:
+    if history is None:
+        return LAUNCH_TIMEOUT_SECONDS
+    return history.get_timeout(launch_config, LAUNCH_TIMEOUT_SECONDS)
+
+
+def _get_command(launch_config: ApplicationLaunchConfig) -> str:
+    """Get the command line to pass to Sway's `exec` for a launch configuration."""
+
+    if isinstance(launch_config.cmd, str):
+        return launch_config.cmd
+    return " ".join(escape_argument(a) for a in launch_config.cmd)
 
 
 def escape_argument(arg: str) -> str:
@@ -122,7 +533,11 @@ def escape_argument(arg: str) -> str:
     return f'"{arg}"'
 
 
-def launch_application(connection: Connection, launch_config: ApplicationLaunchConfig):
+def launch_application(
+    connection: SwayConnection,
+    launch_config: ApplicationLaunchConfig,
+    history: LaunchHistory | None = None,
+):
     """Launch an application on the current workspace.
 
     The con_id of the launched application is stored in the
@@ -131,6 +546,8 @@ def launch_application(connection: Connection, launch_config: ApplicationLaunchC
     Parameters:
         connection: A connection to Sway.
         launch_config: The launch configuration for the application.
+        history: The history to take the timeout from and to record the
+            launch time in.
 
     Raises:
         RuntimeError:
@@ -140,13 +557,24 @@ def launch_application(connection: Connection, launch_config: ApplicationLaunchC
         This function modifies its argument.
     """
 
-    if isinstance(launch_config.cmd, str):
-        cmd = launch_config.cmd
-    else:
-        cmd = " ".join(escape_argument(a) for a in launch_config.cmd)
+    run_sync(
+        launch_application_async(
+            SyncConnectionAdapter(connection), launch_config, history
+        )
+    )
+
+
+async def launch_application_async(
+    connection: AsyncConnection,
+    launch_config: ApplicationLaunchConfig,
+    history: LaunchHistory | None = None,
+):
+    """Asynchronous version of [launch_application][sway_out.applications.launch_application]."""
+
+    cmd = _get_command(launch_config)
 
     # Find the currently focused workspace to launch the application on.
-    workspace = find_current_workspace(connection)
+    workspace = await find_current_workspace_async(connection)
     if workspace is None:
         logger.warning("No focused workspace found to search for windows.")
         raise RuntimeError("No focused workspace found to search for windows.")
@@ -160,37 +588,56 @@ def launch_application(connection: Connection, launch_config: ApplicationLaunchC
         f"{len(matching_windows_before)} window(s) match the expression before launch"
     )
 
-    # Launch the application.
-    logger.debug(f"Launching application with: '{cmd}'")
-    replies = connection.command("exec " + cmd)
-    check_replies(replies)
-
-    # Wait for the application to launch and the window to appear
-    try:
-        con_id = wait_for_window(
-            connection, workspace, launch_config.match, matching_windows_before
-        )
-    except RuntimeError as e:
-        logger.error(f"Failed to launch application '{cmd}': {e}")
-        raise RuntimeError(f"Failed to launch application '{cmd}': {e}") from e
-    else:
-        logger.info(f"'{cmd}' successfully launched with con_id {con_id}")
-        launch_config._con_id = con_id
+    # Record the window events from before the launch so that no window is missed.
+    with connection.record_window_events():
+        # Launch the application.
+        logger.debug(f"Launching application with: '{cmd}'")
+        launch_time = time.monotonic()
+        replies = await connection.command("exec " + cmd)
+        check_replies(replies)
+
+        # Wait for the application to launch and the window to appear
+        timeout = _get_timeout(launch_config, history)
+        try:
+            con_id = await wait_for_window_async(
+                connection,
+                workspace,
+                launch_config.match,
+                matching_windows_before,
+                timeout,
+            )
+        except RuntimeError as e:
+            logger.error(f"Failed to launch application '{cmd}': {e}")
+            if history is not None and time.monotonic() - launch_time >= timeout:
+                history.record_timeout(launch_config, timeout)
+            raise RuntimeError(f"Failed to launch application '{cmd}': {e}") from e
+        else:
+            logger.info(f"'{cmd}' successfully launched with con_id {con_id}")
+            launch_config._con_id = con_id
+            if history is not None:
+                history.record(launch_config, time.monotonic() - launch_time)
 
 
 def wait_for_window(
-    connection: Connection,
+    connection: SwayConnection,
     workspace: Con,
     match: WindowMatchExpression,
     known_windows: list[Con],
+    timeout_seconds: float = LAUNCH_TIMEOUT_SECONDS,
 ) -> int:
     """Wait for the application to launch and a matching window to appear on the workspace.
 
+    New windows are detected through `window::new` events. `window::title`
+    events are considered as well because some applications only set their
+    final title after the window has been mapped. As a fallback, the tree is
+    checked every [LAUNCH_CHECK_INTERVAL_SECONDS][sway_out.applications.LAUNCH_CHECK_INTERVAL_SECONDS].
+
     Parameters:
         connection: A connection to Sway.
         workspace: The workspace tree node to look in.
         match: The matching expression to use.
         known_windows: Windows to ignore.
+        timeout_seconds: How long to wait for the window.
 
     Returns:
         The Sway ID of the new con.
@@ -200,11 +647,34 @@ def wait_for_window(
             If no matching window is found within the timeout duration.
     """
 
+    return run_sync(
+        wait_for_window_async(
+            SyncConnectionAdapter(connection),
+            workspace,
+            match,
+            known_windows,
+            timeout_seconds,
+        )
+    )
+
+
+async def wait_for_window_async(
+    connection: AsyncConnection,
+    workspace: Con,
+    match: WindowMatchExpression,
+    known_windows: list[Con],
+    timeout_seconds: float = LAUNCH_TIMEOUT_SECONDS,
+) -> int:
+    """Asynchronous version of [wait_for_window][sway_out.applications.wait_for_window].
+
+    Waiting does not block the event loop.
+    """
+
     known_window_ids = {window.id for window in known_windows}
-    matching_windows = []
-    for _ in range(int(LAUNCH_TIMEOUT_SECONDS / LAUNCH_CHECK_INTERVAL_SECONDS)):
+
+    async def find_window_in_tree() -> int | None:
         # update the workspace to check for new windows
-        workspace_tree = connection.get_tree().find_by_id(workspace.id)
+        workspace_tree = (await connection.get_tree()).find_by_id(workspace.id)
         if workspace_tree is None:
             raise RuntimeError("The workspace has disappeared")
         logger.debug("Checking for matching windows")
@@ -218,8 +688,40 @@ def wait_for_window(
                     f"New matching window found: {window.name} ({window.window_title})"
                 )
                 return window.id
-        time.sleep(LAUNCH_CHECK_INTERVAL_SECONDS)
-    else:
-        raise RuntimeError(
-            f"Application did not launch within {LAUNCH_TIMEOUT_SECONDS} seconds."
-        )
+        return None
+
+    async def is_new_window_on_workspace(event: WindowEvent) -> bool:
+        if event.change not in ("new", "title"):
+            return False
+        if event.container.id in known_window_ids:
+            return False
+        if not is_window_matching(event.container, match):
+            return False
+        # The event does not tell where the window is, so look it up.
+        window = (await connection.get_tree()).find_by_id(event.container.id)
+        window_workspace = window.workspace() if window is not None else None
+        return window_workspace is not None and window_workspace.id == workspace.id
+
+    with connection.record_window_events():
+        deadline = time.monotonic() + timeout_seconds
+        next_check = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_check:
+                con_id = await find_window_in_tree()
+                if con_id is not None:
+                    return con_id
+                next_check = now + LAUNCH_CHECK_INTERVAL_SECONDS
+            if now >= deadline:
+                raise RuntimeError(
+                    f"Application did not launch within {timeout_seconds:.3g} seconds."
+                )
+            for event in await connection.wait_for_window_events(
+                min(next_check, deadline) - now
+            ):
+                if await is_new_window_on_workspace(event):
+                    logger.debug(
+                        f"New matching window found through a window::{event.change} event: "
+                        + f"{event.container.name}"
+                    )
+                    return event.container.id
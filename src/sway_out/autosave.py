@@ -0,0 +1,297 @@
+"""Saving the layout continuously while the session changes.
+
+`sway-out save --watch` keeps an [AutoSaver][sway_out.autosave.AutoSaver]
+running. It subscribes to the
+[WATCH_EVENTS][sway_out.autosave.WATCH_EVENTS] and saves the layout once no
+event has arrived for [DEBOUNCE_SECONDS][sway_out.autosave.DEBOUNCE_SECONDS].
+
+Only the workspaces that changed since the last save are created again: every
+workspace has a fingerprint of the properties that end up in its layout, and
+the serialized layouts of unchanged workspaces are reused. Files are replaced
+atomically, so a crash never leaves a partially written layout behind.
+"""
+
+import hashlib
+import json
+import logging
+import selectors
+import socket
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import cast
+
+from i3ipc import Con
+
+from .connection import TREE_EVENTS, SwayConnection
+from .layout_creation import create_workspace_layout
+from .layout_files import dump_workspace_layout, get_workspace_file_name
+from .processes import ProcessTable
+from .snapshots import SnapshotStore
+from .utils import write_atomically
+
+logger = logging.getLogger(__name__)
+
+WATCH_EVENTS = (*TREE_EVENTS, "binding")
+"""The events that trigger a save.
+
+Resizing with the keyboard does not send a `window` event, but the binding
+that does it sends a `binding` event.
+"""
+
+DEBOUNCE_SECONDS = 1.0
+"""The time without events after which the layout is saved."""
+
+MAX_DELAY_SECONDS = 10.0
+"""The maximum time from the first event of a burst to the save."""
+
+
+@dataclass
+class _SavedWorkspace:
+    fingerprint: str
+    text: str | None = None
+    digest: str | None = None
+    path: Path | None = None
+
+
+class AutoSaver:
+    """Saves the layout of the workspaces whenever they change.
+
+    Exactly one of `layout_file`, `split_dir` and `snapshots` has to be given.
+
+    Arguments:
+        connection: A connection to Sway, subscribed to
+            [WATCH_EVENTS][sway_out.autosave.WATCH_EVENTS].
+        layout_file: The layout file to write all workspaces to.
+        split_dir: The directory to write one layout file per workspace to.
+        snapshots: The store to add a snapshot to on every save. Only the
+            changed workspaces are stored.
+        snapshot_name: The name of the snapshots.
+        workspace_names: The names of workspaces to include, iff omitted, all
+            workspaces are included.
+    """
+
+    def __init__(
+        self,
+        connection: SwayConnection,
+        layout_file: Path | None = None,
+        split_dir: Path | None = None,
+        workspace_names: list[str] | None = None,
+        snapshots: SnapshotStore | None = None,
+        snapshot_name: str | None = None,
+    ):
+        if [layout_file, split_dir, snapshots].count(None) != 2:
+            raise ValueError(
+                "Exactly one of layout_file, split_dir and snapshots is required"
+            )
+        super().__init__()
+        self.connection = connection
+        self.layout_file = layout_file
+        self.split_dir = split_dir
+        self.snapshots = snapshots
+        self.snapshot_name = snapshot_name
+        self.workspace_names = workspace_names
+        self.saves = 0
+        """The number of times files have been written."""
+        self._workspaces: dict[str, _SavedWorkspace] = {}
+        self._reported_pids: set[int] = set()
+        self._stop_reader, self._stop_writer = socket.socketpair()
+
+    def save(self) -> bool:
+        """Save the workspaces that changed since the last save.
+
+        Returns:
+            `True` if anything has been written.
+        """
+
+        tree = self.connection.get_tree()
+        # Unnamed workspaces cannot be saved.
+        workspaces = {
+            workspace.name: workspace
+            for workspace in tree.workspaces()
+            if workspace.name is not None
+            and (self.workspace_names is None or workspace.name in self.workspace_names)
+        }
+
+        fingerprints = {
+            name: get_workspace_fingerprint(workspace)
+            for name, workspace in workspaces.items()
+        }
+        changed = {
+            name: workspace
+            for name, workspace in workspaces.items()
+            if name not in self._workspaces
+            or self._workspaces[name].fingerprint != fingerprints[name]
+        }
+        removed = self._workspaces.keys() - fingerprints.keys()
+        order_changed = list(fingerprints) != [
+            name for name in self._workspaces if name not in removed
+        ]
+        if not changed and not removed and not order_changed:
+            logger.debug("No workspace changed, not saving")
+            return False
+
+        processes = ProcessTable()
+        processes.collect(
+            leaf.pid
+            for workspace in changed.values()
+            for leaf in workspace.leaves()
+            if leaf.pid is not None
+        )
+        for name, workspace in changed.items():
+            logger.info(f"Workspace {name} changed")
+            workspace_layout = create_workspace_layout(
+                workspace, processes, self._reported_pids
+            )
+            previous = self._workspaces.get(name)
+            saved = self._workspaces[name] = _SavedWorkspace(
+                fingerprints[name],
+                path=previous.path if previous is not None else None,
+            )
+            if self.snapshots is not None:
+                saved.digest = self.snapshots.put_workspace(workspace_layout)
+            else:
+                saved.text = dump_workspace_layout(name, workspace_layout)
+
+        removed_workspaces = [self._workspaces.pop(name) for name in removed]
+        self._workspaces = {name: self._workspaces[name] for name in fingerprints}
+        # Keep the set from growing with every process ever seen.
+        self._reported_pids.intersection_update(
+            leaf.pid for workspace in workspaces.values() for leaf in workspace.leaves()
+        )
+
+        if self.snapshots is not None:
+            try:
+                self.snapshots.add(
+                    [
+                        (name, cast(str, w.digest))
+                        for name, w in self._workspaces.items()
+                    ],
+                    self.snapshot_name,
+                )
+            except RuntimeError as e:
+                # The store has been pruned concurrently, which may remove the
+                # layouts of unchanged workspaces.
+                logger.warning(f"{e}, storing all workspaces again")
+                self._workspaces = {}
+                return self.save()
+        elif self.split_dir is not None:
+            self.split_dir.mkdir(parents=True, exist_ok=True)
+            for name in changed:
+                saved = self._workspaces[name]
+                saved.path = self.split_dir / get_workspace_file_name(name)
+                write_atomically(saved.path, f"workspaces:\n{saved.text}")
+            for saved in removed_workspaces:
+                if saved.path is not None:
+                    logger.info(f"Removing {saved.path}")
+                    saved.path.unlink(missing_ok=True)
+        else:
+            assert self.layout_file is not None
+            write_atomically(
+                self.layout_file,
+                (
+                    "workspaces:\n"
+                    + "".join(cast(str, w.text) for w in self._workspaces.values())
+                    if self._workspaces
+                    else "workspaces: {}\n"
+                ),
+            )
+        self.saves += 1
+        logger.info(
+            f"Saved {len(changed)} changed and {len(removed)} removed workspace(s)"
+        )
+        return True
+
+    def watch(self) -> None:
+        """Save the layout now and whenever it changes.
+
+        Returns when [stop][sway_out.autosave.AutoSaver.stop] is called or
+        when the connection to Sway is lost.
+
+        Raises:
+            RuntimeError: If the connection does not receive events.
+        """
+
+        event_fileno = self.connection.event_fileno
+        if event_fileno is None:
+            raise RuntimeError("Cannot watch the layout without an event subscription")
+
+        self.save()
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._stop_reader, selectors.EVENT_READ, "stop")
+            selector.register(event_fileno, selectors.EVENT_READ, "events")
+
+            first_event: float | None = None
+            while True:
+                timeout = None
+                if first_event is not None:
+                    timeout = max(
+                        min(
+                            DEBOUNCE_SECONDS,
+                            first_event + MAX_DELAY_SECONDS - time.monotonic(),
+                        ),
+                        0,
+                    )
+                ready = selector.select(timeout)
+                for key, _ in ready:
+                    if key.data == "stop":
+                        logger.info("Stopping to watch the layout")
+                        return
+                    self.connection.process_events()
+                    if self.connection.event_fileno is None:
+                        logger.info("Lost the connection to Sway, stopping")
+                        return
+                    if first_event is None:
+                        first_event = time.monotonic()
+                # Save after a quiet period or when a long burst of events
+                # has been going on for too long.
+                if first_event is not None and (
+                    not ready or time.monotonic() >= first_event + MAX_DELAY_SECONDS
+                ):
+                    first_event = None
+                    self.save()
+
+    def stop(self) -> None:
+        """Make [watch][sway_out.autosave.AutoSaver.watch] return.
+
+        This can be called from another thread.
+        """
+
+        self._stop_writer.send(b"\0")
+
+    def close(self) -> None:
+        """Release the resources of the saver."""
+
+        self._stop_reader.close()
+        self._stop_writer.close()
+
+
+def get_workspace_fingerprint(workspace: Con) -> str:
+    """Get a fingerprint of the properties of a workspace that are saved.
+
+    Parameters:
+        workspace: The workspace con.
+
+    Returns:
+        A string that changes whenever the layout of the workspace changes.
+    """
+
+    def go(con: Con) -> list[object]:
+        return [
+            con.type,
+            con.layout,
+            con.rect.width,
+            con.rect.height,
+            con.deco_rect.height,
+            con.marks,
+            con.focused,
+            con.pid,
+            con.app_id,
+            con.window_class,
+            con.window_instance,
+            con.name,
+            [go(child) for child in con.nodes],
+        ]
+
+    data = json.dumps(go(workspace), separators=(",", ":")).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
@@ -0,0 +1,68 @@
+"""A thin client that forwards commands to a running daemon.
+
+Starting the full command line interface means importing click, pydantic,
+yaml and i3ipc, connecting to Sway and fetching the tree before any work is
+done. When `sway-out daemon` is running, `sway-out-client` forwards the
+command to it over a Unix socket instead, so a key binding like
+
+    bindsym $mod+F1 exec sway-out-client apply ~/.config/sway-out/work.yaml
+
+only pays for starting the interpreter. This module therefore only imports
+the standard library. If no daemon is running, the command is run in-process
+like `sway-out` would.
+"""
+
+import os
+import socket
+import sys
+from typing import Any
+
+from .forwarding import can_forward, get_socket_path, receive_message, send_message
+
+
+def forward_command(
+    args: list[str], socket_path: str | None = None
+) -> dict[str, Any] | None:
+    """Run a command in the daemon.
+
+    File arguments are resolved relative to the current working directory of
+    the client.
+
+    Arguments:
+        args: The command line arguments, without the program name.
+        socket_path: The socket of the daemon. Detected if omitted, see
+            [get_socket_path][sway_out.forwarding.get_socket_path].
+
+    Returns:
+        The reply of the daemon with the `exit_code` and the captured
+        `stdout` and `stderr` of the command or `None` if no daemon is
+        running.
+    """
+
+    if socket_path is None:
+        socket_path = get_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        send_message(sock, {"args": args, "cwd": os.getcwd()})
+        return receive_message(sock)
+
+
+def main() -> None:
+    """Forward the command to the daemon or run it in-process."""
+
+    args = sys.argv[1:]
+    reply = None
+    if can_forward(args):
+        reply = forward_command(args)
+    if reply is None:
+        from .main import main as run_in_process
+
+        run_in_process(args)
+        return
+
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    sys.exit(reply["exit_code"])
@@ -1,12 +1,689 @@
 """Utilities related to the Sway connection."""
 
+import asyncio
+import itertools
+import json
 import logging
-from typing import cast
+import select
+import socket
+import struct
+import time
+from collections import Counter
+from collections.abc import Coroutine, Generator, Sequence
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Protocol, Self, TypeVar, cast
 
-from i3ipc import CommandReply, Con, Connection
+import i3ipc.aio
+from i3ipc import CommandReply, Con, Connection, OutputReply, WindowEvent
 
 logger = logging.getLogger(__name__)
 
+IPC_MAGIC = b"i3-ipc"
+"""The magic string at the start of every IPC message."""
+
+IPC_HEADER = struct.Struct("=6sII")
+"""The header of IPC messages: magic string, payload length and message type."""
+
+IPC_SUBSCRIBE = 2
+"""The message type to subscribe to events."""
+
+IPC_EVENT_WINDOW = 0x80000003
+"""The message type of `window` events."""
+
+IPC_EVENT_TICK = 0x80000007
+"""The message type of `tick` events."""
+
+IPC_MESSAGE_NAMES = {
+    0: "RUN_COMMAND",
+    1: "GET_WORKSPACES",
+    2: "SUBSCRIBE",
+    3: "GET_OUTPUTS",
+    4: "GET_TREE",
+    5: "GET_MARKS",
+    6: "GET_BAR_CONFIG",
+    7: "GET_VERSION",
+    8: "GET_BINDING_MODES",
+    9: "GET_CONFIG",
+    10: "SEND_TICK",
+    100: "GET_INPUTS",
+    101: "GET_SEATS",
+}
+"""The names of the IPC message types as used in the Sway documentation."""
+
+TREE_EVENTS = ("window", "workspace")
+"""Events that invalidate the cached tree of a [SwayConnection][sway_out.connection.SwayConnection]."""
+
+TREE_PRESERVING_COMMANDS = ("exec", "nop")
+"""Commands that do not change the tree when they are run on their own."""
+
+_T = TypeVar("_T")
+
+
+@dataclass
+class IpcStatistics:
+    """Counters for the IPC traffic of a connection."""
+
+    messages: Counter[str] = field(default_factory=Counter)
+    """The number of messages sent to Sway per message type."""
+
+    events: int = 0
+    """The number of events received."""
+
+    bytes_received: int = 0
+    """The number of bytes received in replies and events."""
+
+    blocked_seconds: float = 0.0
+    """The time spent waiting for replies from Sway."""
+
+    def copy(self) -> "IpcStatistics":
+        """Get a copy of the current counters."""
+
+        return IpcStatistics(
+            Counter(self.messages),
+            self.events,
+            self.bytes_received,
+            self.blocked_seconds,
+        )
+
+    def sum(self, other: "IpcStatistics") -> "IpcStatistics":
+        """Get the combined traffic of two sets of counters.
+
+        Arguments:
+            other: The other counters.
+
+        Returns:
+            The sum of both counters.
+        """
+
+        return IpcStatistics(
+            self.messages + other.messages,
+            self.events + other.events,
+            self.bytes_received + other.bytes_received,
+            self.blocked_seconds + other.blocked_seconds,
+        )
+
+    def difference(self, earlier: "IpcStatistics") -> "IpcStatistics":
+        """Get the traffic since an earlier copy of the counters.
+
+        Arguments:
+            earlier: The earlier copy.
+
+        Returns:
+            The counters for the traffic in between.
+        """
+
+        return IpcStatistics(
+            self.messages - earlier.messages,
+            self.events - earlier.events,
+            self.bytes_received - earlier.bytes_received,
+            self.blocked_seconds - earlier.blocked_seconds,
+        )
+
+
+class _TreeCache:
+    """The tree cache and the event subscription shared by the connections.
+
+    The connection classes differ in how they talk to Sway, but both receive
+    the events on a separate blocking socket that is only read when needed.
+    """
+
+    def _init_tree_cache(self) -> None:
+        self.statistics = IpcStatistics()
+        self._tree: Con | None = None
+        self._event_socket: socket.socket | None = None
+        self._recording = 0
+        self._window_events: list[WindowEvent] = []
+        # Whether events of our own commands may still be on their way.
+        self._commanded = False
+        # The payload of the tick sent before the last fetch of the tree, as
+        # long as its event has not arrived.
+        self._sync_tick: str | None = None
+        self._ticks = itertools.count()
+
+    @property
+    def has_events(self) -> bool:
+        """Whether the connection receives events from Sway."""
+
+        return self._event_socket is not None
+
+    def invalidate_tree(self) -> None:
+        """Drop the cached tree so that the next `get_tree()` fetches it again."""
+
+        self._tree = None
+
+    def _before_command(self, command: str) -> None:
+        """Invalidate the tree if the command may change it."""
+
+        if _may_change_tree(command):
+            self.invalidate_tree()
+            self._commanded = True
+
+    def _next_sync_tick(self) -> str | None:
+        """Get the payload of a tick to send before fetching the tree.
+
+        The events caused by our own commands may arrive after the reply to
+        the command. A tick sent before fetching the tree arrives after them,
+        so all events up to the tick are already reflected in the fetched
+        tree and do not invalidate it again.
+
+        Returns:
+            The payload, or `None` if no tick is needed.
+        """
+
+        if not self._commanded:
+            return None
+        self._commanded = False
+        self._sync_tick = f"sway-out {id(self)} {next(self._ticks)}"
+        return self._sync_tick
+
+    @property
+    def event_fileno(self) -> int | None:
+        """The file descriptor of the event subscription, if there is one.
+
+        It becomes readable when events are pending, so long-running callers
+        can wait for it and call `process_events()` to keep Sway from queueing
+        up events for them.
+        """
+
+        return self._event_socket.fileno() if self._event_socket is not None else None
+
+    def process_events(self) -> None:
+        """Consume pending events without blocking.
+
+        The cached tree is invalidated if there were any.
+        """
+
+        self._process_events()
+
+    @contextmanager
+    def record_window_events(self) -> Generator[None]:
+        """Record `window` events while the context is active.
+
+        Events that arrived before entering the context are discarded. The
+        recorded events can be retrieved with `wait_for_window_events()`.
+        """
+
+        self._process_events()
+        self._recording += 1
+        try:
+            yield
+        finally:
+            self._recording -= 1
+            if not self._recording:
+                self._window_events.clear()
+
+    def _take_window_events(self) -> list[WindowEvent]:
+        events = self._window_events
+        self._window_events = []
+        return events
+
+    def _account_message(self, message_type: int, data: str | bytes) -> None:
+        # i3ipc passes the message type as an enum.
+        message_type = getattr(message_type, "value", message_type)
+        self.statistics.messages[
+            IPC_MESSAGE_NAMES.get(message_type, str(message_type))
+        ] += 1
+        if isinstance(data, str):
+            data = data.encode()
+        self.statistics.bytes_received += IPC_HEADER.size + len(data)
+
+    def _subscribe(
+        self, socket_path: str, events: Sequence[str]
+    ) -> socket.socket | None:
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(socket_path)
+            events = [*events, "tick"] if "tick" not in events else list(events)
+            _send_message(sock, IPC_SUBSCRIBE, json.dumps(events))
+            _, payload = _receive_message(sock)
+            self.statistics.messages[IPC_MESSAGE_NAMES[IPC_SUBSCRIBE]] += 1
+            if not json.loads(payload).get("success", False):
+                raise RuntimeError(f"Sway rejected the subscription: {payload}")
+        except (OSError, RuntimeError, ValueError) as e:
+            logger.warning(f"Failed to subscribe to events, not caching the tree: {e}")
+            return None
+        return sock
+
+    def _process_events(self, timeout: float = 0) -> None:
+        """Consume pending events and invalidate the tree if there were any.
+
+        Events that arrive before the tick sent with the last fetch of the
+        tree are already reflected in it, see `_next_sync_tick()`.
+
+        Arguments:
+            timeout: How long to wait for the first event in seconds.
+        """
+
+        while self._event_socket is not None:
+            readable, _, _ = select.select([self._event_socket], [], [], timeout)
+            if not readable:
+                break
+            timeout = 0
+            try:
+                message_type, payload = _receive_message(self._event_socket)
+            except (OSError, RuntimeError) as e:
+                logger.warning(
+                    f"Lost the event subscription, not caching the tree: {e}"
+                )
+                self._event_socket.close()
+                self._event_socket = None
+                message_type, payload = None, ""
+            else:
+                self.statistics.events += 1
+                self.statistics.bytes_received += IPC_HEADER.size + len(
+                    payload.encode()
+                )
+            if message_type == IPC_EVENT_TICK:
+                if json.loads(payload).get("payload") == self._sync_tick:
+                    self._sync_tick = None
+                continue
+            if self._sync_tick is None:
+                self.invalidate_tree()
+            if self._recording and message_type == IPC_EVENT_WINDOW:
+                connection = self
+                assert isinstance(connection, (Connection, i3ipc.aio.Connection))
+                self._window_events.append(WindowEvent(json.loads(payload), connection))
+
+    def _close_event_socket(self) -> None:
+        if self._event_socket is not None:
+            self._event_socket.close()
+            self._event_socket = None
+
+
+class SwayConnection(_TreeCache, Connection):
+    """A connection to Sway that caches the tree.
+
+    `get_tree()` returns the same snapshot of the tree until it is invalidated.
+    This happens when a command is run through this connection (including
+    `Con.command()` on containers of the tree) or when Sway sends a `window` or
+    `workspace` event, i.e. when something else changed the tree. Commands
+    that cannot change the tree, like `exec`, keep it. The events caused by our
+    own commands do not invalidate the tree a second time: before the tree is
+    fetched after a command, a tick is sent, and the events up to it are
+    already reflected in the fetched tree.
+
+    The events are received on a separate socket that is only read when the
+    tree is requested, so no background thread is required. If subscribing to
+    the events fails, the tree is not cached at all.
+
+    `window` events can also be recorded for callers that want to react to
+    them, see `record_window_events()` and
+    [wait_for_window_events][sway_out.connection.SwayConnection.wait_for_window_events].
+
+    The IPC traffic is accounted in `statistics`, see
+    [IpcStatistics][sway_out.connection.IpcStatistics].
+
+    Arguments:
+        socket_path: The path to the Sway socket. If omitted, it is detected
+            from the environment.
+        events: The events to subscribe to. Any of them invalidates the
+            cached tree, so it must include
+            [TREE_EVENTS][sway_out.connection.TREE_EVENTS].
+    """
+
+    def __init__(
+        self, socket_path: str | None = None, events: Sequence[str] = TREE_EVENTS
+    ):
+        self._init_tree_cache()
+        super().__init__(socket_path)
+        self._event_socket = self._subscribe(self.socket_path, events)
+
+    def get_tree(self) -> Con:
+        """Get the tree, reusing the cached snapshot if it is still valid.
+
+        Returns:
+            The root container of the tree.
+        """
+
+        self._process_events()
+        if self._event_socket is None:
+            return super().get_tree()
+        if self._tree is None:
+            logger.debug("Fetching the tree")
+            tick = self._next_sync_tick()
+            if tick is not None:
+                self.send_tick(tick)
+            self._tree = super().get_tree()
+        return self._tree
+
+    def command(self, command: str) -> list[CommandReply]:
+        """Run a command and invalidate the cached tree if it may change it.
+
+        Arguments:
+            command: The command to run.
+
+        Returns:
+            The replies to the command.
+        """
+
+        self._before_command(command)
+        return super().command(command)
+
+    def _message(self, message_type: int, payload: str) -> str:
+        start = time.perf_counter()
+        try:
+            data = super()._message(message_type, payload)
+        finally:
+            self.statistics.blocked_seconds += time.perf_counter() - start
+        self._account_message(message_type, data)
+        return data
+
+    def close(self) -> None:
+        """Close the sockets to Sway.
+
+        Sway keeps sending events to the connection until it is closed.
+        """
+
+        self._close_event_socket()
+        self._cmd_socket.close()
+
+    def wait_for_window_events(self, timeout: float) -> list[WindowEvent]:
+        """Wait for recorded `window` events.
+
+        Returns as soon as at least one event has been recorded or after the
+        timeout. Without an event subscription, this just sleeps.
+
+        Arguments:
+            timeout: The maximum time to wait in seconds.
+
+        Returns:
+            The events recorded since the last call, oldest first.
+        """
+
+        if self._event_socket is None:
+            time.sleep(timeout)
+        elif not self._window_events:
+            self._process_events(timeout)
+        return self._take_window_events()
+
+
+class AsyncSwayConnection(_TreeCache, i3ipc.aio.Connection):
+    """An asyncio connection to Sway that caches the tree.
+
+    This is the counterpart of
+    [SwayConnection][sway_out.connection.SwayConnection] for
+    `i3ipc.aio.Connection`: the tree is cached the same way, the IPC traffic
+    is accounted the same way and `window` events can be recorded. Waiting for
+    events and replies does not block the event loop, so other tasks, e.g.
+    notifications, make progress in the meantime.
+
+    Messages on the command socket are serialized, so the connection can be
+    shared by concurrent tasks. The connection has to be connected with
+    `connect()` before it is used.
+
+    Arguments:
+        socket_path: The path to the Sway socket. If omitted, it is detected
+            from the environment.
+    """
+
+    def __init__(self, socket_path: str | None = None):
+        self._init_tree_cache()
+        super().__init__(socket_path)
+        self._message_lock = asyncio.Lock()
+
+    async def connect(self) -> Self:
+        """Connect to Sway and subscribe to the events that change the tree.
+
+        Returns:
+            The connection itself.
+        """
+
+        await super().connect()
+        self._event_socket = self._subscribe(self.socket_path, TREE_EVENTS)
+        return self
+
+    async def get_tree(self) -> Con:
+        """Get the tree, reusing the cached snapshot if it is still valid.
+
+        Returns:
+            The root container of the tree.
+        """
+
+        self._process_events()
+        if self._event_socket is None:
+            return await super().get_tree()
+        if self._tree is None:
+            logger.debug("Fetching the tree")
+            tick = self._next_sync_tick()
+            if tick is not None:
+                await self.send_tick(tick)
+            self._tree = await super().get_tree()
+        return self._tree
+
+    async def command(self, cmd: str) -> list[CommandReply]:
+        """Run a command and invalidate the cached tree if it may change it.
+
+        Arguments:
+            cmd: The command to run.
+
+        Returns:
+            The replies to the command.
+        """
+
+        self._before_command(cmd)
+        return await super().command(cmd)
+
+    async def _message(self, message_type: Any, payload: str = "") -> bytes:
+        # i3ipc reads replies with a single `sock_recv()`, which truncates
+        # large replies like the tree, so the message is read here instead.
+        data = payload.encode()
+        async with self._message_lock:
+            start = time.perf_counter()
+            try:
+                await self._loop.sock_sendall(
+                    self._cmd_socket,
+                    IPC_HEADER.pack(IPC_MAGIC, len(data), message_type.value) + data,
+                )
+                magic, length, _ = IPC_HEADER.unpack(
+                    await self._receive_exactly(IPC_HEADER.size)
+                )
+                if magic != IPC_MAGIC:
+                    raise RuntimeError("Received an invalid IPC message")
+                reply = await self._receive_exactly(length)
+            finally:
+                self.statistics.blocked_seconds += time.perf_counter() - start
+        self._account_message(message_type, reply)
+        return reply
+
+    async def _receive_exactly(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = await self._loop.sock_recv(self._cmd_socket, size - len(data))
+            if not chunk:
+                raise RuntimeError("The IPC socket was closed")
+            data += chunk
+        return data
+
+    def close(self) -> None:
+        """Close the sockets to Sway."""
+
+        self._close_event_socket()
+        self._loop.remove_reader(self._sub_fd)
+        self._sub_socket.close()
+        self._cmd_socket.close()
+
+    async def wait_for_window_events(self, timeout: float) -> list[WindowEvent]:
+        """Wait for recorded `window` events without blocking the event loop.
+
+        Returns as soon as at least one event has been recorded or after the
+        timeout. Without an event subscription, this just sleeps.
+
+        Arguments:
+            timeout: The maximum time to wait in seconds.
+
+        Returns:
+            The events recorded since the last call, oldest first.
+        """
+
+        if self._event_socket is None:
+            await asyncio.sleep(timeout)
+        elif not self._window_events:
+            readable = self._loop.create_future()
+            fd = self._event_socket.fileno()
+            self._loop.add_reader(
+                fd, lambda: readable.done() or readable.set_result(None)
+            )
+            try:
+                await asyncio.wait_for(readable, max(timeout, 0))
+            except TimeoutError:
+                pass
+            finally:
+                self._loop.remove_reader(fd)
+            self._process_events()
+        return self._take_window_events()
+
+
+class AsyncConnection(Protocol):
+    """The interface of the connection used by the asynchronous functions.
+
+    It is implemented by
+    [AsyncSwayConnection][sway_out.connection.AsyncSwayConnection] and, for
+    the synchronous functions, by
+    [SyncConnectionAdapter][sway_out.connection.SyncConnectionAdapter].
+    """
+
+    @property
+    def has_events(self) -> bool: ...
+
+    async def get_tree(self) -> Con: ...
+
+    async def command(self, cmd: str) -> list[CommandReply]: ...
+
+    async def get_marks(self) -> list[str]: ...
+
+    async def get_outputs(self) -> list[OutputReply]: ...
+
+    def record_window_events(self) -> AbstractContextManager[None]: ...
+
+    async def wait_for_window_events(self, timeout: float) -> list[WindowEvent]: ...
+
+
+class SyncConnectionAdapter:
+    """Exposes a synchronous connection through the asynchronous interface.
+
+    The coroutines of the adapter call the synchronous connection directly
+    and never suspend. So the asynchronous functions can be run on a
+    synchronous connection with [run_sync][sway_out.connection.run_sync],
+    which is how the synchronous functions of this package are implemented.
+
+    Recording `window` events requires a
+    [SwayConnection][sway_out.connection.SwayConnection]. Other connections
+    do not record any events.
+
+    Arguments:
+        connection: The synchronous connection to use.
+    """
+
+    def __init__(self, connection: Connection):
+        super().__init__()
+        self.connection = connection
+
+    @property
+    def has_events(self) -> bool:
+        """Whether the connection receives events from Sway."""
+
+        return (
+            isinstance(self.connection, SwayConnection) and self.connection.has_events
+        )
+
+    async def get_tree(self) -> Con:
+        return self.connection.get_tree()
+
+    async def command(self, cmd: str) -> list[CommandReply]:
+        return self.connection.command(cmd)
+
+    async def get_marks(self) -> list[str]:
+        return self.connection.get_marks()
+
+    async def get_outputs(self) -> list[OutputReply]:
+        return self.connection.get_outputs()
+
+    def record_window_events(self) -> AbstractContextManager[None]:
+        if isinstance(self.connection, SwayConnection):
+            return self.connection.record_window_events()
+        return nullcontext()
+
+    async def wait_for_window_events(self, timeout: float) -> list[WindowEvent]:
+        if isinstance(self.connection, SwayConnection):
+            return self.connection.wait_for_window_events(timeout)
+        time.sleep(timeout)
+        return []
+
+
+def run_sync(coroutine: Coroutine[Any, Any, _T]) -> _T:
+    """Run a coroutine that never suspends to completion.
+
+    This runs the asynchronous functions on a
+    [SyncConnectionAdapter][sway_out.connection.SyncConnectionAdapter]
+    without an event loop.
+
+    Arguments:
+        coroutine: The coroutine to run.
+
+    Returns:
+        The result of the coroutine.
+
+    Raises:
+        RuntimeError: If the coroutine tries to suspend, e.g. to wait for a
+            future.
+    """
+
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    coroutine.close()
+    raise RuntimeError("The coroutine tried to suspend outside of an event loop")
+
+
+def _may_change_tree(command: str) -> bool:
+    """Check whether a command payload may change the tree.
+
+    Only a single command from
+    [TREE_PRESERVING_COMMANDS][sway_out.connection.TREE_PRESERVING_COMMANDS]
+    is known to leave the tree alone, everything else is assumed to change it.
+    """
+
+    command = command.strip()
+    if command.startswith("["):
+        _, _, command = command.partition("]")
+    name, _, arguments = command.strip().partition(" ")
+    return name not in TREE_PRESERVING_COMMANDS or ";" in arguments or "," in arguments
+
+
+def _send_message(sock: socket.socket, message_type: int, payload: str) -> None:
+    data = payload.encode()
+    sock.sendall(IPC_HEADER.pack(IPC_MAGIC, len(data), message_type) + data)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise RuntimeError("The IPC socket was closed")
+        data += chunk
+    return data
+
+
+def _receive_message(sock: socket.socket) -> tuple[int, str]:
+    """Receive a message from an IPC socket.
+
+    Returns:
+        The message type and the payload.
+
+    Raises:
+        RuntimeError: If the socket is closed or the data is not an IPC message.
+    """
+
+    magic, length, message_type = IPC_HEADER.unpack(
+        _receive_exactly(sock, IPC_HEADER.size)
+    )
+    if magic != IPC_MAGIC:
+        raise RuntimeError("Received an invalid IPC message")
+    return message_type, _receive_exactly(sock, length).decode("utf-8", "replace")
+
 
 def run_command(connection: Connection, command: str) -> None:
     """Run a command and checks the reply.
@@ -18,8 +695,14 @@ def run_command(connection: Connection, command: str) -> None:
     Raises:
         RuntimeError: If the command fails.
     """
+    run_sync(run_command_async(SyncConnectionAdapter(connection), command))
+
+
+async def run_command_async(connection: AsyncConnection, command: str) -> None:
+    """Asynchronous version of [run_command][sway_out.connection.run_command]."""
+
     logger.debug(f"Running command '{command}'")
-    replies = connection.command(command)
+    replies = await connection.command(command)
     check_replies(replies)
 
 
@@ -38,6 +721,26 @@ def run_command_on(con: Con, command: str) -> None:
     check_replies(replies)
 
 
+async def run_command_on_async(
+    connection: AsyncConnection, con: Con | int, command: str
+) -> None:
+    """Asynchronous version of [run_command_on][sway_out.connection.run_command_on].
+
+    Arguments:
+        connection: The Sway connection to use.
+        con: The container (or its con_id) to run the command on.
+        command: The command to run.
+
+    Raises:
+        RuntimeError: If the command fails.
+    """
+
+    con_id = con if isinstance(con, int) else con.id
+    logger.debug(f"Running command '{command}' on container {con_id}")
+    replies = await connection.command(f"[con_id={con_id}] {command}")
+    check_replies(replies)
+
+
 def check_replies(replies: list[CommandReply]):
     """Check a list of replies for errors.
 
@@ -53,6 +756,139 @@ def check_replies(replies: list[CommandReply]):
             raise RuntimeError(f"Command failed: {reply.error}")
 
 
+class CommandBatch:
+    """Collects commands and runs them with a single IPC message.
+
+    Every IPC message costs a round trip and a transaction in Sway. Commands
+    that do not depend on the tree state between them can be collected in a
+    batch instead. Commands on containers are prefixed with `con_id` criteria.
+    Consecutive commands on the same container share the criteria and are
+    chained with `,`, all other commands are separated by `;`.
+
+    Sway replies once per command, so the replies are mapped back to the
+    commands in order. Sway stops at the first invalid command, the commands
+    after it do not get a reply.
+
+    The batch can be used as a context manager, in which case it is executed
+    when the context is left without an exception. With an
+    [AsyncConnection][sway_out.connection.AsyncConnection], it has to be used
+    as an asynchronous context manager or executed with
+    [execute_async][sway_out.connection.CommandBatch.execute_async].
+
+    Arguments:
+        connection: The Sway connection to use.
+    """
+
+    def __init__(self, connection: Connection | AsyncConnection):
+        super().__init__()
+        self.connection = connection
+        self.commands: list[tuple[int | None, str]] = []
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.execute()
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            await self.execute_async()
+
+    def run_command(self, command: str) -> None:
+        """Add a command to the batch.
+
+        Arguments:
+            command: The command to run. It must be a single command, i.e. it
+                must not contain `;` or `,`.
+        """
+
+        self.commands.append((None, command))
+
+    def run_command_on(self, con: Con | int, command: str) -> None:
+        """Add a command on the given container to the batch.
+
+        Arguments:
+            con: The container (or its con_id) to run the command on.
+            command: The command to run. It must be a single command, i.e. it
+                must not contain `;` or `,`.
+        """
+
+        self.commands.append((con if isinstance(con, int) else con.id, command))
+
+    def payload(self) -> str:
+        """Build the IPC payload for the commands in the batch."""
+
+        parts: list[str] = []
+        previous_con_id: int | None = None
+        for con_id, command in self.commands:
+            if con_id is None:
+                parts.append(f"; {command}")
+            elif parts and con_id == previous_con_id:
+                parts.append(f", {command}")
+            else:
+                parts.append(f"; [con_id={con_id}] {command}")
+            previous_con_id = con_id
+        return "".join(parts).removeprefix("; ")
+
+    def execute(self) -> list[tuple[str, CommandReply | None]]:
+        """Run all commands in the batch and check the replies.
+
+        The batch is empty afterwards.
+
+        Returns:
+            The commands paired with their reply, `None` if the command was not
+            executed.
+
+        Raises:
+            RuntimeError: If at least one command fails or was not executed.
+        """
+
+        if not self.commands:
+            return []
+        payload = self.payload()
+        logger.debug(f"Running {len(self.commands)} batched command(s): '{payload}'")
+        replies = cast(Connection, self.connection).command(payload)
+        return self._check_replies(replies)
+
+    async def execute_async(self) -> list[tuple[str, CommandReply | None]]:
+        """Asynchronous version of [execute][sway_out.connection.CommandBatch.execute]."""
+
+        if not self.commands:
+            return []
+        payload = self.payload()
+        logger.debug(f"Running {len(self.commands)} batched command(s): '{payload}'")
+        replies = await cast(AsyncConnection, self.connection).command(payload)
+        return self._check_replies(replies)
+
+    def _check_replies(
+        self, replies: list[CommandReply]
+    ) -> list[tuple[str, CommandReply | None]]:
+        results = [
+            (
+                command if con_id is None else f"[con_id={con_id}] {command}",
+                replies[index] if index < len(replies) else None,
+            )
+            for index, (con_id, command) in enumerate(self.commands)
+        ]
+        self.commands = []
+
+        errors = []
+        for command, reply in results:
+            if reply is None:
+                errors.append(f"'{command}' was not executed")
+            else:
+                logger.debug(f"Command raw reply: {reply.ipc_data}")
+                if not reply.success:
+                    errors.append(f"'{command}' failed: {reply.error}")
+        if errors:
+            raise RuntimeError(f"Command failed: {'; '.join(errors)}")
+        return results
+
+
 def get_focused_workspace(connection: Connection) -> Con | None:
     """Get the currently focused workspace.
 
@@ -63,7 +899,13 @@ def get_focused_workspace(connection: Connection) -> Con | None:
         The con of the focused workspace, or None if no workspace is focused.
     """
 
-    tree = connection.get_tree()
+    return run_sync(get_focused_workspace_async(SyncConnectionAdapter(connection)))
+
+
+async def get_focused_workspace_async(connection: AsyncConnection) -> Con | None:
+    """Asynchronous version of [get_focused_workspace][sway_out.connection.get_focused_workspace]."""
+
+    tree = await connection.get_tree()
     focused = tree.find_focused()
     if focused is None:
         logger.warning("No focused con found.")
@@ -76,6 +918,111 @@ def get_focused_workspace(connection: Connection) -> Con | None:
     return focused
 
 
+@dataclass
+class TreeIndex:
+    """Lookup tables for a snapshot of the tree.
+
+    Searching the tree with `Con.find_by_id` or walking up with
+    `Con.workspace()` takes time proportional to the size of the tree. The
+    index answers these questions in constant time after a single walk of the
+    tree. Use [get_tree_index][sway_out.connection.get_tree_index] to build
+    it only once per snapshot.
+    """
+
+    tree: Con
+    """The root of the snapshot."""
+
+    cons: dict[int, Con]
+    """All cons in the snapshot, including floating ones, by their con_id."""
+
+    parents: dict[int, Con]
+    """The parents of the cons by their con_id."""
+
+    workspaces: dict[int, Con]
+    """The workspaces of the cons at or below the workspace level by their con_id."""
+
+    @classmethod
+    def build(cls, tree: Con) -> Self:
+        """Index a snapshot of the tree.
+
+        Arguments:
+            tree: The root of the snapshot.
+
+        Returns:
+            The index.
+        """
+
+        cons = {tree.id: tree}
+        parents = {}
+        workspaces = {}
+        stack = [tree]
+        while stack:
+            con = stack.pop()
+            workspace = con if con.type == "workspace" else workspaces.get(con.id)
+            for child in itertools.chain(con.nodes, con.floating_nodes):
+                cons[child.id] = child
+                parents[child.id] = con
+                if workspace is not None:
+                    workspaces[child.id] = workspace
+                stack.append(child)
+        return cls(tree, cons, parents, workspaces)
+
+    def find(self, con_id: int) -> Con | None:
+        """Find the con with the given con_id.
+
+        Returns:
+            The con or `None` if it is not in the snapshot.
+        """
+
+        return self.cons.get(con_id)
+
+    def parent(self, con_id: int) -> Con | None:
+        """Find the parent of the con with the given con_id.
+
+        Returns:
+            The parent or `None` for the root and cons not in the snapshot.
+        """
+
+        return self.parents.get(con_id)
+
+    def workspace(self, con_id: int) -> Con | None:
+        """Find the workspace of the con with the given con_id.
+
+        Returns:
+            The workspace itself for workspaces, or `None` if the con is above
+            the workspace level or not in the snapshot.
+        """
+
+        con = self.cons.get(con_id)
+        if con is not None and con.type == "workspace":
+            return con
+        return self.workspaces.get(con_id)
+
+
+_last_tree_index: TreeIndex | None = None
+"""The index of the snapshot used last, which is usually used again."""
+
+
+def get_tree_index(tree: Con) -> TreeIndex:
+    """Get the index of a snapshot of the tree.
+
+    The index of the last snapshot is kept, so a snapshot is only indexed
+    once as long as it is the current one.
+
+    Arguments:
+        tree: The root of the snapshot.
+
+    Returns:
+        The index.
+    """
+
+    global _last_tree_index
+
+    if _last_tree_index is None or _last_tree_index.tree is not tree:
+        _last_tree_index = TreeIndex.build(tree)
+    return _last_tree_index
+
+
 def find_con_by_id(connection: Connection, con_id: int) -> Con:
     """Finds a containers with the given con_id.
 
@@ -98,12 +1045,19 @@ def find_con_by_id(connection: Connection, con_id: int) -> Con:
     return find_cons_by_id(connection, con_id)[0]
 
 
+async def find_con_by_id_async(connection: AsyncConnection, con_id: int) -> Con:
+    """Asynchronous version of [find_con_by_id][sway_out.connection.find_con_by_id]."""
+
+    return (await find_cons_by_id_async(connection, con_id))[0]
+
+
 def find_cons_by_id(connection: Connection, *con_ids: int) -> tuple[Con, ...]:
     """Finds all containers with the given con_ids.
 
-    Each call to this function results in one IPC call. So passing multiple
-    con_ids at once reduces the number of IPC calls while also ensuring that
-    all con objects are consistent.
+    Each call to this function results in at most one IPC call (none if the
+    connection has a valid cached tree). So passing multiple con_ids at once
+    reduces the number of IPC calls while also ensuring that all con objects
+    are consistent.
 
     Arguments:
         connection: The Sway connection to use.
@@ -117,7 +1071,15 @@ def find_cons_by_id(connection: Connection, *con_ids: int) -> tuple[Con, ...]:
         RuntimeError: If a container with a given con_id is not found in the tree.
     """
 
-    result = find_cons_by_id_if_exists(connection, *con_ids)
+    return run_sync(find_cons_by_id_async(SyncConnectionAdapter(connection), *con_ids))
+
+
+async def find_cons_by_id_async(
+    connection: AsyncConnection, *con_ids: int
+) -> tuple[Con, ...]:
+    """Asynchronous version of [find_cons_by_id][sway_out.connection.find_cons_by_id]."""
+
+    result = await find_cons_by_id_if_exists_async(connection, *con_ids)
     missing_ids = [con_id for con_id, con in zip(con_ids, result) if con is None]
     if missing_ids:
         raise RuntimeError(
@@ -145,5 +1107,15 @@ def find_cons_by_id_if_exists(
         list matches the order of the con_ids.
     """
 
-    tree = connection.get_tree()
-    return tuple(tree.find_by_id(con_id) for con_id in con_ids)
+    return run_sync(
+        find_cons_by_id_if_exists_async(SyncConnectionAdapter(connection), *con_ids)
+    )
+
+
+async def find_cons_by_id_if_exists_async(
+    connection: AsyncConnection, *con_ids: int
+) -> tuple[Con | None, ...]:
+    """Asynchronous version of [find_cons_by_id_if_exists][sway_out.connection.find_cons_by_id_if_exists]."""
+
+    index = get_tree_index(await connection.get_tree())
+    return tuple(index.find(con_id) for con_id in con_ids)
@@ -0,0 +1,233 @@
+"""A resident process that runs commands forwarded by the client.
+
+`sway-out daemon` keeps the connection to Sway, the cached tree and the parsed
+layout files in memory and runs the commands it receives from
+[sway_out.client][sway_out.client] on them. Commands are run one after
+another, so concurrent key presses cannot apply layouts on top of each other.
+
+While idle, the daemon consumes the events of its connection and fetches the
+tree again once they settle, so the tree is up to date when the next command
+arrives.
+"""
+
+import io
+import logging
+import os
+import selectors
+import socket
+import stat
+from collections.abc import Callable
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import TextIO
+
+from .connection import SwayConnection
+from .forwarding import (
+    FORWARDED_COMMANDS,
+    can_forward,
+    receive_message,
+    send_message,
+)
+from .layout_cache import load_layout_configuration_cached
+from .layout_files import Layout
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_DELAY = 0.1
+"""Seconds without events after which the tree is fetched in the background."""
+
+LAYOUT_CACHE_SIZE = 16
+"""The maximum number of parsed layout files kept in memory."""
+
+
+class LayoutCache:
+    """Parsed layout files, keyed by the identity and the state of the file.
+
+    A file is parsed again if its modification time or size changed. Files
+    that are not regular files, e.g. pipes, are never cached.
+    """
+
+    def __init__(self, size: int = LAYOUT_CACHE_SIZE):
+        super().__init__()
+        self.size = size
+        self._layouts: dict[tuple[int, int, int, int], Layout] = {}
+
+    def load(self, file: TextIO) -> Layout:
+        """Load a layout configuration, reusing the parsed layout if possible.
+
+        Arguments:
+            file: The source file.
+
+        Raises:
+            yaml.YAMLError:
+                When the file does not contain valid YAML.
+            pydantic.ValidationError:
+                When the YAML is ill-formed.
+
+        Returns:
+            A copy of the configuration object that can be modified.
+        """
+
+        try:
+            file_stat = os.fstat(file.fileno())
+        except (OSError, io.UnsupportedOperation):
+            return load_layout_configuration_cached(file)
+        if not stat.S_ISREG(file_stat.st_mode):
+            return load_layout_configuration_cached(file)
+
+        key = (
+            file_stat.st_dev,
+            file_stat.st_ino,
+            file_stat.st_mtime_ns,
+            file_stat.st_size,
+        )
+        layout = self._layouts.pop(key, None)
+        if layout is None:
+            logger.debug(f"Parsing layout file {getattr(file, 'name', file)}")
+            layout = load_layout_configuration_cached(file)
+        self._layouts[key] = layout
+        while len(self._layouts) > self.size:
+            del self._layouts[next(iter(self._layouts))]
+        # Applying a layout stores container IDs in it.
+        return layout.model_copy(deep=True)
+
+
+class Daemon:
+    """Serves the commands forwarded by the client on a Unix socket.
+
+    Arguments:
+        connection: The connection to keep up to date while idle.
+        socket_path: The path of the socket to listen on.
+        run_command: Runs a command given as command line arguments and
+            returns its exit code. Its output is sent to the client.
+    """
+
+    def __init__(
+        self,
+        connection: SwayConnection,
+        socket_path: Path,
+        run_command: Callable[[list[str]], int],
+    ):
+        super().__init__()
+        self.connection = connection
+        self.socket_path = socket_path
+        self.run_command = run_command
+        self._stop_reader, self._stop_writer = socket.socketpair()
+
+    def serve(self) -> None:
+        """Serve commands until the daemon is stopped.
+
+        The daemon stops when [stop][sway_out.daemon.Daemon.stop] is called or
+        when the connection to Sway is lost.
+
+        Raises:
+            RuntimeError: If another daemon is listening on the socket.
+        """
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            self._bind(server)
+            try:
+                self._serve(server)
+            finally:
+                self.socket_path.unlink(missing_ok=True)
+
+    def stop(self) -> None:
+        """Make [serve][sway_out.daemon.Daemon.serve] return.
+
+        This can be called from another thread.
+        """
+
+        self._stop_writer.send(b"\0")
+
+    def _bind(self, server: socket.socket) -> None:
+        if self.socket_path.exists():
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(str(self.socket_path))
+                except ConnectionRefusedError:
+                    logger.info(f"Removing stale socket {self.socket_path}")
+                    self.socket_path.unlink()
+                else:
+                    raise RuntimeError(
+                        f"Another daemon is listening on {self.socket_path}"
+                    )
+        server.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        server.listen()
+        logger.info(f"Listening on {self.socket_path}")
+
+    def _serve(self, server: socket.socket) -> None:
+        event_fileno = self.connection.event_fileno
+        if event_fileno is None:
+            logger.warning("No event subscription, the tree is not kept up to date")
+
+        with selectors.DefaultSelector() as selector:
+            selector.register(server, selectors.EVENT_READ, "client")
+            selector.register(self._stop_reader, selectors.EVENT_READ, "stop")
+            if event_fileno is not None:
+                selector.register(event_fileno, selectors.EVENT_READ, "events")
+
+            tree_outdated = True
+            while True:
+                ready = selector.select(PREFETCH_DELAY if tree_outdated else None)
+                if not ready:
+                    logger.debug("Fetching the tree in the background")
+                    self.connection.get_tree()
+                    tree_outdated = False
+                for key, _ in ready:
+                    if key.data == "stop":
+                        logger.info("Stopping the daemon")
+                        return
+                    elif key.data == "events":
+                        self.connection.process_events()
+                        if self.connection.event_fileno is None:
+                            logger.info("Lost the connection to Sway, stopping")
+                            return
+                    else:
+                        client, _ = server.accept()
+                        with client:
+                            self._handle_client(client)
+                    tree_outdated = True
+
+    def _handle_client(self, client: socket.socket) -> None:
+        try:
+            request = receive_message(client)
+        except (OSError, RuntimeError, ValueError) as e:
+            logger.warning(f"Failed to receive a request: {e}")
+            return
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        args = request.get("args")
+        if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+            stderr.write(f"Invalid request: {request}\n")
+            exit_code = 2
+        elif not can_forward(args):
+            stderr.write(
+                f"The daemon only runs {', '.join(sorted(FORWARDED_COMMANDS))}, "
+                + "and not save --watch\n"
+            )
+            exit_code = 2
+        else:
+            logger.info(f"Running forwarded command: {args}")
+            try:
+                # File arguments are relative to the working directory of the client.
+                os.chdir(request.get("cwd", "/"))
+            except (OSError, TypeError) as e:
+                stderr.write(f"Failed to change the working directory: {e}\n")
+                exit_code = 1
+            else:
+                with redirect_stdout(stdout), redirect_stderr(stderr):
+                    exit_code = self.run_command(args)
+
+        try:
+            send_message(
+                client,
+                {
+                    "exit_code": exit_code,
+                    "stdout": stdout.getvalue(),
+                    "stderr": stderr.getvalue(),
+                },
+            )
+        except OSError as e:
+            logger.warning(f"Failed to send the reply: {e}")
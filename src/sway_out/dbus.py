@@ -0,0 +1,490 @@
+"""A minimal D-Bus client, just enough to call methods on the session bus.
+
+Only the standard library is used: the client authenticates with the
+`EXTERNAL` mechanism over a Unix socket, calls methods and waits for their
+replies. Signals and other messages that are not a reply are skipped.
+
+Values are marshalled according to their D-Bus signature. The basic types
+`y`, `b`, `n`, `q`, `i`, `u`, `x`, `t`, `d`, `s`, `o` and `g` are supported as
+well as arrays (lists, or dicts for arrays of dict entries), structs (tuples)
+and variants, which are given as a tuple of the signature and the value.
+
+See the [D-Bus specification](https://dbus.freedesktop.org/doc/dbus-specification.html).
+"""
+
+import itertools
+import logging
+import os
+import socket
+import struct
+import threading
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SESSION_BUS_ADDRESS_VARIABLE = "DBUS_SESSION_BUS_ADDRESS"
+"""The environment variable with the address of the session bus."""
+
+DEFAULT_TIMEOUT = 2.0
+"""Seconds to wait for the bus before giving up."""
+
+METHOD_CALL = 1
+METHOD_RETURN = 2
+ERROR = 3
+SIGNAL = 4
+
+FIELD_PATH = 1
+FIELD_INTERFACE = 2
+FIELD_MEMBER = 3
+FIELD_ERROR_NAME = 4
+FIELD_REPLY_SERIAL = 5
+FIELD_DESTINATION = 6
+FIELD_SENDER = 7
+FIELD_SIGNATURE = 8
+
+_FIXED_TYPES = {
+    "y": "B",
+    "b": "I",
+    "n": "h",
+    "q": "H",
+    "i": "i",
+    "u": "I",
+    "x": "q",
+    "t": "Q",
+    "d": "d",
+}
+"""The struct format of the fixed-size types."""
+
+_ALIGNMENT = {"s": 4, "o": 4, "g": 1, "a": 4, "(": 8, "{": 8, "v": 1} | {
+    code: struct.calcsize(struct_format) for code, struct_format in _FIXED_TYPES.items()
+}
+"""The alignment of the types by their first type code."""
+
+_HEADER_FIELD_TYPES = {
+    FIELD_PATH: "o",
+    FIELD_INTERFACE: "s",
+    FIELD_MEMBER: "s",
+    FIELD_ERROR_NAME: "s",
+    FIELD_REPLY_SERIAL: "u",
+    FIELD_DESTINATION: "s",
+    FIELD_SENDER: "s",
+    FIELD_SIGNATURE: "g",
+}
+
+
+class DBusError(RuntimeError):
+    """An error reply to a method call.
+
+    Arguments:
+        name: The name of the error, e.g.
+            `org.freedesktop.DBus.Error.ServiceUnknown`.
+        message: The message of the error, if there is one.
+    """
+
+    def __init__(self, name: str, message: str = ""):
+        super().__init__(f"{name}: {message}" if message else name)
+        self.name = name
+
+
+@dataclass
+class Message:
+    """A D-Bus message."""
+
+    type: int
+    """The message type, e.g. [METHOD_CALL][sway_out.dbus.METHOD_CALL]."""
+
+    serial: int
+    """The serial number of the message, unique per sender."""
+
+    fields: dict[int, Any] = field(default_factory=dict)
+    """The header fields by their code, e.g. [FIELD_MEMBER][sway_out.dbus.FIELD_MEMBER]."""
+
+    body: list[Any] = field(default_factory=list)
+    """The arguments, according to the `FIELD_SIGNATURE` header field."""
+
+    flags: int = 0
+    """The flags of the message."""
+
+    def encode(self) -> bytes:
+        """Marshal the message in little-endian byte order.
+
+        Returns:
+            The bytes to send.
+        """
+
+        signature = self.fields.get(FIELD_SIGNATURE, "")
+        body = _Writer()
+        for code, value in zip(split_signature(signature), self.body, strict=True):
+            body.write(code, value)
+
+        header = _Writer()
+        header.write("y", ord("l"))
+        header.write("y", self.type)
+        header.write("y", self.flags)
+        header.write("y", 1)
+        header.write("u", len(body.data))
+        header.write("u", self.serial)
+        header.write(
+            "a(yv)",
+            [
+                (code, (_HEADER_FIELD_TYPES[code], value))
+                for code, value in self.fields.items()
+            ],
+        )
+        header.align(8)
+        return bytes(header.data + body.data)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Message":
+        """Unmarshal a message.
+
+        Arguments:
+            data: Exactly one message, see
+                [get_message_length][sway_out.dbus.get_message_length].
+
+        Raises:
+            ValueError: If the message is malformed.
+
+        Returns:
+            The message.
+        """
+
+        reader = _Reader(data, _get_byte_order(data))
+        _, message_type, flags, _, _, serial = reader.read("(yyyyuu)")
+        fields = dict(reader.read("a(yv)"))
+        reader.align(8)
+        body = [
+            reader.read(code)
+            for code in split_signature(fields.get(FIELD_SIGNATURE, ""))
+        ]
+        return cls(message_type, serial, fields, body, flags)
+
+
+def get_message_length(data: bytes) -> int | None:
+    """Get the length of the message at the start of the data.
+
+    Arguments:
+        data: The received data.
+
+    Raises:
+        ValueError: If the data does not start with a message.
+
+    Returns:
+        The length of the whole message or `None` if not even its fixed
+        header has been received yet.
+    """
+
+    if len(data) < 16:
+        return None
+    byte_order = _get_byte_order(data)
+    body_length, _, fields_length = struct.unpack_from(f"{byte_order}III", data, 4)
+    header_length = 16 + fields_length
+    return header_length + (-header_length % 8) + body_length
+
+
+def split_signature(signature: str) -> list[str]:
+    """Split a signature into its complete types.
+
+    Arguments:
+        signature: The signature, e.g. `susssasa{sv}i`.
+
+    Raises:
+        ValueError: If the signature is malformed.
+
+    Returns:
+        The complete types, e.g. `["s", "u", "s", "s", "s", "as", "a{sv}", "i"]`.
+    """
+
+    codes = []
+    start = 0
+    while start < len(signature):
+        try:
+            end = _get_type_end(signature, start)
+        except IndexError:
+            raise ValueError(f"Incomplete signature {signature!r}") from None
+        codes.append(signature[start:end])
+        start = end
+    return codes
+
+
+def get_session_bus_address() -> str:
+    """Get the address of the session bus from the environment.
+
+    Raises:
+        RuntimeError: If the address is not set.
+
+    Returns:
+        The address.
+    """
+
+    address = os.environ.get(SESSION_BUS_ADDRESS_VARIABLE)
+    if not address:
+        raise RuntimeError(f"${SESSION_BUS_ADDRESS_VARIABLE} is not set")
+    return address
+
+
+class DBusConnection:
+    """A connection to a message bus.
+
+    Method calls are serialized, so the connection can be shared by threads.
+
+    Arguments:
+        address: The address of the bus. Defaults to the session bus, see
+            [get_session_bus_address][sway_out.dbus.get_session_bus_address].
+        timeout: How long to wait for the bus in seconds.
+
+    Raises:
+        OSError: If connecting to the bus fails.
+        RuntimeError: If the bus rejects the connection.
+    """
+
+    def __init__(self, address: str | None = None, timeout: float = DEFAULT_TIMEOUT):
+        super().__init__()
+        if address is None:
+            address = get_session_bus_address()
+        self._socket = _connect(address, timeout)
+        self._serials = itertools.count(1)
+        self._buffer = b""
+        self._lock = threading.Lock()
+        try:
+            self._authenticate()
+            (self.unique_name,) = self.call(
+                "org.freedesktop.DBus",
+                "/org/freedesktop/DBus",
+                "org.freedesktop.DBus",
+                "Hello",
+            )
+        except BaseException:
+            self._socket.close()
+            raise
+        logger.debug(f"Connected to D-Bus as {self.unique_name}")
+
+    def call(
+        self,
+        destination: str,
+        path: str,
+        interface: str,
+        member: str,
+        signature: str = "",
+        args: list[Any] | None = None,
+    ) -> list[Any]:
+        """Call a method and wait for its reply.
+
+        Arguments:
+            destination: The bus name of the service.
+            path: The object path.
+            interface: The interface of the method.
+            member: The name of the method.
+            signature: The signature of the arguments.
+            args: The arguments.
+
+        Raises:
+            DBusError: If the service replied with an error.
+            OSError: If the connection failed.
+            RuntimeError: If the bus closed the connection.
+
+        Returns:
+            The values in the reply.
+        """
+
+        fields: dict[int, Any] = {
+            FIELD_PATH: path,
+            FIELD_INTERFACE: interface,
+            FIELD_MEMBER: member,
+            FIELD_DESTINATION: destination,
+        }
+        if signature:
+            fields[FIELD_SIGNATURE] = signature
+        with self._lock:
+            serial = next(self._serials)
+            message = Message(METHOD_CALL, serial, fields, list(args or []))
+            self._socket.sendall(message.encode())
+            while True:
+                reply = self._receive()
+                if reply.fields.get(FIELD_REPLY_SERIAL) != serial:
+                    continue
+                if reply.type == ERROR:
+                    raise DBusError(
+                        reply.fields.get(FIELD_ERROR_NAME, ""),
+                        reply.body[0] if reply.body else "",
+                    )
+                return reply.body
+
+    def close(self) -> None:
+        """Close the connection."""
+
+        self._socket.close()
+
+    def _authenticate(self) -> None:
+        uid = str(os.getuid()).encode().hex()
+        self._socket.sendall(b"\0AUTH EXTERNAL " + uid.encode() + b"\r\n")
+        line = self._receive_line()
+        if not line.startswith(b"OK "):
+            raise RuntimeError(f"D-Bus authentication failed: {line!r}")
+        self._socket.sendall(b"BEGIN\r\n")
+
+    def _receive_line(self) -> bytes:
+        while b"\r\n" not in self._buffer:
+            self._receive_more()
+        line, self._buffer = self._buffer.split(b"\r\n", 1)
+        return line
+
+    def _receive(self) -> Message:
+        while (length := self._get_message_length()) is None or len(
+            self._buffer
+        ) < length:
+            self._receive_more()
+        data, self._buffer = self._buffer[:length], self._buffer[length:]
+        try:
+            return Message.decode(data)
+        except (ValueError, struct.error) as e:
+            raise RuntimeError(f"Received an invalid message: {e}") from e
+
+    def _get_message_length(self) -> int | None:
+        try:
+            return get_message_length(self._buffer)
+        except ValueError as e:
+            raise RuntimeError(f"Received an invalid message: {e}") from e
+
+    def _receive_more(self) -> None:
+        chunk = self._socket.recv(65536)
+        if not chunk:
+            raise RuntimeError("The bus closed the connection")
+        self._buffer += chunk
+
+
+def _connect(address: str, timeout: float) -> socket.socket:
+    """Connect to the first reachable Unix socket in a D-Bus address."""
+
+    error: OSError | None = None
+    for entry in address.split(";"):
+        transport, _, parameters = entry.partition(":")
+        if transport != "unix":
+            continue
+        options = dict(
+            parameter.split("=", 1)
+            for parameter in parameters.split(",")
+            if "=" in parameter
+        )
+        if "path" in options:
+            path = urllib.parse.unquote(options["path"])
+        elif "abstract" in options:
+            path = "\0" + urllib.parse.unquote(options["abstract"])
+        else:
+            continue
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            sock.close()
+            error = e
+            continue
+        return sock
+    if error is not None:
+        raise error
+    raise RuntimeError(f"No supported transport in the D-Bus address {address!r}")
+
+
+def _get_byte_order(data: bytes) -> str:
+    if data[:1] == b"l":
+        return "<"
+    elif data[:1] == b"B":
+        return ">"
+    raise ValueError(f"Invalid byte order {data[:1]!r}")
+
+
+def _get_type_end(signature: str, start: int) -> int:
+    code = signature[start]
+    if code == "a":
+        return _get_type_end(signature, start + 1)
+    if code in "({":
+        closing = ")" if code == "(" else "}"
+        end = start + 1
+        while signature[end] != closing:
+            end = _get_type_end(signature, end)
+        return end + 1
+    if code not in _ALIGNMENT or code in ")}":
+        raise ValueError(f"Unsupported type {code!r} in signature {signature!r}")
+    return start + 1
+
+
+class _Writer:
+    def __init__(self):
+        super().__init__()
+        self.data = bytearray()
+
+    def align(self, alignment: int) -> None:
+        self.data += bytes(-len(self.data) % alignment)
+
+    def write(self, code: str, value: Any) -> None:
+        kind = code[0]
+        self.align(_ALIGNMENT[kind])
+        if kind in _FIXED_TYPES:
+            self.data += struct.pack(f"<{_FIXED_TYPES[kind]}", value)
+        elif kind in "so":
+            encoded = value.encode()
+            self.data += struct.pack("<I", len(encoded)) + encoded + b"\0"
+        elif kind == "g":
+            encoded = value.encode()
+            self.data += struct.pack("<B", len(encoded)) + encoded + b"\0"
+        elif kind == "a":
+            length_offset = len(self.data)
+            self.data += bytes(4)
+            element = code[1:]
+            self.align(_ALIGNMENT[element[0]])
+            start = len(self.data)
+            items = value.items() if element[0] == "{" else value
+            for item in items:
+                self.write(element, item)
+            struct.pack_into("<I", self.data, length_offset, len(self.data) - start)
+        elif kind in "({":
+            for member, member_value in zip(
+                split_signature(code[1:-1]), value, strict=True
+            ):
+                self.write(member, member_value)
+        elif kind == "v":
+            signature, variant_value = value
+            self.write("g", signature)
+            self.write(signature, variant_value)
+
+
+class _Reader:
+    def __init__(self, data: bytes, byte_order: str):
+        super().__init__()
+        self.data = data
+        self.byte_order = byte_order
+        self.offset = 0
+
+    def align(self, alignment: int) -> None:
+        self.offset += -self.offset % alignment
+
+    def read(self, code: str) -> Any:
+        kind = code[0]
+        self.align(_ALIGNMENT[kind])
+        if kind in _FIXED_TYPES:
+            struct_format = f"{self.byte_order}{_FIXED_TYPES[kind]}"
+            (value,) = struct.unpack_from(struct_format, self.data, self.offset)
+            self.offset += struct.calcsize(struct_format)
+            return value
+        elif kind in "sog":
+            length = self.read("y" if kind == "g" else "u")
+            value = self.data[self.offset : self.offset + length].decode()
+            self.offset += length + 1
+            return value
+        elif kind == "a":
+            length = self.read("u")
+            element = code[1:]
+            self.align(_ALIGNMENT[element[0]])
+            end = self.offset + length
+            items = []
+            while self.offset < end:
+                items.append(self.read(element))
+            return dict(items) if element[0] == "{" else items
+        elif kind in "({":
+            return tuple(self.read(member) for member in split_signature(code[1:-1]))
+        elif kind == "v":
+            return self.read(self.read("g"))
+        raise ValueError(f"Unsupported type {code!r}")
@@ -0,0 +1,113 @@
+"""The protocol between `sway-out-client` and the daemon.
+
+The client sends the command line arguments of a command to the daemon,
+which runs the command and replies with its exit code and output, see
+[sway_out.client][] and [sway_out.daemon][]. Like the client, this module
+only imports the standard library.
+"""
+
+import json
+import os
+import socket
+from typing import Any
+
+SOCKET_ENVIRONMENT_VARIABLE = "SWAY_OUT_SOCKET"
+"""The environment variable to override the socket path of the daemon."""
+
+FORWARDED_COMMANDS = {"apply", "save", "check"}
+"""The commands that are forwarded to the daemon."""
+
+GLOBAL_OPTIONS_WITH_VALUES = {"--log-level"}
+"""The global options that take a value as the next argument."""
+
+
+def get_socket_path() -> str:
+    """Get the path of the socket the daemon listens on.
+
+    This is `$SWAY_OUT_SOCKET` if set, otherwise `sway-out.sock` in
+    `$XDG_RUNTIME_DIR`. Without a runtime directory, the socket is placed in
+    the temporary directory with the user ID in its name.
+
+    Returns:
+        The socket path.
+    """
+
+    if SOCKET_ENVIRONMENT_VARIABLE in os.environ:
+        return os.environ[SOCKET_ENVIRONMENT_VARIABLE]
+    if "XDG_RUNTIME_DIR" in os.environ:
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "sway-out.sock")
+    # Only needed in the fallback, importing it takes a noticeable time.
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f"sway-out-{os.getuid()}.sock")
+
+
+def get_command(args: list[str]) -> str | None:
+    """Get the command from command line arguments.
+
+    Arguments:
+        args: The command line arguments, without the program name.
+
+    Returns:
+        The command or `None` if there is none.
+    """
+
+    arguments = iter(args)
+    for arg in arguments:
+        if arg in GLOBAL_OPTIONS_WITH_VALUES:
+            # Skip the value, unless it is given as `--option=value`.
+            next(arguments, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+def can_forward(args: list[str]) -> bool:
+    """Check whether a command can be run by the daemon.
+
+    `save --watch` never finishes, so it would block the daemon.
+
+    Arguments:
+        args: The command line arguments, without the program name.
+
+    Returns:
+        `True` if the command can be forwarded.
+    """
+
+    return get_command(args) in FORWARDED_COMMANDS and "--watch" not in args
+
+
+def send_message(sock: socket.socket, message: dict[str, Any]) -> None:
+    """Send a message to the other end of a daemon connection.
+
+    Messages are JSON objects on a single line.
+
+    Arguments:
+        sock: The connected socket.
+        message: The message to send.
+    """
+
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def receive_message(sock: socket.socket) -> dict[str, Any]:
+    """Receive a message from the other end of a daemon connection.
+
+    Arguments:
+        sock: The connected socket.
+
+    Raises:
+        RuntimeError: If the connection is closed before a complete message
+            has been received.
+
+    Returns:
+        The received message.
+    """
+
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise RuntimeError("The connection was closed during a message")
+        data += chunk
+    return json.loads(data)
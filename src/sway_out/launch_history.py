@@ -0,0 +1,299 @@
+"""A history of how long applications take to open their window.
+
+The time from `exec` to the window is measured for every launched
+application and stored per launch command and match expression in
+`launch-history.json` in [get_cache_home][sway_out.utils.get_cache_home].
+
+Once an application has been launched
+[MIN_SAMPLES][sway_out.launch_history.MIN_SAMPLES] times, the history replaces
+the fixed [LAUNCH_TIMEOUT_SECONDS][sway_out.applications.LAUNCH_TIMEOUT_SECONDS]:
+the timeout is the 99th percentile of the measured times, multiplied by
+[TIMEOUT_FACTOR][sway_out.launch_history.TIMEOUT_FACTOR] plus
+[TIMEOUT_MARGIN_SECONDS][sway_out.launch_history.TIMEOUT_MARGIN_SECONDS].
+So a slow application gets more time and a broken command fails early. When
+launching concurrently, the slowest applications are started first.
+
+A launch that misses its timeout cannot be measured. Instead, the next
+timeout of the application is the missed one multiplied by
+[BACKOFF_FACTOR][sway_out.launch_history.BACKOFF_FACTOR], so that an
+application that became slower is not cut off by its old launch times again
+and again. The next measured launch replaces the backoff.
+"""
+
+import json
+import logging
+import math
+import time
+from pathlib import Path
+from typing import Any
+
+from .layout_files import ApplicationLaunchConfig
+from .utils import get_cache_home, write_atomically
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 20
+"""The number of launches remembered per application."""
+
+MAX_APPLICATIONS = 256
+"""The number of applications remembered.
+
+The applications launched least recently are forgotten first.
+"""
+
+MIN_SAMPLES = 3
+"""The number of launches after which the history determines the timeout."""
+
+TIMEOUT_FACTOR = 1.5
+"""The factor applied to the 99th percentile of the launch times."""
+
+TIMEOUT_MARGIN_SECONDS = 1.0
+"""The time added to the scaled 99th percentile of the launch times."""
+
+BACKOFF_FACTOR = 2.0
+"""The factor applied to a timeout that an application missed."""
+
+MIN_TIMEOUT_SECONDS = 2.0
+"""The lower bound of the timeouts based on the history."""
+
+MAX_TIMEOUT_SECONDS = 60.0
+"""The upper bound of the timeouts based on the history."""
+
+
+def get_history_path() -> Path:
+    """Get the path of the history file.
+
+    Returns:
+        `launch-history.json` in [get_cache_home][sway_out.utils.get_cache_home].
+    """
+
+    return get_cache_home() / "launch-history.json"
+
+
+def get_launch_key(launch_config: ApplicationLaunchConfig) -> str:
+    """Identify the application of a launch configuration in the history.
+
+    Parameters:
+        launch_config: The launch configuration.
+
+    Returns:
+        The key of the launch command and the match expression.
+    """
+
+    return json.dumps(
+        [launch_config.cmd, launch_config.match.model_dump(mode="json")],
+        sort_keys=True,
+    )
+
+
+class LaunchHistory:
+    """The launch times of applications.
+
+    Parameters:
+        path: The history file. Defaults to
+            [get_history_path][sway_out.launch_history.get_history_path].
+    """
+
+    def __init__(self, path: Path | None = None):
+        super().__init__()
+        self.path = path if path is not None else get_history_path()
+        self.recorded: dict[str, list[float]] = {}
+        """The launch times measured since the history was loaded."""
+        self.missed: dict[str, float] = {}
+        """The timeouts missed since the history was loaded."""
+        self._entries: dict[str, dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "LaunchHistory":
+        """Load the history from a file.
+
+        A missing or unreadable file results in an empty history.
+
+        Parameters:
+            path: The history file. Defaults to
+                [get_history_path][sway_out.launch_history.get_history_path].
+
+        Returns:
+            The history.
+        """
+
+        history = cls(path)
+        try:
+            with history.path.open() as file:
+                entries = json.load(file)["applications"]
+            if not isinstance(entries, dict):
+                raise ValueError("applications is not an object")
+        except FileNotFoundError:
+            return history
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(
+                f"Ignoring the unreadable launch history {history.path}: {e}"
+            )
+            return history
+        history._entries = {k: v for k, v in entries.items() if isinstance(v, dict)}
+        return history
+
+    def save(self) -> None:
+        """Write the history to its file, if anything has been recorded.
+
+        Failing to write the file is logged and otherwise ignored.
+        """
+
+        if not self.recorded and not self.missed:
+            return
+        entries = dict(
+            sorted(self._entries.items(), key=lambda e: e[1].get("launched", 0))[
+                -MAX_APPLICATIONS:
+            ]
+        )
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # Concurrent runs never see a partially written history.
+            write_atomically(self.path, json.dumps({"applications": entries}))
+        except OSError as e:
+            logger.warning(f"Failed to save the launch history: {e}")
+            return
+        logger.debug(f"Saved the launch history to {self.path}")
+
+    def record(self, launch_config: ApplicationLaunchConfig, seconds: float) -> None:
+        """Record the time an application took to open its window.
+
+        Parameters:
+            launch_config: The launch configuration of the application.
+            seconds: The time from the launch to the window.
+        """
+
+        key = get_launch_key(launch_config)
+        samples = [*self._get_samples(key), seconds][-HISTORY_SIZE:]
+        self._entries[key] = {"samples": samples, "launched": time.time()}
+        self.recorded.setdefault(key, []).append(seconds)
+
+    def record_timeout(
+        self, launch_config: ApplicationLaunchConfig, timeout_seconds: float
+    ) -> None:
+        """Record that an application did not open its window in time.
+
+        Until the next launch is measured, the timeout of the application is
+        the missed one multiplied by
+        [BACKOFF_FACTOR][sway_out.launch_history.BACKOFF_FACTOR], up to
+        [MAX_TIMEOUT_SECONDS][sway_out.launch_history.MAX_TIMEOUT_SECONDS].
+
+        Parameters:
+            launch_config: The launch configuration of the application.
+            timeout_seconds: The timeout that the application missed.
+        """
+
+        key = get_launch_key(launch_config)
+        self._entries[key] = {
+            **self._entries.get(key, {}),
+            "backoff": min(timeout_seconds * BACKOFF_FACTOR, MAX_TIMEOUT_SECONDS),
+            "launched": time.time(),
+        }
+        self.missed[key] = timeout_seconds
+
+    def get_samples(self, launch_config: ApplicationLaunchConfig) -> list[float]:
+        """Get the recorded launch times of an application.
+
+        Parameters:
+            launch_config: The launch configuration of the application.
+
+        Returns:
+            The launch times in seconds, oldest first.
+        """
+
+        return self._get_samples(get_launch_key(launch_config))
+
+    def get_expected_seconds(
+        self, launch_config: ApplicationLaunchConfig
+    ) -> float | None:
+        """Get the median launch time of an application.
+
+        Parameters:
+            launch_config: The launch configuration of the application.
+
+        Returns:
+            The median in seconds or `None` if the application has never been
+            launched.
+        """
+
+        samples = self.get_samples(launch_config)
+        if not samples:
+            return None
+        return _get_percentile(samples, 50)
+
+    def get_timeout(
+        self, launch_config: ApplicationLaunchConfig, default: float
+    ) -> float:
+        """Get how long to wait for the window of an application.
+
+        Parameters:
+            launch_config: The launch configuration of the application.
+            default: The timeout if there are not enough samples.
+
+        Returns:
+            The timeout in seconds.
+        """
+
+        return self._get_timeout(get_launch_key(launch_config), default)
+
+    def summary(self, default_timeout: float) -> str:
+        """Summarize the applications launched since the history was loaded.
+
+        Parameters:
+            default_timeout: The timeout if there are not enough samples.
+
+        Returns:
+            A table with the times measured in this run and the ones learned
+            from the history, or an empty string if nothing has been launched.
+        """
+
+        if not self.recorded:
+            return ""
+        rows = [("application", "ms", "samples", "p50 ms", "p99 ms", "timeout s")]
+        for key, seconds in self.recorded.items():
+            command, _ = json.loads(key)
+            samples = self._get_samples(key)
+            rows.append(
+                (
+                    command if isinstance(command, str) else " ".join(command),
+                    ", ".join(f"{s * 1000:.0f}" for s in seconds),
+                    str(len(samples)),
+                    f"{_get_percentile(samples, 50) * 1000:.0f}",
+                    f"{_get_percentile(samples, 99) * 1000:.0f}",
+                    f"{self._get_timeout(key, default_timeout):.1f}",
+                )
+            )
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+
+    def _get_samples(self, key: str) -> list[float]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return []
+        return [float(s) for s in entry.get("samples", [])]
+
+    def _get_timeout(self, key: str, default: float) -> float:
+        samples = self._get_samples(key)
+        if len(samples) < MIN_SAMPLES:
+            timeout = default
+        else:
+            timeout = (
+                _get_percentile(samples, 99) * TIMEOUT_FACTOR + TIMEOUT_MARGIN_SECONDS
+            )
+            timeout = min(max(timeout, MIN_TIMEOUT_SECONDS), MAX_TIMEOUT_SECONDS)
+        # The backoff after a missed timeout is replaced by the next sample.
+        return max(timeout, float(self._entries.get(key, {}).get("backoff", 0)))
+
+
+def _get_percentile(samples: list[float], percent: int) -> float:
+    """Get a percentile with the nearest-rank method."""
+
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(len(ordered) * percent / 100), 1) - 1]
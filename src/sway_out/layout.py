@@ -2,27 +2,45 @@
 
 import itertools
 import logging
+import math
+import secrets
+from collections.abc import Sequence
+from fractions import Fraction
 from typing import Literal, cast
 
 from i3ipc import Con, Connection
 
 from .connection import (
-    find_con_by_id,
-    find_cons_by_id,
-    find_cons_by_id_if_exists,
-    run_command_on,
+    AsyncConnection,
+    CommandBatch,
+    SyncConnectionAdapter,
+    find_cons_by_id_async,
+    get_tree_index,
+    run_command_on_async,
+    run_sync,
 )
-from .layout_files import ApplicationLaunchConfig, ContainerConfig, WorkspaceLayout
+from .layout_files import (
+    ApplicationLaunchConfig,
+    ContainerConfig,
+    WorkspaceLayout,
+    get_launch_configs,
+)
+from .marks import has_marks_async
+from .outputs import is_workspace_on_output_async
 from .utils import get_con_description, is_window
 
 logger = logging.getLogger(__name__)
 
-MARK = "@"
-"""The layouting algorithm requires a mark to move windows around.
+MARK_PREFIX = "_sway-out"
+"""The prefix of the marks the layouting algorithm uses to move windows around.
 
-This should be something that is not in use otherwise.
+Sway does not show marks starting with an underscore in title bars. See
+[get_layout_mark][sway_out.layout.get_layout_mark] for the complete mark.
 """
 
+_RUN_ID = secrets.token_hex(4)
+"""Identifies this run of sway-out in the marks it uses."""
+
 RESIZE_ATTEMPTS = 5
 """Number of attempts to resize a container to the expected size."""
 
@@ -35,92 +53,197 @@ applied.
 """
 
 
-def dissolve_layout(connection: Connection, workspace_con: Con) -> None:
-    """Dissolves the layout of the given workspace.
+def get_layout_mark(workspace_id: int) -> str:
+    """Get the mark used to move windows into containers on a workspace.
 
-    After this function, all windows are direct children of the workspace.
+    The mark is unique for this run and the workspace, so several workspaces
+    can be under construction at once, even by concurrent runs.
+
+    Parameters:
+        workspace_id: The con_id of the workspace under construction.
+
+    Returns:
+        The mark.
+    """
+
+    return f"{MARK_PREFIX}-{_RUN_ID}-{workspace_id}"
+
+
+def move_windows_to_workspace(
+    connection: Connection, workspace_name: str, workspace_layout: WorkspaceLayout
+) -> None:
+    """Move the windows of the layout to the workspace.
+
+    Applications are launched on the focused workspace, so that workspaces can
+    be built without switching to them. Afterwards, all windows of the layout
+    that are not on the workspace yet are moved there with a single IPC
+    message, in the order of the layout. Sway creates the workspace if it does
+    not exist yet.
+
+    All launch configurations have to have a con_id set. The con_id of the
+    workspace layout is set in the process. If the layout has no windows, it
+    is only set if the workspace already exists.
 
     Parameters:
         connection: A connection to sway.
-        workspace_con: The workspace container to dissolve the layout for.
+        workspace_name: The name of the workspace.
+        workspace_layout: The layout of the workspace.
+
+    Raises:
+        RuntimeError: If the workspace does not exist afterwards even though
+            windows have been moved there.
+
+    Note: This function modifies its argument.
     """
 
-    def dissolve_child_layout(child_con: Con):
-        if not child_con.nodes:
+    run_sync(
+        move_windows_to_workspace_async(
+            SyncConnectionAdapter(connection), workspace_name, workspace_layout
+        )
+    )
+
+
+async def move_windows_to_workspace_async(
+    connection: AsyncConnection, workspace_name: str, workspace_layout: WorkspaceLayout
+) -> None:
+    """Asynchronous version of [move_windows_to_workspace][sway_out.layout.move_windows_to_workspace]."""
+
+    launch_configs = list(get_launch_configs(workspace_layout))
+    tree = await connection.get_tree()
+    async with CommandBatch(connection) as batch:
+        for launch_config in launch_configs:
+            con = _find_con(tree, launch_config)
+            con_workspace = con.workspace()
+            if con_workspace is None or con_workspace.name != workspace_name:
+                logger.debug(
+                    f"Moving {get_con_description(con)} to workspace {workspace_name}"
+                )
+                batch.run_command_on(
+                    con, f"move container to workspace {workspace_name}"
+                )
+
+    tree = await connection.get_tree()
+    for workspace_con in tree.workspaces():
+        if workspace_con.name == workspace_name:
+            workspace_layout._con_id = workspace_con.id
             return
+    if not launch_configs:
+        # Without a window to move there, Sway does not create the workspace.
+        logger.info(f"The layout of workspace {workspace_name} has no windows")
+        return
+    raise RuntimeError(f"Workspace {workspace_name} does not exist")
 
-        assert not is_window(child_con)
 
-        for grandchild in child_con.nodes:
-            dissolve_child_layout(grandchild)
+def dissolve_layout(connection: Connection, workspace_con: Con) -> None:
+    """Dissolves the layout of the given workspace.
 
-        initial_child_con = find_con_by_id(connection, child_con.id)
+    After this function, all windows are direct children of the workspace,
+    in the order in which they appeared in the tree.
 
-        logger.debug(f"Dissolving layout of {get_con_description(initial_child_con)}")
+    The windows are moved with a single batch of commands, independent of
+    the depth of the layout: starting at the first nested container, every
+    window is moved behind the previous one with a temporary mark (see
+    [get_layout_mark][sway_out.layout.get_layout_mark]). The first window is
+    moved behind a window on the workspace level. If there is none, it makes
+    a round trip to a scratch workspace, which appends it to the workspace.
 
-        # Set the layout to horizontal to ensure that moving the children works
-        # correctly.
-        run_command_on(initial_child_con, "layout splith")
+    Parameters:
+        connection: A connection to sway.
+        workspace_con: The workspace container to dissolve the layout for.
+    """
 
-        for grandchild in initial_child_con.nodes:
-            while True:
-                (updated_grandchild_con, updated_child_con) = find_cons_by_id_if_exists(
-                    connection, grandchild.id, child_con.id
-                )
-                if updated_grandchild_con is None:
-                    raise RuntimeError(
-                        f"Container {get_con_description(grandchild)} has disappeared"
-                    )
-                if updated_child_con is None:
-                    logger.debug(
-                        f"Layout {get_con_description(child_con)} was dissolved"
-                    )
-                    break
-                elif updated_grandchild_con.id in {
-                    con.id for con in updated_child_con.nodes
-                }:
-                    if len(updated_child_con.nodes) == 1:
-                        # If the layout has only one child, there is a sway command
-                        # to remove the layout.
-                        run_command_on(grandchild, "split none")
-                    else:
-                        # If there are multiple children, we have to move the
-                        # grandchild out of the child layout.
-                        logger.debug(
-                            f"Moving {get_con_description(updated_grandchild_con)} to move it "
-                            + f"out of {get_con_description(updated_child_con)}"
-                        )
-                        run_command_on(updated_grandchild_con, "move left")
-                else:
-                    logger.debug(
-                        f"Finished moving {get_con_description(updated_grandchild_con)} "
-                        + f"out of {get_con_description(child_con)}"
-                    )
-                    break
+    run_sync(dissolve_layout_async(SyncConnectionAdapter(connection), workspace_con))
 
-        logger.debug(
-            f"Dissolved layout of {get_con_description(child_con)} successfully"
-        )
+
+async def dissolve_layout_async(
+    connection: AsyncConnection, workspace_con: Con
+) -> None:
+    """Asynchronous version of [dissolve_layout][sway_out.layout.dissolve_layout]."""
 
     logger.debug(
         f"Dissolving layout for workspace {get_con_description(workspace_con)}"
     )
-    for child in workspace_con.nodes:
-        dissolve_child_layout(child)
+    children = workspace_con.nodes
+    nested_index = next(
+        (i for i, child in enumerate(children) if not is_window(child)), None
+    )
+    if nested_index is None:
+        logger.debug(
+            f"Layout of workspace {get_con_description(workspace_con)} is already flat"
+        )
+        return
+
+    windows = [
+        window
+        for child in children[nested_index:]
+        for window in _get_windows_depth_first(child)
+    ]
+    mark = get_layout_mark(workspace_con.id)
+    async with CommandBatch(connection) as batch:
+        if len(windows) == 1:
+            # Without siblings, the containers around the window can be
+            # removed. `split none` only removes one of them, but floating the
+            # window detaches it from all of them at once and tiling it again
+            # puts it back at the workspace level.
+            (window,) = windows
+            parent = window.parent
+            assert parent is not None
+            if parent.parent is not None and parent.parent.id == workspace_con.id:
+                batch.run_command_on(window, "split none")
+            else:
+                batch.run_command_on(window, "floating enable")
+                batch.run_command_on(window, "floating disable")
+        else:
+            if nested_index > 0:
+                anchor = children[nested_index - 1]
+            elif is_window(children[-1]):
+                anchor = children[-1]
+            else:
+                # Moving a window to its own workspace does nothing, so take a
+                # detour to append it to the workspace.
+                anchor, *windows = windows
+                scratch_workspace_name = f"{MARK_PREFIX}-{_RUN_ID}-{workspace_con.id}"
+                batch.run_command_on(
+                    anchor, f"move container to workspace {scratch_workspace_name}"
+                )
+                batch.run_command_on(
+                    anchor, f"move container to workspace {workspace_con.name}"
+                )
+            batch.run_command_on(anchor, f"mark --add {mark}")
+            for window in windows:
+                logger.debug(
+                    f"Moving {get_con_description(window)} to the workspace level"
+                )
+                batch.run_command_on(window, f"move container to mark {mark}")
+                batch.run_command_on(window, f"mark --add {mark}")
+            batch.run_command_on(windows[-1], f"unmark {mark}")
 
     # Sanity check
+    (workspace_con,) = await find_cons_by_id_async(connection, workspace_con.id)
     for child in workspace_con.nodes:
         if child.nodes:
             logger.warning(
                 f"There are still {len(child.nodes)} child nodes left on "
                 + f"{get_con_description(child)} after dissolving the layout "
-                + "on workspace {get_con_description"
+                + f"on workspace {get_con_description(workspace_con)}"
             )
     logger.info(
         f"Dissolved layout for workspace {get_con_description(workspace_con)} successfully"
     )
 
 
+def _get_windows_depth_first(con: Con) -> list[Con]:
+    """Get the windows below a container in the order they are displayed.
+
+    Unlike `Con.descendants()`, which walks the tree breadth-first, this keeps
+    the windows of a nested container before its later siblings.
+    """
+
+    if is_window(con):
+        return [con]
+    return [window for child in con.nodes for window in _get_windows_depth_first(child)]
+
+
 def create_layout(
     connection: Connection,
     workspace_layout: WorkspaceLayout,
@@ -139,24 +262,31 @@ def create_layout(
     Note: This function modifies its argument.
     """
 
-    def find_parent_con(con_id: int) -> Con:
-        tree = connection.get_tree()
-        for con in tree.descendants():
-            if con_id in [c.id for c in con.nodes]:
-                return con
+    run_sync(create_layout_async(SyncConnectionAdapter(connection), workspace_layout))
+
+
+async def create_layout_async(
+    connection: AsyncConnection,
+    workspace_layout: WorkspaceLayout,
+) -> None:
+    """Asynchronous version of [create_layout][sway_out.layout.create_layout]."""
+
+    async def find_parent_con(con_id: int) -> Con:
+        parent = get_tree_index(await connection.get_tree()).parent(con_id)
         assert (
-            False
+            parent is not None
         ), "This should not happen because there should always be at least a workspace as a parent."
+        return parent
 
-    def move_con_to_workspace(con_id: int):
-        (con,) = find_cons_by_id(connection, con_id)
+    async def move_con_to_workspace(con_id: int):
+        (con,) = await find_cons_by_id_async(connection, con_id)
         con_workspace = con.workspace()
         if con_workspace is None or con_workspace.id != workspace_id:
             logger.debug(
                 f"Moving container {get_con_description(con)} to workspace {get_con_description(workspace_con)}"
             )
-            run_command_on(
-                con, f"move container to workspace {get_con_description(workspace_con)}"
+            await run_command_on_async(
+                connection, con, f"move container to workspace {workspace_con.name}"
             )
         else:
             logger.debug(
@@ -164,11 +294,11 @@ def create_layout(
             )
 
         # Make sure that the con is a direct child of the workspace to make layouting less error-prone.
-        while find_parent_con(con_id).id != workspace_id:
+        while (await find_parent_con(con_id)).id != workspace_id:
             # Move the container to the right to not disturb the finished part of the layout.
-            run_command_on(con, "move right")
+            await run_command_on_async(connection, con, "move right")
             # Make shure that the container is still on the workspace.
-            (con,) = find_cons_by_id(connection, con_id)
+            (con,) = await find_cons_by_id_async(connection, con_id)
             con_workspace = con.workspace()
             assert con_workspace is not None and con_workspace.id == workspace_id, (
                 f"Accidentally moved {get_con_description(con)} to another workspace "
@@ -176,26 +306,28 @@ def create_layout(
                 + f"instead of {get_con_description(workspace_con)})"
             )
 
-    def swap_cons(con_id: int, target_id: int):
-        (con, target_con) = find_cons_by_id(connection, con_id, target_id)
+    async def swap_cons(con_id: int, target_id: int):
+        (con, target_con) = await find_cons_by_id_async(connection, con_id, target_id)
         if target_id != con_id:
             logger.debug(
                 f"Swapping container {get_con_description(con)} with {get_con_description(target_con)} "
                 + f"to position {index} on workspace {get_con_description(workspace_con)}"
             )
-            run_command_on(con, f"swap container with con_id {target_con.id}")
+            await run_command_on_async(
+                connection, con, f"swap container with con_id {target_con.id}"
+            )
         else:
             logger.debug(f"Container {get_con_description(con)} is already in position")
 
-    def move_con_into(con_id: int, target_id: int):
+    async def move_con_into(con_id: int, target_id: int):
         # There does not seem to be a way to move a con to an arbitrary position in a layout.
         # But we can move it into the layout using marks.
-        (con, target_con) = find_cons_by_id(connection, con_id, target_id)
-        run_command_on(target_con, f"mark --add {MARK}")
-        run_command_on(con, f"move container to mark {MARK}")
-        run_command_on(target_con, f"unmark {MARK}")
+        async with CommandBatch(connection) as batch:
+            batch.run_command_on(target_id, f"mark --add {mark}")
+            batch.run_command_on(con_id, f"move container to mark {mark}")
+            batch.run_command_on(target_id, f"unmark {mark}")
 
-    def create_container_layout(
+    async def create_container_layout(
         container_layout: ApplicationLaunchConfig | ContainerConfig,
     ) -> int:
         if isinstance(container_layout, ContainerConfig):
@@ -205,41 +337,42 @@ def create_layout(
             )
 
             # First, find or create the first container in the layout.
-            first_child_id = create_container_layout(container_layout.children[0])
+            first_child_id = await create_container_layout(container_layout.children[0])
 
             # Then create the layout.
-            (first_child_con,) = find_cons_by_id(connection, first_child_id)
-            run_command_on(first_child_con, "splith")
-            (first_child_con,) = find_cons_by_id(connection, first_child_id)
-            run_command_on(first_child_con, f"layout {container_layout.layout}")
-            layout_con = find_parent_con(first_child_con.id)
+            async with CommandBatch(connection) as batch:
+                batch.run_command_on(first_child_id, "splith")
+                batch.run_command_on(
+                    first_child_id, f"layout {container_layout.layout}"
+                )
+            layout_con = await find_parent_con(first_child_id)
             layout_id = layout_con.id
 
             # Finally add the remaining children to the layout.
             for index, child_layout in itertools.islice(
                 enumerate(container_layout.children), 1, None
             ):
-                child_id = create_container_layout(child_layout)
+                child_id = await create_container_layout(child_layout)
 
                 # Ensure that the child is on the right workspace.
-                move_con_to_workspace(child_id)
+                await move_con_to_workspace(child_id)
 
                 # Move the child into the layout.
-                move_con_into(child_id, layout_id)
-                assert find_parent_con(child_id).id == layout_id, (
+                await move_con_into(child_id, layout_id)
+                assert (await find_parent_con(child_id)).id == layout_id, (
                     f"The child {child_id} ended up somewhere unexpected after moving it into the "
                     + f"layout {layout_id}."
                 )
 
                 # Swap the child to the correct position if needed.
-                (layout_con, child_con) = find_cons_by_id(
+                (layout_con, child_con) = await find_cons_by_id_async(
                     connection, layout_id, child_id
                 )
                 assert len(layout_con.nodes) >= index + 1, (
                     f"After moving the child, there should be at least {index + 1} windows on the layout, "
                     + "but found {len(layout_con.nodes)}"
                 )
-                swap_cons(child_id, layout_con.nodes[index].id)
+                await swap_cons(child_id, layout_con.nodes[index].id)
 
             logger.debug(f"Layout for container as {container_layout.layout} done")
             layouted_ids.add(layout_id)
@@ -248,45 +381,49 @@ def create_layout(
         else:
             # Nothing to lay out here.
             assert isinstance(container_layout, ApplicationLaunchConfig)
-            tree = connection.get_tree()
+            tree = await connection.get_tree()
             result = _find_con(tree, container_layout)
             logger.debug(f'Reached leaf "{result.name}" while creating layout')
             layouted_ids.add(result.id)
             return result.id
 
+    workspace_id = workspace_layout._con_id
+    assert workspace_id is not None, "The con_id should have been set earlier"
+
     # Check if the mark is already in use.
-    marks_in_use = connection.get_marks()
-    if MARK in marks_in_use:
-        raise RuntimeError(f"The mark '{MARK}' is already in use.")
+    mark = get_layout_mark(workspace_id)
+    marks_in_use = await connection.get_marks()
+    if mark in marks_in_use:
+        raise RuntimeError(f"The mark '{mark}' is already in use.")
 
     # Track which cons we have layouted to detect windows that are not supposed to be here.
     layouted_ids = set()
 
     # Start the layout creation at the workspace level.
     # Set the layout of the workspace to horizontal to ensure moving containers to the workspace work correctly.
-    workspace_id = workspace_layout._con_id
-    assert workspace_id is not None, "The con_id should have been set earlier"
-    (workspace_con,) = find_cons_by_id(connection, workspace_id)
+    (workspace_con,) = await find_cons_by_id_async(connection, workspace_id)
     assert (
         workspace_con.nodes
     ), f"The workspace {get_con_description(workspace_con)} should not be empty at this point"
-    run_command_on(workspace_con.nodes[0], "layout splith")
+    await run_command_on_async(connection, workspace_con.nodes[0], "layout splith")
     for index, child_layout in enumerate(workspace_layout.children):
         logger.debug(
             f"Creating layout for workspace {get_con_description(workspace_con)} ..."
         )
-        child_id = create_container_layout(child_layout)
+        child_id = await create_container_layout(child_layout)
 
         # Ensure that the child is on the right workspace.
-        move_con_to_workspace(child_id)
+        await move_con_to_workspace(child_id)
 
         # Because we start at index == 0, there should now be at least index+1 windows on the workspace.
-        (workspace_con, child_con) = find_cons_by_id(connection, workspace_id, child_id)
+        (workspace_con, child_con) = await find_cons_by_id_async(
+            connection, workspace_id, child_id
+        )
         assert len(workspace_con.nodes) >= index + 1
 
         # Swap the child to the correct position if needed.
         target_con = workspace_con.nodes[index]
-        swap_cons(child_id, target_con.id)
+        await swap_cons(child_id, target_con.id)
 
     assert (
         workspace_con.nodes
@@ -296,15 +433,203 @@ def create_layout(
         logger.debug(
             f"Setting layout of workspace {get_con_description(workspace_con)} to {workspace_layout.layout}"
         )
-        run_command_on(workspace_con.nodes[0], f"layout {workspace_layout.layout}")
+        await run_command_on_async(
+            connection, workspace_con.nodes[0], f"layout {workspace_layout.layout}"
+        )
     logger.info(f"Layout for workspace {get_con_description(workspace_con)} done")
     layouted_ids.add(workspace_id)
 
     # The mark should be freed up after the layout is created.
-    marks_in_use = connection.get_marks()
+    marks_in_use = await connection.get_marks()
     assert (
-        MARK not in marks_in_use
-    ), f"The mark '{MARK}' was not removed after layout creation."
+        mark not in marks_in_use
+    ), f"The mark '{mark}' was not removed after layout creation."
+
+
+def reconcile_layout(
+    connection: Connection,
+    workspace_layout: WorkspaceLayout,
+) -> None:
+    """Arranges the windows on the workspace according to the given layout.
+
+    The live tree of the workspace is compared to the layout first. If it has
+    the same containers, the layout is reconciled in place: windows are
+    unwrapped from containers of their own with `split none`, children and
+    windows are swapped into position and container layouts are changed where
+    they differ. All of this is sent to sway as a single batch of commands,
+    which only contains commands for the parts that differ.
+
+    Only if the containers differ, the layout of the workspace is dissolved
+    with [dissolve_layout][sway_out.layout.dissolve_layout] and recreated with
+    [create_layout][sway_out.layout.create_layout].
+
+    All launch configurations have to have a con_id set. The con_id attributes
+    of containers will be set in the process.
+
+    Parameters:
+        connection: A connection to sway.
+        workspace_layout: The layout to apply.
+
+    Note: This function modifies its argument.
+    """
+
+    run_sync(
+        reconcile_layout_async(SyncConnectionAdapter(connection), workspace_layout)
+    )
+
+
+async def reconcile_layout_async(
+    connection: AsyncConnection,
+    workspace_layout: WorkspaceLayout,
+) -> None:
+    """Asynchronous version of [reconcile_layout][sway_out.layout.reconcile_layout]."""
+
+    tree = await connection.get_tree()
+    workspace_con = _find_con(tree, workspace_layout)
+    reconciliation = _Reconciliation()
+    commands = None
+    if reconciliation.add_children(workspace_layout, workspace_con):
+        commands = reconciliation.get_commands()
+    if commands is None:
+        logger.info(
+            f"Structure of workspace {get_con_description(workspace_con)} differs from "
+            + "the layout, recreating it"
+        )
+        await dissolve_layout_async(connection, workspace_con)
+        await create_layout_async(connection, workspace_layout)
+        return
+
+    logger.debug(
+        f"Reconciling layout of workspace {get_con_description(workspace_con)} "
+        + f"with {len(commands)} command(s)"
+    )
+    async with CommandBatch(connection) as batch:
+        for con_id, command in commands:
+            batch.run_command_on(con_id, command)
+    for container_layout, con_id in reconciliation.container_ids:
+        container_layout._con_id = con_id
+    logger.info(f"Layout for workspace {get_con_description(workspace_con)} done")
+
+
+class _Reconciliation:
+    """The commands that turn a live workspace into its layout.
+
+    The live tree is paired with the layout level by level. Children that
+    hold the windows of a layout child are paired with it, the remaining ones
+    are paired in order. The pairing fails if a container of the layout is
+    paired with a window or the number of children differs.
+
+    Once paired, every window position of the layout is filled with its window
+    by swapping windows, so that a window in the wrong place costs a single
+    command, independent of where it is.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.container_ids: list[tuple[ContainerConfig, int]] = []
+        """The live containers paired with the containers of the layout."""
+        self._layout_commands: list[tuple[int, str]] = []
+        self._child_swaps: list[tuple[int, str]] = []
+        self._unwraps: list[tuple[int, str]] = []
+        self._slots: list[tuple[ApplicationLaunchConfig, int]] = []
+
+    def add_children(
+        self, con_layout: WorkspaceLayout | ContainerConfig, con: Con
+    ) -> bool:
+        """Pair the children of a live container with the ones of the layout.
+
+        Returns:
+            `False` if the structure differs from the layout.
+        """
+
+        if len(con.nodes) != len(con_layout.children):
+            return False
+        live_children: dict[frozenset[int | None], Con] = {}
+        for child in con.nodes:
+            live_children.setdefault(_get_window_ids(child), child)
+        paired: list[Con | None] = []
+        paired_ids: set[int] = set()
+        for child_layout in con_layout.children:
+            child_con = live_children.get(_get_layout_window_ids(child_layout))
+            if child_con is None or child_con.id in paired_ids:
+                paired.append(None)
+            else:
+                paired.append(child_con)
+                paired_ids.add(child_con.id)
+        unpaired = iter([child for child in con.nodes if child.id not in paired_ids])
+
+        target_ids = []
+        for child_layout, child_con in zip(con_layout.children, paired):
+            if child_con is None:
+                child_con = next(unpaired)
+            if isinstance(child_layout, ContainerConfig):
+                if is_window(child_con) or not self.add_children(
+                    child_layout, child_con
+                ):
+                    return False
+                self.container_ids.append((child_layout, child_con.id))
+            else:
+                window = child_con
+                while not is_window(window) and len(window.nodes) == 1:
+                    window = window.nodes[0]
+                if not is_window(window):
+                    return False
+                if window is not child_con:
+                    # The window is wrapped in containers of its own.
+                    self._unwraps.append((window.id, "split none"))
+                self._slots.append((child_layout, window.id))
+            target_ids.append(child_con.id)
+
+        # Swap the children into position, similar to selection sort.
+        current_ids = [child.id for child in con.nodes]
+        for index, target_id in enumerate(target_ids):
+            if current_ids[index] != target_id:
+                self._child_swaps.append(
+                    (target_id, f"swap container with con_id {current_ids[index]}")
+                )
+                other_index = current_ids.index(target_id)
+                current_ids[other_index] = current_ids[index]
+                current_ids[index] = target_id
+
+        # The layout command operates on the parent of the container it is run on.
+        if con_layout.layout is not None and con.layout != con_layout.layout:
+            self._layout_commands.append(
+                (con.nodes[0].id, f"layout {con_layout.layout}")
+            )
+        return True
+
+    def get_commands(self) -> list[tuple[int, str]] | None:
+        """Get the commands in the order in which they have to run.
+
+        Returns:
+            The con_ids and the commands to run on them, or `None` if a window
+            of the layout is not in the paired part of the workspace.
+        """
+
+        # Every slot is named after the window that is in it before the swaps.
+        occupants = {slot: slot for _, slot in self._slots}
+        locations = dict(occupants)
+        window_swaps = []
+        for launch_config, slot in self._slots:
+            target_id = launch_config._con_id
+            if target_id not in locations:
+                return None
+            occupant = occupants[slot]
+            if occupant != target_id:
+                window_swaps.append(
+                    (target_id, f"swap container with con_id {occupant}")
+                )
+                target_slot = locations[target_id]
+                occupants[slot], occupants[target_slot] = target_id, occupant
+                locations[target_id], locations[occupant] = slot, target_slot
+        # The layout commands run on children that the other commands move or
+        # unwrap, and the children are swapped before their windows.
+        return [
+            *self._layout_commands,
+            *self._child_swaps,
+            *self._unwraps,
+            *window_swaps,
+        ]
 
 
 def find_leftover_windows(
@@ -320,6 +645,16 @@ def find_leftover_windows(
         A list of windows that are not part of the layout.
     """
 
+    return run_sync(
+        find_leftover_windows_async(SyncConnectionAdapter(connection), workspace_layout)
+    )
+
+
+async def find_leftover_windows_async(
+    connection: AsyncConnection, workspace_layout: WorkspaceLayout
+) -> list[Con]:
+    """Asynchronous version of [find_leftover_windows][sway_out.layout.find_leftover_windows]."""
+
     def remove_matched_windows(
         con_layout: WorkspaceLayout | ContainerConfig | ApplicationLaunchConfig,
     ):
@@ -338,12 +673,12 @@ def find_leftover_windows(
             for child in con_layout.children:
                 remove_matched_windows(child)
 
-    tree = connection.get_tree()
+    index = get_tree_index(await connection.get_tree())
     workspace_id = workspace_layout._con_id
     leftover_windows = {
         con.id: con
-        for con in tree.leaves()
-        if (ws := con.workspace()) is not None and ws.id == workspace_id
+        for con in index.tree.leaves()
+        if (ws := index.workspace(con.id)) is not None and ws.id == workspace_id
     }
     remove_matched_windows(workspace_layout)
     return list(leftover_windows.values())
@@ -355,95 +690,131 @@ def resize_layout(
 ) -> None:
     """Resizes the containers on the workspace so that they match the given layout.
 
+    The target sizes of all containers are computed at once from a snapshot
+    of the tree (see [plan_resize][sway_out.layout.plan_resize]). The
+    containers are then resized with one IPC message per level of the tree
+    and the result is checked against a single fresh snapshot. Only if the
+    sizes do not match, which can happen if Sway rounds differently or
+    enforces minimum sizes, the process is repeated up to
+    [RESIZE_ATTEMPTS][sway_out.layout.RESIZE_ATTEMPTS] times.
 
     Parameters:
         connection: A connection to sway.
         workspace_layout: The layout to apply.
     """
 
-    def resize_children(con_layout: WorkspaceLayout | ContainerConfig):
-        con = _find_con(tree, con_layout)
+    run_sync(resize_layout_async(SyncConnectionAdapter(connection), workspace_layout))
 
-        con_width_px, con_height_px = get_container_size_excluding_gaps(con)
 
-        if con_layout.layout in ["splith", "splitv"]:
-            layout = con_layout.layout
-        else:
-            layout = "other"
-
-        # Give up after a few attempts to avoid infinite loops.
-        for i in range(RESIZE_ATTEMPTS):
+async def resize_layout_async(
+    connection: AsyncConnection,
+    workspace_layout: WorkspaceLayout,
+) -> None:
+    """Asynchronous version of [resize_layout][sway_out.layout.resize_layout]."""
+
+    tree = await connection.get_tree()
+    workspace_name = _find_con(tree, workspace_layout).name
+    # Give up after a few attempts to avoid infinite loops.
+    for i in range(RESIZE_ATTEMPTS):
+        levels = plan_resize(tree, workspace_layout)
+        if not any(levels):
+            break
+        logger.debug(
+            f"Resizing workspace {workspace_name} with "
+            + f"{sum(map(len, levels))} command(s) "
+            + f"(attempt {i + 1}/{RESIZE_ATTEMPTS})"
+        )
+        for commands in levels:
+            if not commands:
+                continue
+            # The children of a level are resized with a single IPC message.
+            async with CommandBatch(connection) as batch:
+                for con_id, command in commands:
+                    batch.run_command_on(con_id, command)
+        tree = await connection.get_tree()
+        if _check_sizes(tree, workspace_layout, logging.DEBUG):
             logger.debug(
-                f"Resizing container {get_con_description(con)} to {con_width_px}px x {con_height_px}px "
-                + f"(attempt {i + 1}/{RESIZE_ATTEMPTS})"
-            )
-            retry = False
-            for child in con_layout.children:
-                if not resize_con(child, con_width_px, con_height_px, layout):
-                    retry = True
-            if not retry:
-                logger.debug(
-                    f"Container {get_con_description(con)} resized successfully after "
-                    + f"{i+1}/{RESIZE_ATTEMPTS} attempts."
-                )
-                break
-        else:
-            logger.error(
-                f"Failed to resize container {get_con_description(con)} to {con_width_px}px x {con_height_px}px "
-                + f"after {RESIZE_ATTEMPTS} attempts."
+                f"Workspace {workspace_name} resized successfully after "
+                + f"{i + 1}/{RESIZE_ATTEMPTS} attempts."
             )
+            return
 
-    def resize_con(
-        con_layout: ApplicationLaunchConfig | ContainerConfig,
-        parent_width_px: int,
-        parent_height_px: int,
-        parent_layout: Literal["splith", "splitv", "stacking", "tabbed", "other"],
-    ) -> bool:
-        con = _find_con(tree, con_layout)
+    if not _check_sizes(tree, workspace_layout, logging.DEBUG):
+        logger.error(
+            f"Failed to resize the containers on workspace {workspace_name} "
+            + f"after {RESIZE_ATTEMPTS} attempts."
+        )
 
-        result = True
-        if con_layout.percent is not None:
-            assert parent_layout != "other", (
-                "Percentages are only supported for horizontal and vertical splits, not for other layouts."
-                + "This should have been enforced by the configuration models."
-            )
-            if parent_layout == "splith":
-                expected_width_px = parent_width_px * con_layout.percent // 100
-                run_command_on(con, f"resize set width {expected_width_px} px")
-                actual_width_px = con.rect.width
-                tolerance_px = expected_width_px * RESIZE_TOLERANCE_PERCENT // 100
-                logger.debug(
-                    f"Expected width: {expected_width_px}px, actual width: {actual_width_px}px, "
-                    + f"tolerance: {tolerance_px}px"
-                )
-                result = (
-                    expected_width_px - tolerance_px
-                    <= actual_width_px
-                    <= expected_width_px + tolerance_px
-                )
-            else:
-                expected_height_px = parent_height_px * con_layout.percent // 100
-                run_command_on(con, f"resize set height {expected_height_px} px")
-                actual_height_px = con.rect.height
-                tolerance_px = expected_height_px * RESIZE_TOLERANCE_PERCENT // 100
-                logger.debug(
-                    f"Expected height: {expected_height_px}px, actual height: {actual_height_px}px, "
-                    + f"tolerance: {tolerance_px}px"
-                )
-                result = (
-                    expected_height_px - tolerance_px
-                    <= actual_height_px
-                    <= expected_height_px + tolerance_px
-                )
 
-        # Resize children once the parent container has been resized.
-        if result and isinstance(con_layout, ContainerConfig):
-            resize_children(con_layout)
+def plan_resize(
+    tree: Con, workspace_layout: WorkspaceLayout
+) -> list[list[tuple[int, str]]]:
+    """Compute the commands that give the containers their sizes in the layout.
 
-        return result
+    The target sizes are computed top-down from the size of the workspace. In
+    a split, the children with a percentage get their share of the parent and
+    the other children share the rest in proportion to their current sizes.
+    The sizes are rounded with the largest remainder method, so that they add
+    up to the size of the parent exactly. As in
+    [get_container_size_excluding_gaps][sway_out.layout.get_container_size_excluding_gaps],
+    the sizes include the decorations but not the gaps.
+
+    Instead of setting the size of every child, which takes the difference
+    from both neighbors, the border between two neighbors is moved with
+    `resize grow|shrink right|down`. This only changes the two neighbors, so
+    the commands of a level do not undo each other. They are ordered so that
+    no container has to shrink below its initial or its final size in between.
+    When a container is resized, Sway scales its children, so their sizes are
+    predicted from the snapshot accordingly.
+
+    Parameters:
+        tree: A snapshot of the tree.
+        workspace_layout: The layout to resize to.
 
-    tree = connection.get_tree()
-    resize_children(workspace_layout)
+    Returns:
+        The commands on the con_ids of the containers for every level of the
+        layout, from the top. The commands of a level have to be run after the
+        ones of the level above.
+    """
+
+    levels: list[list[tuple[int, str]]] = []
+
+    def plan(
+        con_layout: WorkspaceLayout | ContainerConfig,
+        width_px: int,
+        height_px: int,
+        depth: int,
+    ) -> None:
+        if len(levels) <= depth:
+            levels.append([])
+        children = con_layout.children
+        child_sizes = [(width_px, height_px)] * len(children)
+        if con_layout.layout in ["splith", "splitv"] and children:
+            axis = 0 if con_layout.layout == "splith" else 1
+            total_px = (width_px, height_px)[axis]
+            snapshot_px = [
+                get_container_size_excluding_gaps(_find_con(tree, child))[axis]
+                for child in children
+            ]
+            # Sway scales the children with their parent.
+            current_px = _distribute(total_px, snapshot_px)
+            target_px = _distribute(total_px, _get_weights(children, snapshot_px))
+            edge = "right" if axis == 0 else "down"
+            levels[depth].extend(
+                (_find_con(tree, children[index]).id, command)
+                for index, command in _move_borders(current_px, target_px, edge)
+            )
+            child_sizes = [
+                (size, height_px) if axis == 0 else (width_px, size)
+                for size in target_px
+            ]
+        for child, (child_width_px, child_height_px) in zip(children, child_sizes):
+            if isinstance(child, ContainerConfig):
+                plan(child, child_width_px, child_height_px, depth + 1)
+
+    workspace_con = _find_con(tree, workspace_layout)
+    plan(workspace_layout, *get_container_size_excluding_gaps(workspace_con), 0)
+    return levels
 
 
 def check_layout(
@@ -460,6 +831,133 @@ def check_layout(
         `True` if the current layout matches the given workspace layout, `False` otherwise.
     """
 
+    return run_sync(
+        check_layout_async(SyncConnectionAdapter(connection), workspace_layout)
+    )
+
+
+async def check_layout_async(
+    connection: AsyncConnection,
+    workspace_layout: WorkspaceLayout,
+) -> bool:
+    """Asynchronous version of [check_layout][sway_out.layout.check_layout]."""
+
+    return _check_sizes(await connection.get_tree(), workspace_layout, logging.ERROR)
+
+
+def is_layout_applied(
+    connection: Connection,
+    workspace_layout: WorkspaceLayout,
+) -> bool:
+    """Checks if the workspace already matches the given layout entirely.
+
+    This compares the structure of the workspace to the layout: the windows,
+    the nesting of containers and their layouts, the sizes (within
+    [RESIZE_TOLERANCE_PERCENT][sway_out.layout.RESIZE_TOLERANCE_PERCENT]),
+    the marks and the output. Everything is checked against a single
+    snapshot of the tree.
+
+    The launch configurations should have been matched to existing windows
+    before. If the workspace matches, the con_id attributes of containers
+    are set.
+
+    Parameters:
+        connection: A connection to sway.
+        workspace_layout: The layout to check against.
+
+    Returns:
+        `True` if nothing has to be done to apply the layout, `False` otherwise.
+
+    Note: This function modifies its argument.
+    """
+
+    return run_sync(
+        is_layout_applied_async(SyncConnectionAdapter(connection), workspace_layout)
+    )
+
+
+async def is_layout_applied_async(
+    connection: AsyncConnection,
+    workspace_layout: WorkspaceLayout,
+) -> bool:
+    """Asynchronous version of [is_layout_applied][sway_out.layout.is_layout_applied]."""
+
+    def check_structure(
+        con_layout: WorkspaceLayout | ContainerConfig, con: Con
+    ) -> bool:
+        if con.layout != con_layout.layout or len(con.nodes) != len(
+            con_layout.children
+        ):
+            return False
+        for child_layout, child_con in zip(con_layout.children, con.nodes):
+            if isinstance(child_layout, ContainerConfig):
+                if not child_con.nodes or not check_structure(child_layout, child_con):
+                    return False
+                container_ids.append((child_layout, child_con.id))
+            elif child_con.id != child_layout._con_id:
+                return False
+        return True
+
+    workspace_id = workspace_layout._con_id
+    assert workspace_id is not None, "The con_id should have been set earlier"
+    tree = await connection.get_tree()
+    workspace_con = get_tree_index(tree).find(workspace_id)
+    if workspace_con is None:
+        return False
+
+    # Every window on the workspace has to be part of the layout, including
+    # floating ones, and every launch configuration has to have a window.
+    if _get_layout_window_ids(workspace_layout) != {
+        con.id for con in workspace_con.descendants() if not con.nodes
+    }:
+        return False
+
+    container_ids: list[tuple[ContainerConfig, int]] = []
+    if not check_structure(workspace_layout, workspace_con):
+        return False
+    for container_layout, con_id in container_ids:
+        container_layout._con_id = con_id
+
+    return (
+        await has_marks_async(connection, workspace_layout)
+        and await is_workspace_on_output_async(connection, workspace_layout)
+        and _check_sizes(tree, workspace_layout, logging.DEBUG)
+    )
+
+
+def get_container_size_excluding_gaps(con: Con) -> tuple[int, int]:
+    # For windows, we use the rect and deco rect.
+    # rect does not include the decoration, i.e. title bar.
+    # For containers, we sum up the children where necessary to exclude
+    # gaps between windows in the result.
+    # We assume that the decoration is always at the top.
+
+    if con.layout == "splith":
+        width = sum(get_container_size_excluding_gaps(child)[0] for child in con.nodes)
+    else:
+        assert con.rect.width == con.deco_rect.width or con.deco_rect.width == 0
+        width = con.rect.width
+
+    if con.layout == "splitv":
+        height = sum(get_container_size_excluding_gaps(child)[1] for child in con.nodes)
+    else:
+        height = con.rect.height + con.deco_rect.height
+
+    return width, height
+
+
+def _check_sizes(tree: Con, workspace_layout: WorkspaceLayout, log_level: int) -> bool:
+    """Checks if the sizes of the containers match the given workspace layout.
+
+    Parameters:
+        tree: A snapshot of the tree.
+        workspace_layout: The layout to check against.
+        log_level: The level to log mismatches with.
+
+    Returns:
+        `True` if all sizes are within the tolerance, `False` otherwise.
+    """
+
     def check_container_layout(
         container_layout: ApplicationLaunchConfig | ContainerConfig,
         parent_width_px: int,
@@ -503,9 +1001,10 @@ def check_layout(
                 )
                 result = True
             else:
-                logger.error(
+                logger.log(
+                    log_level,
                     f"Container layout for {get_con_description(con)} does not match the expected "
-                    + f"percentage: {actual_percent}% != {container_layout.percent}%"
+                    + f"percentage: {actual_percent}% != {container_layout.percent}%",
                 )
                 result = False
 
@@ -530,14 +1029,14 @@ def check_layout(
 
         return result
 
-    tree = connection.get_tree()
     assert (
         workspace_layout._con_id is not None
     ), "The con_id of the workspace layout should have been set before calling this function."
-    workspace_con = tree.find_by_id(workspace_layout._con_id)
+    workspace_con = get_tree_index(tree).find(workspace_layout._con_id)
     if not workspace_con:
-        logger.error(
-            f"Workspace with con_id {workspace_layout._con_id} not found in the tree."
+        logger.log(
+            log_level,
+            f"Workspace with con_id {workspace_layout._con_id} not found in the tree.",
         )
         return False
 
@@ -559,25 +1058,76 @@ def check_layout(
     return result
 
 
-def get_container_size_excluding_gaps(con: Con) -> tuple[int, int]:
-    # For windows, we use the rect and deco rect.
-    # rect does not include the decoration, i.e. title bar.
-    # For containers, we sum up the children where necessary to exclude
-    # gaps between windows in the result.
-    # We assume that the decoration is always at the top.
+def _get_weights(
+    children: list[ApplicationLaunchConfig | ContainerConfig], current_px: list[int]
+) -> list[Fraction]:
+    """Get the shares of the children of a split in the size of the parent.
 
-    if con.layout == "splith":
-        width = sum(get_container_size_excluding_gaps(child)[0] for child in con.nodes)
-    else:
-        assert con.rect.width == con.deco_rect.width or con.deco_rect.width == 0
-        width = con.rect.width
+    The children without a percentage share the rest of the size in proportion
+    to their current sizes.
+    """
 
-    if con.layout == "splitv":
-        height = sum(get_container_size_excluding_gaps(child)[1] for child in con.nodes)
-    else:
-        height = con.rect.height + con.deco_rect.height
+    rest = max(
+        1 - sum(Fraction(c.percent, 100) for c in children if c.percent is not None),
+        Fraction(0),
+    )
+    free_px = [px for c, px in zip(children, current_px) if c.percent is None]
+    weights = []
+    for child, px in zip(children, current_px):
+        if child.percent is not None:
+            weights.append(Fraction(child.percent, 100))
+        elif sum(free_px):
+            weights.append(rest * px / sum(free_px))
+        else:
+            weights.append(rest / len(free_px))
+    return weights
 
-    return width, height
+
+def _distribute(total_px: int, weights: Sequence[Fraction | int]) -> list[int]:
+    """Split a size in proportion to the weights.
+
+    The parts are rounded with the largest remainder method: they are rounded
+    down and the pixels left over go to the parts with the largest fractional
+    parts. The parts always add up to the total.
+    """
+
+    weight_sum = sum(weights)
+    if not weight_sum:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+    exact = [Fraction(total_px) * weight / weight_sum for weight in weights]
+    parts = [math.floor(e) for e in exact]
+    by_remainder = sorted(
+        range(len(parts)), key=lambda i: exact[i] - parts[i], reverse=True
+    )
+    for i in by_remainder[: total_px - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def _move_borders(
+    current_px: list[int], target_px: list[int], edge: Literal["right", "down"]
+) -> list[tuple[int, str]]:
+    """Get the commands that move the borders between the children of a split.
+
+    Returns:
+        The index of the child before the border and the command to run on it.
+    """
+
+    moves = []
+    current_border_px = target_border_px = 0
+    for index in range(len(current_px) - 1):
+        current_border_px += current_px[index]
+        target_border_px += target_px[index]
+        if target_border_px != current_border_px:
+            moves.append((index, target_border_px - current_border_px))
+    # Move the borders to the right (or down) from the last one and the others
+    # from the first one, so that no child is squeezed in between.
+    ordered = [m for m in reversed(moves) if m[1] > 0] + [m for m in moves if m[1] < 0]
+    return [
+        (index, f"resize {'grow' if px > 0 else 'shrink'} {edge} {abs(px)} px")
+        for index, px in ordered
+    ]
 
 
 def _find_con(
@@ -588,8 +1138,33 @@ def _find_con(
         f"Application {container} has no con_id set. "
         + "This is required for the layout creation."
     )
-    result = tree.find_by_id(con_id)
+    result = get_tree_index(tree).find(con_id)
     assert (
         result is not None
     ), f"Container for application with con ID {con_id} not found"
     return result
+
+
+def _get_window_ids(con: Con) -> frozenset[int]:
+    """Get the con_ids of all tiled windows in the given container."""
+
+    if not con.nodes:
+        return frozenset([con.id])
+    return frozenset(
+        itertools.chain.from_iterable(_get_window_ids(child) for child in con.nodes)
+    )
+
+
+def _get_layout_window_ids(
+    container: WorkspaceLayout | ContainerConfig | ApplicationLaunchConfig,
+) -> frozenset[int | None]:
+    """Get the con_ids of all windows in the given layout or part of a layout."""
+
+    if isinstance(container, ApplicationLaunchConfig):
+        # The con_id is not set if no window has been found for the application.
+        return frozenset([getattr(container, "_con_id", None)])
+    return frozenset(
+        itertools.chain.from_iterable(
+            _get_layout_window_ids(child) for child in container.children
+        )
+    )
@@ -0,0 +1,150 @@
+"""An on-disk cache of validated layout configurations.
+
+Parsing the YAML and validating the layout takes a noticeable time on every
+apply, even if the file did not change. The cache stores the validated
+[Layout][sway_out.layout_files.Layout] pickled under
+`$XDG_CACHE_HOME/sway-out/layouts`, keyed by the hash of the file content and
+of the schema version. A pickled layout is restored without validation.
+
+The schema version covers the sources of
+[sway_out.layout_files][sway_out.layout_files], of the modules it imports and
+of [sway_out.matching][sway_out.matching], whose matchers are cached on the
+models, as well as the versions of pydantic and Python. Changing the models
+never loads an outdated layout. The least recently used entries are removed
+once the cache exceeds [CACHE_SIZE_BYTES][sway_out.layout_cache.CACHE_SIZE_BYTES].
+"""
+
+import functools
+import hashlib
+import logging
+import pickle
+import sys
+from pathlib import Path
+from typing import TextIO
+
+import pydantic
+import yaml
+
+from . import connection, layout_files, matching, utils
+from .layout_files import Layout
+from .utils import get_cache_home, write_atomically
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE_BYTES = 4 * 1024 * 1024
+"""The maximum total size of the cached layouts."""
+
+
+def get_cache_directory() -> Path:
+    """Get the directory of the cache.
+
+    Returns:
+        `layouts` in [get_cache_home][sway_out.utils.get_cache_home].
+    """
+
+    return get_cache_home() / "layouts"
+
+
+def load_layout_configuration_cached(
+    file: TextIO, directory: Path | None = None
+) -> Layout:
+    """Load a layout configuration, reusing the validated layout if possible.
+
+    This behaves like
+    [load_layout_configuration][sway_out.layout_files.load_layout_configuration],
+    but if the same content has been loaded before, neither the YAML is parsed
+    nor the layout is validated. Failing to read or write the cache is logged
+    and otherwise ignored.
+
+    Arguments:
+        file: The source file.
+        directory: The cache directory. Defaults to
+            [get_cache_directory][sway_out.layout_cache.get_cache_directory].
+
+    Raises:
+        yaml.YAMLError:
+            When the file does not contain valid YAML.
+        pydantic.ValidationError:
+            When the YAML is ill-formed.
+
+    Returns:
+        The configuration object.
+    """
+
+    if directory is None:
+        directory = get_cache_directory()
+    content = file.read()
+    key = hashlib.sha256(
+        _get_schema_version().encode() + b"\0" + content.encode()
+    ).hexdigest()
+    path = directory / f"{key}.pickle"
+
+    try:
+        with path.open("rb") as cache_file:
+            layout = pickle.load(cache_file)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring the unreadable cached layout {path}: {e}")
+    else:
+        if isinstance(layout, Layout):
+            logger.debug(f"Loaded the layout from the cache: {path}")
+            # Mark the entry as recently used for the eviction.
+            path.touch()
+            return layout
+        logger.warning(f"Ignoring the cached layout {path}: not a layout")
+
+    obj = yaml.load(content, layout_files.YAML_LOADER)
+    layout = Layout.model_validate(obj)
+    try:
+        _store(directory, path, layout)
+    except OSError as e:
+        logger.warning(f"Failed to cache the layout: {e}")
+    return layout
+
+
+_SCHEMA_MODULES = (layout_files, connection, utils, matching)
+"""The modules whose sources are part of the schema version."""
+
+
+@functools.cache
+def _get_schema_version() -> str:
+    """Identify the layout models and the pickle format of their instances."""
+
+    digest = hashlib.sha256()
+    for module in _SCHEMA_MODULES:
+        assert module.__file__ is not None
+        digest.update(Path(module.__file__).read_bytes())
+    return "-".join(
+        [
+            digest.hexdigest(),
+            pydantic.VERSION,
+            f"{sys.version_info.major}.{sys.version_info.minor}",
+        ]
+    )
+
+
+def _store(directory: Path, path: Path, layout: Layout) -> None:
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # Concurrent readers never see a partially written entry.
+    write_atomically(path, pickle.dumps(layout, pickle.HIGHEST_PROTOCOL))
+    logger.debug(f"Stored the layout in the cache: {path}")
+    _evict(directory, CACHE_SIZE_BYTES)
+
+
+def _evict(directory: Path, size_bytes: int) -> None:
+    """Remove the least recently used entries until the cache fits the size."""
+
+    entries = []
+    for entry in directory.glob("*.pickle"):
+        try:
+            entries.append((entry.stat(), entry))
+        except FileNotFoundError:
+            continue
+    total = sum(stat.st_size for stat, _ in entries)
+    for stat, entry in sorted(entries, key=lambda e: e[0].st_mtime_ns):
+        if total <= size_bytes:
+            break
+        logger.debug(f"Evicting the cached layout {entry}")
+        entry.unlink(missing_ok=True)
+        total -= stat.st_size
@@ -1,6 +1,7 @@
 """Creation of new layout from existing workspace states."""
 
 import logging
+from collections.abc import Iterator
 from typing import cast
 
 from i3ipc import Con, Connection
@@ -15,6 +16,7 @@ from sway_out.layout_files import (
     WorkspaceLayout,
     X11WindowMatchExpression,
 )
+from sway_out.processes import ProcessTable
 from sway_out.utils import get_con_description, is_window
 
 logger = logging.getLogger(__name__)
@@ -37,11 +39,88 @@ def create_layout_from_workspace(
         A layout object.
     """
 
+    workspaces = dict(iter_workspace_layouts(connection, workspace_names))
+    return Layout(focused_workspace=None, workspaces=workspaces)
+
+
+def iter_workspace_layouts(
+    connection: Connection, workspace_names: list[str] | None = None
+) -> Iterator[tuple[str, WorkspaceLayout]]:
+    """Create the layouts of the current workspaces one by one.
+
+    Every workspace layout is created when it is requested, so that it can be
+    written before the next one is created.
+
+    Arguments:
+        connection: A connection to Sway.
+        workspace_names: The names of workspaces to include, iff omitted, all
+            workspaces are included.
+
+    Raises:
+        RuntimeError: If an unexpected con type is encountered.
+
+    Yields:
+        The workspace names and their layouts, in the order of the tree.
+    """
+
+    tree = connection.get_tree()
+    selected_workspaces = [
+        (workspace.name, workspace)
+        for workspace in tree.workspaces()
+        if workspace.name is not None
+        and (workspace_names is None or workspace.name in workspace_names)
+    ]
+    processes = ProcessTable()
+    processes.collect(
+        leaf.pid
+        for _, workspace in selected_workspaces
+        for leaf in workspace.leaves()
+        if leaf.pid is not None
+    )
+
+    reported_pids: set[int] = set()
+    for name, workspace in selected_workspaces:
+        yield name, create_workspace_layout(workspace, processes, reported_pids)
+
+
+def create_workspace_layout(
+    workspace: Con, processes: ProcessTable, reported_pids: set[int] | None = None
+) -> WorkspaceLayout:
+    """Create the layout of a single workspace.
+
+    Arguments:
+        workspace: The workspace con.
+        processes: The processes of the windows, see
+            [ProcessTable.collect][sway_out.processes.ProcessTable.collect].
+        reported_pids: The processes that have already been reported as
+            shared by several windows. Newly reported ones are added.
+
+    Raises:
+        RuntimeError: If an unexpected con type is encountered.
+
+    Returns:
+        The layout of the workspace.
+    """
+
+    if reported_pids is None:
+        reported_pids = set()
+
     def create_layout_for_container(con: Con, parent: Con):
         logger.debug("Creating layout for container %s", get_con_description(con))
         match con.type:
             case "con":
                 if is_window(con):
+                    if (
+                        con.pid is not None
+                        and processes.is_shared(con.pid)
+                        and con.pid not in reported_pids
+                    ):
+                        reported_pids.add(con.pid)
+                        logger.warning(
+                            "Several windows share the process of %s, its command "
+                            + "line starts the whole application and not one window",
+                            get_con_description(con),
+                        )
                     if con.app_id is not None:
                         wayland = WaylandWindowMatchExpression(
                             app_id=con.app_id,
@@ -57,7 +136,7 @@ def create_layout_from_workspace(
                         )
 
                     result = ApplicationLaunchConfig(
-                        cmd=_guess_command_for_application(con),
+                        cmd=_guess_command_for_application(con, processes),
                         match=WindowMatchExpression(wayland=wayland, x11=x11),
                     )
                 else:
@@ -90,30 +169,17 @@ def create_layout_from_workspace(
                     f"Unexpected con type encountered for con_id {con.id}: {con.type}"
                 )
 
-    tree = connection.get_tree()
-    workspaces: dict[str, WorkspaceLayout] = {}
-    for workspace in tree.workspaces():
-        if workspace.name is None:
-            continue
-        if workspace_names is not None and workspace.name not in workspace_names:
-            continue
-
-        children = [
-            create_layout_for_container(con, workspace) for con in workspace.nodes
-        ]
-        _fix_up_percentages(children)
-        workspaces[workspace.name] = WorkspaceLayout.model_construct(
-            children=children, layout=workspace.layout
-        )
+    children = [create_layout_for_container(con, workspace) for con in workspace.nodes]
+    _fix_up_percentages(children)
+    return WorkspaceLayout.model_construct(children=children, layout=workspace.layout)
 
-    return Layout(focused_workspace=None, workspaces=workspaces)
 
-
-def _guess_command_for_application(con: Con) -> list[str]:
+def _guess_command_for_application(con: Con, processes: ProcessTable) -> list[str]:
     """Guess the command line for a container based on its PID.
 
     Parameters:
         con: The container to guess the command for.
+        processes: The processes to look the PID up in.
 
     Returns:
         A list of command line arguments, or an empty list if the command cannot be guessed.
@@ -126,23 +192,21 @@ def _guess_command_for_application(con: Con) -> list[str]:
         )
         return []
 
-    # Retrieve the command line from /proc
-    path = f"/proc/{con.pid}/cmdline"
-    try:
-        with open(path, "r") as f:
-            cmdline = f.read().strip()
-            if cmdline:
-                # Join the command line arguments with spaces.
-                # There seems to be a trailing null byte, so we drop the last element.
-                return cmdline.split("\0")[:-1]
-            else:
-                return []
-    except FileNotFoundError:
-        logger.warning(f"Command line for PID {con.pid} not found at {path}")
-        return []
-    except Exception as e:
-        logger.error(f"Error reading command line for PID {con.pid}: {e}")
+    process = processes.get(con.pid)
+    if process is None:
         return []
+    if ancestors := processes.get_ancestors(con.pid):
+        logger.debug(
+            "Container %s was launched through: %s",
+            get_con_description(con),
+            " <- ".join(" ".join(a.cmdline) or str(a.pid) for a in ancestors),
+        )
+    if process.cmdline:
+        return process.cmdline
+    # Some processes overwrite their arguments, fall back to the executable.
+    if process.exe is not None:
+        return [process.exe]
+    return []
 
 
 def _calculate_percent(con: Con, parent: Con) -> int | None:
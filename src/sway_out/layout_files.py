@@ -1,7 +1,10 @@
 """Data structures and utilities for layout descriptions."""
 
+import logging
 import re
-from typing import Annotated, Literal, Self, TextIO
+from collections.abc import Generator, Iterable
+from pathlib import Path
+from typing import Annotated, Any, Literal, Self, TextIO
 
 import yaml
 from i3ipc import Connection
@@ -14,7 +17,22 @@ from pydantic import (
     model_validator,
 )
 
-from .connection import get_focused_workspace
+from .connection import (
+    AsyncConnection,
+    SyncConnectionAdapter,
+    get_focused_workspace_async,
+    run_sync,
+)
+from .utils import write_atomically
+
+logger = logging.getLogger(__name__)
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+"""The YAML loader for layout files.
+
+This is the safe loader of libyaml if PyYAML has been built with it, which is
+considerably faster than the pure-Python one.
+"""
 
 
 class MarksMixin:
@@ -140,6 +158,8 @@ class FocusMixin:
 
 
 class WaylandWindowMatchExpression(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     app_id: str | None = None
     title: str | None = None
 
@@ -163,6 +183,8 @@ class WaylandWindowMatchExpression(BaseModel):
 
 
 class X11WindowMatchExpression(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     class_: Annotated[str | None, Field(alias="class", title="Window class")] = None
     instance: Annotated[str | None, Field(title="Window instance")] = None
     title: str | None = None
@@ -187,9 +209,14 @@ class X11WindowMatchExpression(BaseModel):
 
 
 class WindowMatchExpression(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     wayland: WaylandWindowMatchExpression | None = None
     x11: X11WindowMatchExpression | None = None
 
+    _matcher: Any = PrivateAttr(default=None)
+    """The compiled matcher, see [sway_out.matching.get_matcher][]."""
+
     @model_validator(mode="after")
     def validate_match(self) -> Self:
         if self.wayland is None and self.x11 is None:
@@ -200,6 +227,8 @@ class WindowMatchExpression(BaseModel):
 class ApplicationLaunchConfig(  # type: ignore[reportUnsafeMultipleInheritance]
     BaseModel, MarksMixin, ConIdMixin, LayoutChildMixin, FocusMixin
 ):
+    model_config = ConfigDict(defer_build=True)
+
     cmd: Annotated[
         list[str] | str,
         Field(title="Launch command", description="Command to launch the application."),
@@ -216,10 +245,12 @@ class ApplicationLaunchConfig(  # type: ignore[reportUnsafeMultipleInheritance]
 class ContainerConfig(  # type: ignore[reportUnsafeMultipleInheritance]
     BaseModel, MarksMixin, ConIdMixin, LayoutParentMixin, LayoutChildMixin, FocusMixin
 ):
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    model_config = ConfigDict(arbitrary_types_allowed=True, defer_build=True)
 
 
 class WorkspaceLayout(BaseModel, ConIdMixin, LayoutParentMixin):
+    model_config = ConfigDict(defer_build=True)
+
     output: Annotated[
         str | list[str] | None,
         Field(
@@ -232,6 +263,8 @@ class WorkspaceLayout(BaseModel, ConIdMixin, LayoutParentMixin):
 
 
 class Layout(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     focused_workspace: Annotated[
         WorkspaceLayout | None,
         Field(
@@ -312,7 +345,7 @@ def load_layout_configuration(file: TextIO) -> Layout:
         The configuration object.
     """
 
-    obj = yaml.load(file, yaml.SafeLoader)
+    obj = yaml.load(file, YAML_LOADER)
     return Layout.model_validate(obj)
 
 
@@ -328,6 +361,101 @@ def save_layout_configuration(layout: Layout, file: TextIO):
     yaml.dump(obj, file, yaml.SafeDumper, encoding="utf-8", allow_unicode=True)
 
 
+def save_workspace_layouts(
+    workspaces: Iterable[tuple[str, WorkspaceLayout]], file: TextIO
+) -> int:
+    """Save workspace layouts to a file-like object as they are produced.
+
+    The result is a layout configuration with `workspaces`, like the one
+    written by
+    [save_layout_configuration][sway_out.layout_files.save_layout_configuration].
+    Every workspace is written and flushed before the next one is requested,
+    so only one workspace layout is kept in memory at a time.
+
+    Arguments:
+        workspaces: The workspace names and their layouts.
+        file: The destination file.
+
+    Returns:
+        The number of workspaces written.
+    """
+
+    count = 0
+    for name, workspace_layout in workspaces:
+        if count == 0:
+            file.write("workspaces:\n")
+        file.write(dump_workspace_layout(name, workspace_layout))
+        file.flush()
+        count += 1
+    if count == 0:
+        file.write("workspaces: {}\n")
+    return count
+
+
+def dump_workspace_layout(name: str, workspace_layout: WorkspaceLayout) -> str:
+    """Serialize a workspace layout as an entry of `workspaces`.
+
+    The entries of several workspaces can be concatenated after a
+    `workspaces:` line to form a layout configuration.
+
+    Arguments:
+        name: The name of the workspace.
+        workspace_layout: The layout of the workspace.
+
+    Returns:
+        The YAML text of the entry.
+    """
+
+    obj = workspace_layout.model_dump(exclude_none=True, exclude_unset=True)
+    text = yaml.dump({name: obj}, None, yaml.SafeDumper, allow_unicode=True)
+    # Indenting every line moves the mapping under `workspaces`.
+    return "".join(f"  {line}" for line in text.splitlines(keepends=True))
+
+
+def get_workspace_file_name(name: str) -> str:
+    """Get the name of the layout file of a workspace in a directory.
+
+    `%` and `/` are percent-encoded, so every workspace gets its own file.
+
+    Arguments:
+        name: The name of the workspace.
+
+    Returns:
+        The file name.
+    """
+
+    return name.replace("%", "%25").replace("/", "%2F") + ".yaml"
+
+
+def save_workspace_layouts_to_directory(
+    workspaces: Iterable[tuple[str, WorkspaceLayout]], directory: Path
+) -> list[Path]:
+    """Save workspace layouts to one file per workspace as they are produced.
+
+    Every file is a layout configuration with a single workspace, named by
+    [get_workspace_file_name][sway_out.layout_files.get_workspace_file_name].
+
+    Arguments:
+        workspaces: The workspace names and their layouts.
+        directory: The destination directory. It is created if it does not
+            exist.
+
+    Returns:
+        The paths of the written files.
+    """
+
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, workspace_layout in workspaces:
+        path = directory / get_workspace_file_name(name)
+        write_atomically(
+            path, "workspaces:\n" + dump_workspace_layout(name, workspace_layout)
+        )
+        logger.debug(f"Saved workspace {name} to {path}")
+        paths.append(path)
+    return paths
+
+
 def map_workspaces(
     connection: Connection, layout: Layout
 ) -> dict[str, WorkspaceLayout]:
@@ -336,7 +464,8 @@ def map_workspaces(
     The currently focused workspace is used to resolve
     [sway_out.layout_files.Layout.focused_workspace][].
 
-    con_ids stay unset if the workspace does not exist in Sway.
+    con_ids stay unset if the workspace does not exist in Sway. The focused
+    workspace always exists.
 
     Arguments:
         connection: A connection to Sway.
@@ -350,6 +479,14 @@ def map_workspaces(
         The layout objects do not get copied, so `layout` is modified.
     """
 
+    return run_sync(map_workspaces_async(SyncConnectionAdapter(connection), layout))
+
+
+async def map_workspaces_async(
+    connection: AsyncConnection, layout: Layout
+) -> dict[str, WorkspaceLayout]:
+    """Asynchronous version of [map_workspaces][sway_out.layout_files.map_workspaces]."""
+
     def go():
         if layout.workspaces is not None:
             for workspace_name, workspace_layout in layout.workspaces.items():
@@ -360,13 +497,18 @@ def map_workspaces(
                 yield workspace_name, workspace_layout
         if layout.focused_workspace is not None:
             focused_workspace_layout = layout.focused_workspace
-            focused_worksapce_con = get_focused_workspace(connection)
             assert focused_worksapce_con is not None, "No focused workspace found?"
             focused_workspace_name = focused_worksapce_con.name
             assert focused_workspace_name is not None, "Focused workspace has no name"
+            focused_workspace_layout._con_id = focused_worksapce_con.id
             yield focused_workspace_name, focused_workspace_layout
 
-    tree = connection.get_tree()
+    tree = await connection.get_tree()
+    focused_worksapce_con = (
+        await get_focused_workspace_async(connection)
+        if layout.focused_workspace is not None
+        else None
+    )
     return dict(go())
 
 
@@ -411,3 +553,23 @@ def find_focused_element_on_workspace(
             if focused_child is not None:
                 return focused_child
     return None
+
+
+def get_launch_configs(
+    layout: WorkspaceLayout | ContainerConfig,
+) -> Generator[ApplicationLaunchConfig]:
+    """Get the launch configurations in a layout.
+
+    Arguments:
+        layout: The layout to search in.
+
+    Returns:
+        The launch configurations in depth-first order, i.e. in the order of
+        the windows in the tree once the layout is applied.
+    """
+
+    for child in layout.children:
+        if isinstance(child, ApplicationLaunchConfig):
+            yield child
+        else:
+            yield from get_launch_configs(child)
@@ -1,37 +1,25 @@
 """Main entrypoint."""
 
+import functools
+import io
 import logging
 import sys
-from dataclasses import dataclass
-from typing import TextIO
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
 
 import click
-import pydantic
-import yaml
-from i3ipc import Connection
-
-from sway_out.layout_creation import create_layout_from_workspace
-from sway_out.outputs import move_workspace_to_output
-
-from .applications import launch_applications_from_layout, match_existing_windows
-from .connection import find_con_by_id, run_command, run_command_on
-from .layout import (
-    check_layout,
-    create_layout,
-    dissolve_layout,
-    find_leftover_windows,
-    resize_layout,
-)
-from .layout_files import (
-    find_focused_element_in_layout,
-    load_layout_configuration,
-    map_workspaces,
-    save_layout_configuration,
-)
-from .marks import apply_marks
-from .matching import find_current_workspace
-from .notifications import error_notification, progress_notification
-from .utils import PROG_NAME, get_con_description
+
+from .utils import PROG_NAME
+
+# The dependencies are imported by the commands that need them, so that e.g.
+# `--help` does not pay for importing pydantic, yaml and i3ipc.
+if TYPE_CHECKING:
+    from .connection import AsyncConnection, SwayConnection
+    from .daemon import LayoutCache
+    from .launch_history import LaunchHistory
+    from .layout_files import Layout, WorkspaceLayout
+    from .tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +28,27 @@ logger = logging.getLogger(__name__)
 class GlobalState:
     """The user-provided configuration for the application and some global state."""
 
-    connection: Connection
     notifications: bool = True
+    layouts: "LayoutCache | None" = None
+    """Parsed layout files, kept by the daemon."""
+    _connection: "SwayConnection | None" = field(default=None, repr=False)
+
+    @property
+    def connection(self) -> "SwayConnection":
+        """The connection to Sway, opened on first use."""
+
+        if self._connection is None:
+            from .connection import SwayConnection
+
+            self._connection = SwayConnection()
+        return self._connection
+
+    def close(self) -> None:
+        """Close the connection to Sway if it has been opened."""
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
 
 
 @click.group()
@@ -51,88 +58,346 @@ class GlobalState:
     default=True,
     help="Enable or disable notifications.",
 )
+@click.option(
+    "--log-level",
+    type=click.Choice(["debug", "info", "warning", "error"], case_sensitive=False),
+    default="warning",
+    help="Log messages of this level and above to stderr.",
+)
 @click.pass_context
-def main(ctx: click.Context, notifications: bool):
+def main(ctx: click.Context, notifications: bool, log_level: str):
     """Main entrypoint."""
 
-    logging.basicConfig(level=logging.DEBUG)
-    ctx.obj = GlobalState(Connection(), notifications)
+    logging.basicConfig(level=log_level.upper())
+    if ctx.obj is None:
+        ctx.obj = GlobalState(notifications)
+        ctx.call_on_close(ctx.obj.close)
+    else:
+        # The command was forwarded to the daemon, which keeps its state.
+        ctx.obj.notifications = notifications
 
 
 @main.command("apply")
-@click.argument("layout_file", type=click.File("r"))
+@click.argument("layout_file", type=click.File("r"), required=False)
+@click.option(
+    "--snapshot",
+    metavar="NAME|latest",
+    default=None,
+    help="Apply a snapshot saved with `save --snapshot` instead of LAYOUT_FILE.",
+)
+@click.option(
+    "--concurrent-launch/--sequential-launch",
+    default=False,
+    help="Launch all applications of a workspace at once or one after another.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(["sync", "asyncio"]),
+    default="sync",
+    help="Block on every reply from Sway (sync) or use an asyncio event loop, "
+    + "where waiting for windows, events and notifications overlap (asyncio).",
+)
+@click.option(
+    "--trace",
+    "trace_file",
+    type=click.File("w"),
+    default=None,
+    help="Write a Chrome trace of the phases and their IPC cost to the file "
+    + "and print a summary.",
+)
 @click.pass_context
-def main_apply(ctx: click.Context, layout_file):
-    connection: Connection = ctx.obj.connection
-    assert connection is not None
+def main_apply(
+    ctx: click.Context,
+    layout_file,
+    snapshot: str | None,
+    concurrent_launch: bool,
+    engine: str,
+    trace_file: TextIO | None,
+):
+    from .connection import SyncConnectionAdapter, run_sync
+    from .tracing import Tracer
+
+    if (layout_file is None) == (snapshot is None):
+        raise click.UsageError("Exactly one of LAYOUT_FILE and --snapshot is required.")
+
+    if engine == "asyncio":
+        import asyncio
+
+        asyncio.run(
+            _main_apply_with_asyncio(
+                ctx, layout_file, snapshot, concurrent_launch, trace_file
+            )
+        )
+        return
+
+    connection = ctx.obj.connection
+    run_sync(
+        _apply(
+            ctx,
+            SyncConnectionAdapter(connection),
+            Tracer(connection),
+            layout_file,
+            snapshot,
+            concurrent_launch,
+            trace_file,
+        )
+    )
+
+
+async def _main_apply_with_asyncio(
+    ctx: click.Context,
+    layout_file: TextIO | None,
+    snapshot: str | None,
+    concurrent_launch: bool,
+    trace_file: TextIO | None,
+) -> None:
+    """Apply a layout on an asyncio connection."""
+
+    from .connection import AsyncSwayConnection
+    from .tracing import Tracer
+
+    connection = await AsyncSwayConnection().connect()
     try:
-        configuration = load_layout_configuration(layout_file)
-    except (yaml.YAMLError, pydantic.ValidationError) as e:
+        await _apply(
+            ctx,
+            connection,
+            Tracer(connection),
+            layout_file,
+            snapshot,
+            concurrent_launch,
+            trace_file,
+        )
+    finally:
+        connection.close()
+
+
+async def _apply(
+    ctx: click.Context,
+    connection: "AsyncConnection",
+    tracer: "Tracer",
+    layout_file: TextIO | None,
+    snapshot: str | None,
+    concurrent_launch: bool,
+    trace_file: TextIO | None,
+) -> None:
+    """Apply a layout from a file or a snapshot.
+
+    This is the implementation of both engines: with the `sync` engine, the
+    connection is a
+    [SyncConnectionAdapter][sway_out.connection.SyncConnectionAdapter] and the
+    coroutine is run with [run_sync][sway_out.connection.run_sync].
+    """
+
+    import pydantic
+    import yaml
+
+    from .connection import find_con_by_id_async, run_command_on_async
+    from .launch_history import LaunchHistory
+    from .layout_files import find_focused_element_in_layout, map_workspaces_async
+    from .matching import find_current_workspace_async
+    from .notifications import (
+        error_notification,
+        progress_notification,
+        wait_for_notifications,
+    )
+    from .snapshots import SnapshotStore
+    from .utils import get_con_description
+
+    try:
+        with tracer.span("load"):
+            if snapshot is not None:
+                configuration = SnapshotStore().load(snapshot)
+            else:
+                assert layout_file is not None
+                configuration = _load_layout(ctx, layout_file)
+    except (yaml.YAMLError, pydantic.ValidationError, RuntimeError) as e:
         if ctx.obj.notifications:
             error_notification("Error during layout creation", str(e))
+            await wait_for_notifications()
 
         click.echo(f"Failed to read layout configuration: {e}", err=True)
         return
 
-    workspace_layout_mapping = map_workspaces(connection, configuration)
+    history = LaunchHistory.load()
+    try:
+        with tracer.span("map workspaces"):
+            workspace_layout_mapping = await map_workspaces_async(
+                connection, configuration
+            )
+            # Applications are launched on the focused workspace, so build it
+            # last to keep the other workspaces out of its way.
+            focused_workspace = await find_current_workspace_async(connection)
+            workspace_layout_mapping = dict(
+                sorted(
+                    workspace_layout_mapping.items(),
+                    key=lambda item: focused_workspace is not None
+                    and item[0] == focused_workspace.name,
+                )
+            )
 
-    with progress_notification("Applying layout", "Workspace") as notification:
-        if ctx.obj.notifications:
-            notification.start()
-        for index, (workspace_name, workspace_layout) in enumerate(
-            workspace_layout_mapping.items()
-        ):
-            notification.update(index + 1, len(workspace_layout_mapping))
-            run_command(connection, f"workspace {workspace_name}")
-            workspace_con = find_current_workspace(connection)
-            assert workspace_con is not None, "No current workspace found?"
-            workspace_layout._con_id = workspace_con.id
-            logging.debug("Matching existing windows on workspace: %s", workspace_name)
+        with progress_notification("Applying layout", "Workspace") as notification:
+            if ctx.obj.notifications:
+                notification.start()
+            for index, (workspace_name, workspace_layout) in enumerate(
+                workspace_layout_mapping.items()
+            ):
+                notification.update(index + 1, len(workspace_layout_mapping))
+                with tracer.span(f"workspace {workspace_name}", "workspace"):
+                    if not await _apply_workspace(
+                        ctx,
+                        connection,
+                        tracer,
+                        workspace_name,
+                        workspace_layout,
+                        concurrent_launch,
+                        history,
+                    ):
+                        notification.successful = False
+
+            with tracer.span("focus"):
+                focused_layout = find_focused_element_in_layout(configuration)
+                if focused_layout is not None:
+                    assert focused_layout._con_id is not None
+                    focused_con = await find_con_by_id_async(
+                        connection, focused_layout._con_id
+                    )
+                    await run_command_on_async(connection, focused_con, "focus")
+                    logger.info(
+                        f"Focused element in layout: {get_con_description(focused_con)}",
+                    )
+                else:
+                    logger.debug("No focused element found in layout")
+
+            logger.info(
+                f"Applied layout for {len(workspace_layout_mapping)} workspace(s)"
+            )
+    finally:
+        # Also show the notifications about failures before exiting.
+        await wait_for_notifications()
+        history.save()
+        if trace_file is not None:
+            _write_trace(tracer, trace_file, history)
+
+
+async def _apply_workspace(
+    ctx: click.Context,
+    connection: "AsyncConnection",
+    tracer: "Tracer",
+    workspace_name: str,
+    workspace_layout: "WorkspaceLayout",
+    concurrent_launch: bool,
+    history: "LaunchHistory",
+) -> bool:
+    """Apply the layout of a single workspace.
+
+    Returns:
+        `False` if the layout could not be applied completely, `True` otherwise.
+    """
+
+    from .applications import (
+        launch_applications_from_layout_async,
+        match_existing_windows,
+    )
+    from .connection import find_con_by_id_async
+    from .layout import (
+        check_layout_async,
+        find_leftover_windows_async,
+        is_layout_applied_async,
+        move_windows_to_workspace_async,
+        reconcile_layout_async,
+        resize_layout_async,
+    )
+    from .layout_files import get_launch_configs
+    from .marks import apply_marks_async
+    from .notifications import error_notification
+    from .outputs import move_workspace_to_output_async
+    from .utils import get_con_description
+
+    con_id = getattr(workspace_layout, "_con_id", None)
+    if con_id is not None:
+        # The workspace already exists.
+        with tracer.span("match"):
+            workspace_con = await find_con_by_id_async(connection, con_id)
             match_existing_windows(workspace_con, workspace_layout)
-            logging.debug("Dissolving layout for workspace: %s", workspace_name)
-            dissolve_layout(connection, workspace_con)
-            logger.info("Applying layout for workspace: %s", workspace_name)
-            launch_applications_from_layout(connection, workspace_layout)
-            create_layout(connection, workspace_layout)
-            leftover_windows = find_leftover_windows(connection, workspace_layout)
-            if not leftover_windows:
-                resize_layout(connection, workspace_layout)
-            else:
-                error_message = (
-                    f"Found leftover windows on workspace {workspace_name}:\n"
-                    + "\n".join(f"- {get_con_description(w)}" for w in leftover_windows)
-                    + "\n"
-                    + "Not resizing layout."
+        with tracer.span("check applied"):
+            if await is_layout_applied_async(connection, workspace_layout):
+                logger.info(
+                    "Workspace %s already matches the layout, skipping it",
+                    workspace_name,
                 )
-                click.echo(error_message, err=True)
-                if ctx.obj.notifications:
-                    error_notification("Applying layout", error_message)
-                notification.successful = False
-            apply_marks(connection, workspace_layout)
-            move_workspace_to_output(connection, workspace_layout)
-            if not leftover_windows and not check_layout(connection, workspace_layout):
-                error_message = f"Failed to apply layout to {workspace_name}"
-                click.echo(error_message, err=True)
-                if ctx.obj.notifications:
-                    error_notification("Applying layout", error_message)
-                notification.successful = False
-
-        focused_layout = find_focused_element_in_layout(configuration)
-        if focused_layout is not None:
-            assert focused_layout._con_id is not None
-            focused_con = find_con_by_id(connection, focused_layout._con_id)
-            run_command_on(focused_con, "focus")
-            logger.info(
-                f"Focused element in layout: {get_con_description(focused_con)}",
+                return True
+
+    if not any(get_launch_configs(workspace_layout)):
+        logger.info(
+            "The layout of workspace %s has no windows, skipping it", workspace_name
+        )
+        return True
+
+    logger.info("Applying layout for workspace: %s", workspace_name)
+    # The workspace is built without focusing it: missing applications are
+    # launched on the focused workspace and moved over afterwards.
+    with tracer.span("launch"):
+        try:
+            await launch_applications_from_layout_async(
+                connection,
+                workspace_layout,
+                concurrent=concurrent_launch,
+                history=history,
+            )
+        except RuntimeError as e:
+            # Without all windows, the layout cannot be built.
+            error_message = (
+                f"Failed to launch the applications of {workspace_name}: {e}"
             )
-        else:
-            logger.debug("No focused element found in layout")
+            click.echo(error_message, err=True)
+            if ctx.obj.notifications:
+                error_notification("Applying layout", error_message)
+            return False
+    with tracer.span("gather"):
+        await move_windows_to_workspace_async(
+            connection, workspace_name, workspace_layout
+        )
+    with tracer.span("reconcile"):
+        await reconcile_layout_async(connection, workspace_layout)
 
-        logger.info(f"Applied layout for {len(workspace_layout_mapping)} workspace(s)")
+    successful = True
+    leftover_windows = await find_leftover_windows_async(connection, workspace_layout)
+    if not leftover_windows:
+        with tracer.span("resize"):
+            await resize_layout_async(connection, workspace_layout)
+    else:
+        error_message = (
+            f"Found leftover windows on workspace {workspace_name}:\n"
+            + "\n".join(f"- {get_con_description(w)}" for w in leftover_windows)
+            + "\n"
+            + "Not resizing layout."
+        )
+        click.echo(error_message, err=True)
+        if ctx.obj.notifications:
+            error_notification("Applying layout", error_message)
+        successful = False
+    with tracer.span("marks"):
+        await apply_marks_async(connection, workspace_layout)
+    with tracer.span("output"):
+        await move_workspace_to_output_async(connection, workspace_layout)
+    with tracer.span("check"):
+        if not leftover_windows and not await check_layout_async(
+            connection, workspace_layout
+        ):
+            error_message = f"Failed to apply layout to {workspace_name}"
+            click.echo(error_message, err=True)
+            if ctx.obj.notifications:
+                error_notification("Applying layout", error_message)
+            successful = False
+    return successful
 
 
 @main.command("save")
-@click.argument("layout_file", type=click.File("w"), required=False)
+@click.argument(
+    "layout_file",
+    type=click.Path(dir_okay=False, allow_dash=True, path_type=Path),
+    required=False,
+)
 @click.option(
     "-w",
     "--workspace",
@@ -141,22 +406,324 @@ def main_apply(ctx: click.Context, layout_file):
     multiple=True,
     help="Restrict to specific workspaces",
 )
+@click.option(
+    "--split-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Write every workspace to its own layout file in this directory "
+    + "instead of one layout file.",
+)
+@click.option(
+    "--snapshot",
+    is_flag=False,
+    flag_value="",
+    default=None,
+    metavar="[NAME]",
+    help="Add the layout to the snapshots instead of writing a layout file, "
+    + "optionally under a name.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    help="Keep running and save the workspaces again whenever they change.",
+)
+@click.option(
+    "--trace",
+    "trace_file",
+    type=click.File("w"),
+    default=None,
+    help="Write a Chrome trace of the phases and their IPC cost to the file "
+    + "and print a summary.",
+)
 @click.pass_context
-def main_save(ctx: click.Context, layout_file: TextIO | None, workspace):
-    connection: Connection = ctx.obj.connection
-    assert connection is not None
+def main_save(
+    ctx: click.Context,
+    layout_file: Path | None,
+    workspace,
+    split_dir: Path | None,
+    snapshot: str | None,
+    watch: bool,
+    trace_file: TextIO | None,
+):
+    from .layout_creation import iter_workspace_layouts
+    from .layout_files import (
+        save_workspace_layouts,
+        save_workspace_layouts_to_directory,
+    )
+    from .notifications import flush_notifications, progress_notification
+    from .snapshots import SnapshotStore, check_snapshot_name
+    from .tracing import Tracer
+    from .utils import write_atomically
 
-    if layout_file is None:
-        layout_file = sys.stdout
+    if [layout_file, split_dir, snapshot].count(None) < 2:
+        raise click.UsageError(
+            "LAYOUT_FILE, --split-dir and --snapshot cannot be combined."
+        )
+    snapshot_name = snapshot or None
+    if snapshot_name is not None:
+        try:
+            check_snapshot_name(snapshot_name)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--snapshot") from e
+    if layout_file == Path("-"):
+        layout_file = None
+    if watch:
+        _watch_layout(
+            layout_file,
+            split_dir,
+            snapshot is not None,
+            snapshot_name,
+            list(workspace) or None,
+        )
+        return
 
-    with progress_notification("Creating layout", "Creation") as notification:
-        if ctx.obj.notifications:
-            notification.start()
-        layout = create_layout_from_workspace(connection, list(workspace) or None)
-        save_layout_configuration(layout, layout_file)
+    connection = ctx.obj.connection
+    tracer = Tracer(connection)
+
+    try:
+        with progress_notification("Creating layout", "Creation") as notification:
+            if ctx.obj.notifications:
+                notification.start()
+            # Every workspace is serialized as soon as it has been created.
+            with tracer.span("create and write layout"):
+                workspaces = iter_workspace_layouts(connection, list(workspace) or None)
+                if snapshot is not None:
+                    SnapshotStore().save(workspaces, snapshot_name)
+                elif split_dir is not None:
+                    save_workspace_layouts_to_directory(workspaces, split_dir)
+                elif layout_file is None:
+                    save_workspace_layouts(workspaces, sys.stdout)
+                else:
+                    # Replace the file at once, so that a failure does not
+                    # leave a truncated layout behind.
+                    buffer = io.StringIO()
+                    save_workspace_layouts(workspaces, buffer)
+                    write_atomically(layout_file, buffer.getvalue())
+    finally:
+        flush_notifications()
+        if trace_file is not None:
+            _write_trace(tracer, trace_file)
 
     logger.info("Layout creation completed.")
 
 
+def _watch_layout(
+    layout_file: Path | None,
+    split_dir: Path | None,
+    snapshot: bool,
+    snapshot_name: str | None,
+    workspace: list[str] | None,
+) -> None:
+    """Save the layout whenever it changes, until interrupted."""
+
+    from .autosave import WATCH_EVENTS, AutoSaver
+    from .connection import SwayConnection
+    from .snapshots import SnapshotStore
+
+    if split_dir is None and not snapshot and layout_file is None:
+        raise click.UsageError(
+            "--watch requires LAYOUT_FILE, --split-dir or --snapshot."
+        )
+
+    connection = SwayConnection(events=WATCH_EVENTS)
+    saver = AutoSaver(
+        connection,
+        layout_file,
+        split_dir,
+        workspace,
+        SnapshotStore() if snapshot else None,
+        snapshot_name,
+    )
+    try:
+        saver.watch()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        saver.close()
+        connection.close()
+
+
+@main.command("check")
+@click.argument("layout_file", type=click.File("r"))
+@click.pass_context
+def main_check(ctx: click.Context, layout_file: TextIO):
+    """Check if a layout is applied.
+
+    Exits with status 1 if a workspace does not match the layout.
+    """
+
+    import pydantic
+    import yaml
+
+    from .applications import match_existing_windows
+    from .connection import find_con_by_id
+    from .layout import is_layout_applied
+    from .layout_files import map_workspaces
+
+    connection = ctx.obj.connection
+
+    try:
+        configuration = _load_layout(ctx, layout_file)
+    except (yaml.YAMLError, pydantic.ValidationError) as e:
+        click.echo(f"Failed to read layout configuration: {e}", err=True)
+        ctx.exit(2)
+
+    applied = True
+    for workspace_name, workspace_layout in map_workspaces(
+        connection, configuration
+    ).items():
+        con_id = getattr(workspace_layout, "_con_id", None)
+        if con_id is not None:
+            workspace_con = find_con_by_id(connection, con_id)
+            match_existing_windows(workspace_con, workspace_layout)
+            if is_layout_applied(connection, workspace_layout):
+                continue
+        click.echo(f"Workspace {workspace_name} does not match the layout")
+        applied = False
+
+    if not applied:
+        ctx.exit(1)
+    click.echo("The layout is applied")
+
+
+@main.command("daemon")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="The socket to listen on. Defaults to sway-out.sock in "
+    + "$XDG_RUNTIME_DIR or $SWAY_OUT_SOCKET if set.",
+)
+@click.pass_context
+def main_daemon(ctx: click.Context, socket_path: Path | None):
+    """Run apply, save and check forwarded by sway-out-client.
+
+    The connection to Sway and the parsed layout files are kept in memory
+    between the commands.
+    """
+
+    from .daemon import Daemon, LayoutCache
+    from .forwarding import get_socket_path
+
+    state: GlobalState = ctx.obj
+    state.layouts = LayoutCache()
+    daemon = Daemon(
+        state.connection,
+        socket_path or Path(get_socket_path()),
+        functools.partial(_run_forwarded_command, state),
+    )
+    daemon.serve()
+
+
+@main.group("snapshots")
+def main_snapshots():
+    """Manage the snapshots saved with `save --snapshot`."""
+
+
+@main_snapshots.command("list")
+def main_snapshots_list():
+    """List the snapshots, oldest first."""
+
+    import time
+
+    from .snapshots import SnapshotStore
+
+    store = SnapshotStore()
+    snapshots = store.get_all()
+    ids = {snapshot.id for snapshot in snapshots}
+    # Named snapshots outlive their entry in the log when it is pruned.
+    snapshots += [s for s in store.get_named() if s.id not in ids]
+    for snapshot in snapshots:
+        click.echo(
+            f"{snapshot.id}  "
+            + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot.time))
+            + f"  {len(snapshot.workspaces):>3} workspace(s)"
+            + (f"  {snapshot.name}" if snapshot.name is not None else "")
+        )
+
+
+@main_snapshots.command("prune")
+@click.option(
+    "--keep",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Keep only this many of the most recent snapshots.",
+)
+@click.option(
+    "--max-age",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Remove the snapshots older than this many days.",
+)
+def main_snapshots_prune(keep: int | None, max_age: float | None):
+    """Remove old snapshots and the workspace layouts only they use.
+
+    The latest snapshot and the named snapshots are always kept.
+    """
+
+    from .snapshots import SnapshotStore
+
+    if keep is None and max_age is None:
+        raise click.UsageError("At least one of --keep and --max-age is required.")
+    removed, removed_objects = SnapshotStore().prune(
+        keep, max_age * 24 * 60 * 60 if max_age is not None else None
+    )
+    click.echo(
+        f"Removed {removed} snapshot(s) and {removed_objects} workspace layout(s)."
+    )
+
+
+def _run_forwarded_command(state: GlobalState, args: list[str]) -> int:
+    """Run a command for the daemon.
+
+    Returns:
+        The exit code of the command.
+    """
+
+    try:
+        result = main.main(args, prog_name=PROG_NAME, obj=state, standalone_mode=False)
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+    except click.Abort:
+        click.echo("Aborted!", err=True)
+        return 1
+    except Exception as e:
+        logger.exception("Forwarded command failed")
+        click.echo(f"Error: {e}", err=True)
+        return 1
+    # Without standalone mode, click returns the exit code of `ctx.exit()`.
+    return result if isinstance(result, int) else 0
+
+
+def _load_layout(ctx: click.Context, layout_file: TextIO) -> "Layout":
+    """Load a layout configuration, from the cache of the daemon or on disk."""
+
+    from .layout_cache import load_layout_configuration_cached
+
+    if ctx.obj.layouts is not None:
+        return ctx.obj.layouts.load(layout_file)
+    return load_layout_configuration_cached(layout_file)
+
+
+def _write_trace(
+    tracer: "Tracer", trace_file: TextIO, history: "LaunchHistory | None" = None
+) -> None:
+    """Write the trace to the file and print the summary to stderr.
+
+    With a history, the launch times of this run and the learned timeouts are
+    printed as well.
+    """
+
+    from .applications import LAUNCH_TIMEOUT_SECONDS
+
+    tracer.write_chrome_trace(trace_file)
+    click.echo(tracer.summary(), err=True)
+    if history is not None and (launches := history.summary(LAUNCH_TIMEOUT_SECONDS)):
+        click.echo(launches, err=True)
+
+
 if __name__ == "__main__":
     main()
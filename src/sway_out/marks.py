@@ -2,13 +2,21 @@
 
 from i3ipc import Connection
 
-from .connection import find_cons_by_id, run_command_on
+from .connection import (
+    AsyncConnection,
+    CommandBatch,
+    SyncConnectionAdapter,
+    get_tree_index,
+    run_sync,
+)
 from .layout_files import ApplicationLaunchConfig, ContainerConfig, WorkspaceLayout
 
 
 def has_marks(connection: Connection, workspace_layout: WorkspaceLayout) -> bool:
     """Check if the the workspace has all marks from the layout assigned.
 
+    All marks are checked against a single snapshot of the tree.
+
     Parameters:
         connection: A connection to Sway.
         workspace_layout: The layout containing the marks to check for.
@@ -17,15 +25,28 @@ def has_marks(connection: Connection, workspace_layout: WorkspaceLayout) -> bool
         True if the workspace has all marks assigned, False otherwise.
     """
 
+    return run_sync(
+        has_marks_async(SyncConnectionAdapter(connection), workspace_layout)
+    )
+
+
+async def has_marks_async(
+    connection: AsyncConnection, workspace_layout: WorkspaceLayout
+) -> bool:
+    """Asynchronous version of [has_marks][sway_out.marks.has_marks]."""
+
     def go(layout: ContainerConfig | ApplicationLaunchConfig):
         assert layout._con_id is not None, "The layout has to be created to before"
-        (con,) = find_cons_by_id(connection, layout._con_id)
+        con = index.find(layout._con_id)
+        if con is None:
+            return False
 
         return not (set(layout.assigned_marks) - set(con.marks)) and (
             not isinstance(layout, ContainerConfig)
             or all(go(child) for child in layout.children)
         )
 
+    index = get_tree_index(await connection.get_tree())
     return all(go(child) for child in workspace_layout.children)
 
 
@@ -33,22 +54,31 @@ def apply_marks(connection: Connection, workspace_layout: WorkspaceLayout) -> No
     """Apply marks to containers in the specified workspace layout.
 
     All nodes with marks in the workspace layout have to have their con_id set.
+    All marks are assigned with a single IPC message.
 
     Parameters:
         connection: A connection to Sway.
         workspace_layout: The layout containing the containers to mark.
     """
 
+    run_sync(apply_marks_async(SyncConnectionAdapter(connection), workspace_layout))
+
+
+async def apply_marks_async(
+    connection: AsyncConnection, workspace_layout: WorkspaceLayout
+) -> None:
+    """Asynchronous version of [apply_marks][sway_out.marks.apply_marks]."""
+
     def go(layout: ContainerConfig | ApplicationLaunchConfig):
         assert layout._con_id is not None, "The layout has to be created to before"
-        (con,) = find_cons_by_id(connection, layout._con_id)
         marks = layout.assigned_marks
         for m in marks:
-            run_command_on(con, f"mark --add {m}")
+            batch.run_command_on(layout._con_id, f"mark --add {m}")
 
         if isinstance(layout, ContainerConfig):
             for child in layout.children:
                 go(child)
 
-    for child in workspace_layout.children:
-        go(child)
+    async with CommandBatch(connection) as batch:
+        for child in workspace_layout.children:
+            go(child)
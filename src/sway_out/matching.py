@@ -1,40 +1,369 @@
 """Matching windows."""
 
+import bisect
 import logging
 import re
-from collections.abc import Generator
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass
 
 from i3ipc import Con, Connection
 
+from .connection import AsyncConnection, SyncConnectionAdapter, run_sync
 from .layout_files import WindowMatchExpression
 
 logger = logging.getLogger(__name__)
 
 
+REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+"""Characters with a special meaning in regular expressions."""
+
+REGEX_QUANTIFIERS = frozenset("*+?{")
+"""Characters that make the preceding character optional or repeated."""
+
+
+@dataclass(frozen=True)
+class AttributeMatcher:
+    """A compiled pattern for a single window attribute.
+
+    Attributes:
+        pattern: The compiled regular expression.
+        prefix: A literal string that every matching value starts with. It can
+            be used to look up candidates in a
+            [WindowIndex][sway_out.matching.WindowIndex].
+    """
+
+    pattern: re.Pattern[str]
+    prefix: str
+
+    @classmethod
+    def compile(cls, expression: str) -> "AttributeMatcher":
+        """Compile a match expression.
+
+        Arguments:
+            expression: The regular expression to compile.
+
+        Returns:
+            The compiled matcher.
+        """
+
+        return cls(re.compile(expression), get_literal_prefix(expression))
+
+    def matches(self, value: str | None) -> bool:
+        """Check if a value matches the pattern (at its start, like `re.match`)."""
+
+        return value is not None and self.pattern.match(value) is not None
+
+
+@dataclass(frozen=True)
+class WindowMatcher:
+    """A compiled [WindowMatchExpression][sway_out.layout_files.WindowMatchExpression].
+
+    Use [get_matcher][sway_out.matching.get_matcher] to get the matcher of an
+    expression, it is compiled only once.
+
+    Attributes:
+        wayland: Whether Wayland windows can match.
+        app_id: The pattern for the app_id of Wayland windows.
+        wayland_title: The pattern for the title of Wayland windows.
+        x11: Whether X11 windows can match.
+        window_class: The pattern for the class of X11 windows.
+        window_instance: The pattern for the instance of X11 windows.
+        x11_title: The pattern for the title of X11 windows.
+    """
+
+    wayland: bool
+    app_id: AttributeMatcher | None
+    wayland_title: AttributeMatcher | None
+    x11: bool
+    window_class: AttributeMatcher | None
+    window_instance: AttributeMatcher | None
+    x11_title: AttributeMatcher | None
+
+    @classmethod
+    def compile(cls, match_expression: WindowMatchExpression) -> "WindowMatcher":
+        """Compile a match expression.
+
+        Arguments:
+            match_expression: The match expression to compile.
+
+        Returns:
+            The compiled matcher.
+        """
+
+        def compile_attribute(expression: str | None) -> AttributeMatcher | None:
+            return None if expression is None else AttributeMatcher.compile(expression)
+
+        wayland = match_expression.wayland
+        x11 = match_expression.x11
+        return cls(
+            wayland=wayland is not None,
+            app_id=compile_attribute(wayland.app_id) if wayland else None,
+            wayland_title=compile_attribute(wayland.title) if wayland else None,
+            x11=x11 is not None,
+            window_class=compile_attribute(x11.class_) if x11 else None,
+            window_instance=compile_attribute(x11.instance) if x11 else None,
+            x11_title=compile_attribute(x11.title) if x11 else None,
+        )
+
+    @property
+    def specificity(self) -> int:
+        """A rough measure of how specific the matcher is, higher is more specific.
+
+        This is the number of constrained attributes plus the length of their
+        literal prefixes.
+        """
+
+        return sum(
+            1 + len(attribute.prefix)
+            for attribute in (
+                self.app_id,
+                self.wayland_title,
+                self.window_class,
+                self.window_instance,
+                self.x11_title,
+            )
+            if attribute is not None
+        )
+
+    def matches(self, con: Con) -> bool:
+        """Check if a window matches.
+
+        Parameters:
+            con: The window to check.
+
+        Returns:
+            True if the window matches, False otherwise.
+        """
+
+        if con.app_id is not None:
+            # The window is Wayland native
+            return (
+                self.wayland
+                and (self.app_id is None or self.app_id.matches(con.app_id))
+                and (self.wayland_title is None or self.wayland_title.matches(con.name))
+            )
+        elif con.window_class is not None or con.window_instance is not None:
+            # The window runs under XWayland
+            return (
+                self.x11
+                and (self.x11_title is None or self.x11_title.matches(con.window_title))
+                and (
+                    self.window_class is None
+                    or self.window_class.matches(con.window_class)
+                )
+                and (
+                    self.window_instance is None
+                    or self.window_instance.matches(con.window_instance)
+                )
+            )
+        else:
+            return False
+
+
+class WindowIndex:
+    """An index over windows to find the candidates for a match expression.
+
+    Windows are indexed by their app_id, class and instance. Match expressions
+    with a literal prefix for one of these attributes only have to be checked
+    against the windows in the corresponding bucket instead of all windows.
+
+    Lookups return windows in the order they were passed in.
+
+    Arguments:
+        windows: The windows to index.
+    """
+
+    def __init__(self, windows: Iterable[Con]):
+        super().__init__()
+        self.windows: list[Con] = []
+        self._positions: dict[int, int] = {}
+        self._wayland: list[Con] = []
+        self._x11: list[Con] = []
+        self._app_ids = _PrefixBuckets()
+        self._classes = _PrefixBuckets()
+        self._instances = _PrefixBuckets()
+        for window in windows:
+            self._positions[window.id] = len(self.windows)
+            self.windows.append(window)
+            if window.app_id is not None:
+                self._wayland.append(window)
+                self._app_ids.add(window.app_id, window)
+            elif window.window_class is not None or window.window_instance is not None:
+                self._x11.append(window)
+                if window.window_class is not None:
+                    self._classes.add(window.window_class, window)
+                if window.window_instance is not None:
+                    self._instances.add(window.window_instance, window)
+
+    @classmethod
+    def from_workspace(cls, workspace: Con) -> "WindowIndex":
+        """Index the windows on a workspace.
+
+        Arguments:
+            workspace: A workspace tree object.
+
+        Returns:
+            The index of the leaves on the workspace.
+        """
+
+        return cls(workspace.leaves())
+
+    def find(self, match_expression: WindowMatchExpression) -> list[Con]:
+        """Find the windows that match an expression.
+
+        Arguments:
+            match_expression: The match expression to use.
+
+        Returns:
+            The matching windows.
+        """
+
+        matcher = get_matcher(match_expression)
+        candidates: list[Con] = []
+        if matcher.wayland:
+            candidates.extend(
+                self._wayland
+                if matcher.app_id is None or not matcher.app_id.prefix
+                else self._app_ids.find(matcher.app_id.prefix)
+            )
+        if matcher.x11:
+            if matcher.window_class is not None and matcher.window_class.prefix:
+                candidates.extend(self._classes.find(matcher.window_class.prefix))
+            elif matcher.window_instance is not None and matcher.window_instance.prefix:
+                candidates.extend(self._instances.find(matcher.window_instance.prefix))
+            else:
+                candidates.extend(self._x11)
+        candidates.sort(key=lambda window: self._positions[window.id])
+        return [window for window in candidates if matcher.matches(window)]
+
+
+_last_window_index: tuple[Con, WindowIndex] | None = None
+"""The workspace indexed last and its index, which is usually used again."""
+
+
+def get_window_index(workspace: Con) -> WindowIndex:
+    """Get the index of the windows on a workspace of a snapshot of the tree.
+
+    The index of the last workspace is kept, so a workspace of a snapshot is
+    only indexed once as long as it is the one that is looked at, e.g. while
+    waiting for a window.
+
+    Arguments:
+        workspace: A workspace tree object.
+
+    Returns:
+        The index of the leaves on the workspace.
+    """
+
+    global _last_window_index
+
+    if _last_window_index is None or _last_window_index[0] is not workspace:
+        _last_window_index = (workspace, WindowIndex.from_workspace(workspace))
+    return _last_window_index[1]
+
+
+class _PrefixBuckets:
+    """Windows grouped by the value of an attribute, searchable by prefix."""
+
+    def __init__(self):
+        super().__init__()
+        self._buckets: dict[str, list[Con]] = {}
+        self._keys: list[str] | None = []
+
+    def add(self, key: str, window: Con) -> None:
+        if key not in self._buckets:
+            self._buckets[key] = []
+            self._keys = None
+        self._buckets[key].append(window)
+
+    def find(self, prefix: str) -> list[Con]:
+        if self._keys is None:
+            self._keys = sorted(self._buckets)
+        result: list[Con] = []
+        index = bisect.bisect_left(self._keys, prefix)
+        while index < len(self._keys) and self._keys[index].startswith(prefix):
+            result.extend(self._buckets[self._keys[index]])
+            index += 1
+        return result
+
+
+def get_matcher(match_expression: WindowMatchExpression) -> WindowMatcher:
+    """Get the compiled matcher of a match expression.
+
+    The matcher is compiled on first use and stored on the expression.
+
+    Parameters:
+        match_expression: The match expression.
+
+    Returns:
+        The compiled matcher.
+    """
+
+    matcher = match_expression._matcher
+    if matcher is None:
+        matcher = WindowMatcher.compile(match_expression)
+        match_expression._matcher = matcher
+    return matcher
+
+
+def get_literal_prefix(expression: str) -> str:
+    """Get a literal string that all matches of a regular expression start with.
+
+    Only simple cases are detected, the result may be shorter than the actual
+    prefix, e.g. empty.
+
+    Parameters:
+        expression: The regular expression.
+
+    Returns:
+        The literal prefix.
+    """
+
+    if "|" in expression:
+        # An alternation could make any prefix optional.
+        return ""
+    prefix: list[str] = []
+    index = 1 if expression.startswith("^") else 0
+    while index < len(expression):
+        character = expression[index]
+        if character == "\\":
+            escaped = expression[index + 1 : index + 2]
+            if not escaped or escaped.isalnum():
+                # A character class like \d or a back reference.
+                break
+            literal, index = escaped, index + 2
+        elif character in REGEX_METACHARACTERS:
+            break
+        else:
+            literal, index = character, index + 1
+        if index < len(expression) and expression[index] in REGEX_QUANTIFIERS:
+            # The character might not be there at all.
+            break
+        prefix.append(literal)
+    return "".join(prefix)
+
+
 def find_windows_on_workspace(
     match_expression: WindowMatchExpression, workspace: Con
 ) -> Generator[Con]:
     """Find all windows on a workspace given a match expression.
 
+    The windows are looked up in the index of the workspace, see
+    [get_window_index][sway_out.matching.get_window_index].
+
     Parameters:
         match_expression: The match expression to use.
         workspace: A workspace tree object.
     """
 
-    leaves = list(workspace.leaves())
+    index = get_window_index(workspace)
     logger.debug(
-        f'Looking for windows on the current workspace "{workspace.name}" with {len(leaves)} leaves'
+        f'Looking for windows on the current workspace "{workspace.name}" with '
+        + f"{len(index.windows)} leaves"
     )
-    for leaf in leaves:
-        if leaf.type not in ["con", "floating_con"]:
-            logger.debug(
-                f"Skipping leaf with type {leaf.type}: {leaf.name} ({leaf.window_title})"
-            )
-            continue
-
-        if is_window_matching(leaf, match_expression):
-            logger.debug(f"Matching leaf found: {leaf.name} ({leaf.window_title})")
-            yield leaf
+    for window in index.find(match_expression):
+        logger.debug(f"Matching leaf found: {window.name} ({window.window_title})")
+        yield window
 
     logger.debug("Finished window search")
 
@@ -50,61 +379,7 @@ def is_window_matching(con: Con, match_expression: WindowMatchExpression) -> boo
         True if the window matches the expression, False otherwise.
     """
 
-    if con.app_id is not None:
-        # The window is Wayland native
-        logger.debug(f"Checking Wayland con: {con.app_id} ({con.name})")
-        wayland = match_expression.wayland
-        if wayland is None:
-            return False
-        assert (
-            wayland.app_id is not None or wayland.title is not None
-        ), "At least one Wayland match expression must be provided, this should be enforced by the model."
-        return (
-            wayland.app_id is None
-            or (
-                con.app_id is not None
-                and re.match(wayland.app_id, con.app_id) is not None
-            )
-        ) and (
-            wayland.title is None
-            or (con.name is not None and re.match(wayland.title, con.name) is not None)
-        )
-    elif con.window_class is not None or con.window_instance is not None:
-        # The window runs under XWayland
-        logger.debug(
-            f"Checking XWayland con: {con.window_class},{con.window_instance} ({con.window_title})"
-        )
-        x11 = match_expression.x11
-        if x11 is None:
-            return False
-        assert (
-            x11.class_ is not None or x11.instance is not None or x11.title is not None
-        ), "At least one X11 match expression must be provided, this should be enforced by the model."
-        return (
-            (
-                x11.title is None
-                or (
-                    con.window_title is not None
-                    and re.match(x11.title, con.window_title) is not None
-                )
-            )
-            and (
-                x11.class_ is None
-                or (
-                    con.window_class is not None
-                    and re.match(x11.class_, con.window_class) is not None
-                )
-            )
-            and (
-                x11.instance is None
-                or (
-                    con.window_instance is not None
-                    and re.match(x11.instance, con.window_instance) is not None
-                )
-            )
-        )
-    else:
-        return False
+    return get_matcher(match_expression).matches(con)
 
 
 def find_current_workspace(connection: Connection) -> Con | None:
@@ -117,7 +392,13 @@ def find_current_workspace(connection: Connection) -> Con | None:
         The tree node of the current workspace or `None` if it is not available.
     """
 
-    tree = connection.get_tree()
+    return run_sync(find_current_workspace_async(SyncConnectionAdapter(connection)))
+
+
+async def find_current_workspace_async(connection: AsyncConnection) -> Con | None:
+    """Asynchronous version of [find_current_workspace][sway_out.matching.find_current_workspace]."""
+
+    tree = await connection.get_tree()
     focused = tree.find_focused()
     if focused is None:
         return None
@@ -1,15 +1,65 @@
-"""Utilities to indicate progress."""
+"""Utilities to indicate progress.
 
+Notifications are sent to `org.freedesktop.Notifications` over a single
+session bus connection that is kept open for the lifetime of the process, see
+[sway_out.dbus][sway_out.dbus]. Progress updates replace the previous
+notification by its ID. If the session bus is not available, `notify-send` is
+run instead.
+
+Notifications are shown by a background thread, so a slow or hung
+notification server never holds up the caller. Up to
+[MAX_PENDING_NOTIFICATIONS][sway_out.notifications.MAX_PENDING_NOTIFICATIONS]
+notifications wait to be shown. An update of a progress notification replaces
+its pending update instead of queueing behind it, and a progress notification
+is updated at most every
+[MIN_UPDATE_INTERVAL][sway_out.notifications.MIN_UPDATE_INTERVAL] seconds.
+Use [flush_notifications][sway_out.notifications.flush_notifications] or
+[wait_for_notifications][sway_out.notifications.wait_for_notifications]
+before exiting to show the remaining notifications.
+"""
+
+import asyncio
 import logging
 import subprocess
+import threading
+import time
+from collections import deque
 from collections.abc import Generator
 from contextlib import contextmanager
+from dataclasses import dataclass
 from typing import Literal, final
 
+from sway_out.dbus import DBusConnection
 from sway_out.utils import PROG_NAME
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATIONS_SERVICE = "org.freedesktop.Notifications"
+"""The bus name and interface of the notification server."""
+
+NOTIFICATIONS_PATH = "/org/freedesktop/Notifications"
+"""The object path of the notification server."""
+
+MAX_PENDING_NOTIFICATIONS = 32
+"""The maximum number of notifications waiting to be shown.
+
+Further notifications are dropped until the queue has room again.
+"""
+
+MIN_UPDATE_INTERVAL = 0.25
+"""The minimum number of seconds between two updates of a notification."""
+
+FLUSH_TIMEOUT = 2.0
+"""The default number of seconds to wait for the remaining notifications."""
+
+_URGENCY_LEVELS = {"low": 0, "normal": 1, "critical": 2}
+
+_session_bus: DBusConnection | None = None
+"""The connection used for all notifications, opened on first use."""
+
+_session_bus_unavailable = False
+"""Whether connecting to the session bus failed, so `notify-send` is used."""
+
 
 @final
 class ProgressNotification:
@@ -22,6 +72,8 @@ class ProgressNotification:
         self.text = text
         self.successful = True
         self.notification_id: int | None = None
+        self._started = False
+        self._last_shown: float | None = None
 
     def start(self):
         """Start the progress indicator.
@@ -29,11 +81,8 @@ class ProgressNotification:
         Without calling this method first, `self.update()` is a no-op.
         """
 
-        self.notification_id = _run_notify_send(
-            summary=self.summary,
-            text=f"{self.text} ...",
-            expire_time=self.EXPIRE_TIME,
-        )
+        self._started = True
+        self._show(text=f"{self.text} ...", expire_time=self.EXPIRE_TIME)
 
     def update(self, progress: int, total: int):
         """Update the progress.
@@ -41,12 +90,9 @@ class ProgressNotification:
         Does nothing if `self.start` is not called first.
         """
 
-        if self.notification_id is not None:
-            self.notification_id = _run_notify_send(
-                summary=self.summary,
-                text=f"{self.text} {progress}/{total}",
-                expire_time=self.EXPIRE_TIME,
-                replace_id=self.notification_id,
+        if self._started:
+            self._show(
+                text=f"{self.text} {progress}/{total}", expire_time=self.EXPIRE_TIME
             )
 
     def finish(self):
@@ -55,21 +101,13 @@ class ProgressNotification:
         Does nothing if `self.start` is not called first.
         """
 
-        if self.notification_id is not None:
+        if self._started:
             # We are intentionally not explicitly passing an expire_time to
             # respect use the user's configuration.
             if self.successful:
-                self.notification_id = _run_notify_send(
-                    summary=self.summary,
-                    text="Completed successfully.",
-                    replace_id=self.notification_id,
-                )
+                self._show(text="Completed successfully.")
             else:
-                self.notification_id = _run_notify_send(
-                    summary=self.summary,
-                    text="Completed with errors.",
-                    replace_id=self.notification_id,
-                )
+                self._show(text="Completed with errors.")
 
     def error(self, error_message: str):
         """Show that an error has occurred.
@@ -77,15 +115,23 @@ class ProgressNotification:
         Does nothing if `self.start` is not called first.
         """
 
-        if self.notification_id is not None:
-            self.notification_id = _run_notify_send(
-                summary=self.summary,
+        if self._started:
+            self._show(
                 text=(f"{self.text} - " if self.text else "")
                 + f"Error: {error_message}",
                 urgency="critical",
-                replace_id=self.notification_id,
             )
 
+    def _show(
+        self,
+        text: str,
+        urgency: Literal["low", "normal", "critical"] = "normal",
+        expire_time: int | None = None,
+    ):
+        """Show the notification or replace the previous one."""
+
+        _worker.submit(_Request(self, self.summary, text, urgency, expire_time))
+
 
 @contextmanager
 def progress_notification(stage: str, text: str) -> Generator[ProgressNotification]:
@@ -119,16 +165,204 @@ def error_notification(title: str, text: str) -> None:
         text: The error message.
     """
 
-    _ = _run_notify_send(summary=title, text=text, urgency="critical")
+    _worker.submit(_Request(None, title, text, "critical", None))
 
 
-def _run_notify_send(
+def flush_notifications(timeout: float | None = FLUSH_TIMEOUT) -> bool:
+    """Wait until all pending notifications are shown.
+
+    While waiting, progress notifications are updated without the rate limit.
+
+    Parameters:
+        timeout: The maximum number of seconds to wait, or `None` to wait
+            indefinitely.
+
+    Returns:
+        `False` if the timeout expired, `True` otherwise.
+    """
+
+    if _worker.flush(timeout):
+        return True
+    logger.warning(f"Gave up waiting for notifications after {timeout} seconds")
+    return False
+
+
+async def wait_for_notifications(timeout: float | None = FLUSH_TIMEOUT) -> bool:
+    """Asynchronous version of [flush_notifications][sway_out.notifications.flush_notifications]."""
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # Run by the sync engine, which has no event loop to wait in.
+        return flush_notifications(timeout)
+    return await asyncio.to_thread(flush_notifications, timeout)
+
+
+@dataclass
+class _Request:
+    """A notification waiting to be shown."""
+
+    notification: ProgressNotification | None
+    summary: str
+    text: str
+    urgency: Literal["low", "normal", "critical"]
+    expire_time: int | None
+
+
+class _Worker:
+    """Shows notifications in a background thread."""
+
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition()
+        self._queue: deque[_Request] = deque()
+        self._thread: threading.Thread | None = None
+        self._busy = False
+        self._flushing = 0
+
+    def submit(self, request: _Request) -> None:
+        with self._condition:
+            if request.notification is not None:
+                for index, pending in enumerate(self._queue):
+                    if pending.notification is request.notification:
+                        # Only the latest state of a notification is of interest.
+                        self._queue[index] = request
+                        return
+            if len(self._queue) >= MAX_PENDING_NOTIFICATIONS:
+                logger.warning(
+                    f"Dropping notification, too many are pending: {request.summary}"
+                )
+                return
+            self._queue.append(request)
+            if self._thread is None:
+                # A daemon thread, so that a hung notification server does not
+                # keep the process alive.
+                self._thread = threading.Thread(
+                    target=self._run, name="notifications", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: float | None) -> bool:
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(
+                    lambda: not self._queue and not self._busy, timeout
+                )
+            finally:
+                self._flushing -= 1
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                request = self._take()
+                self._busy = True
+            try:
+                self._show(request)
+            except Exception as e:
+                logger.warning(f"Failed to show notification: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _take(self) -> _Request:
+        """Wait for a request that is not rate limited and remove it."""
+
+        while True:
+            delays = [self._get_delay(request) for request in self._queue]
+            for index, delay in enumerate(delays):
+                if delay <= 0:
+                    request = self._queue[index]
+                    del self._queue[index]
+                    return request
+            self._condition.wait(min(delays, default=None))
+
+    def _get_delay(self, request: _Request) -> float:
+        notification = request.notification
+        if self._flushing or notification is None or notification._last_shown is None:
+            return 0
+        return notification._last_shown + MIN_UPDATE_INTERVAL - time.monotonic()
+
+    def _show(self, request: _Request) -> None:
+        notification = request.notification
+        notification_id = _notify(
+            summary=request.summary,
+            text=request.text,
+            urgency=request.urgency,
+            replace_id=notification.notification_id if notification else None,
+            expire_time=request.expire_time,
+        )
+        if notification is not None:
+            notification.notification_id = notification_id
+            notification._last_shown = time.monotonic()
+
+
+_worker = _Worker()
+
+
+def _get_session_bus() -> DBusConnection | None:
+    global _session_bus, _session_bus_unavailable
+
+    if _session_bus is None and not _session_bus_unavailable:
+        try:
+            _session_bus = DBusConnection()
+        except (OSError, RuntimeError) as e:
+            logger.info(f"Using notify-send, the session bus is not available: {e}")
+            _session_bus_unavailable = True
+    return _session_bus
+
+
+def _notify(
     summary: str,
     text: str,
     urgency: Literal["low", "normal", "critical"] = "normal",
     replace_id: int | None = None,
     expire_time: int | None = None,
 ) -> int:
+    global _session_bus, _session_bus_unavailable
+
+    session_bus = _get_session_bus()
+    if session_bus is None:
+        return _run_notify_send(summary, text, urgency, replace_id, expire_time)
+
+    try:
+        (notification_id,) = session_bus.call(
+            NOTIFICATIONS_SERVICE,
+            NOTIFICATIONS_PATH,
+            NOTIFICATIONS_SERVICE,
+            "Notify",
+            "susssasa{sv}i",
+            [
+                PROG_NAME,
+                replace_id or 0,
+                "",
+                summary,
+                text,
+                [],
+                {"urgency": ("y", _URGENCY_LEVELS[urgency])},
+                -1 if expire_time is None else expire_time,
+            ],
+        )
+    except (OSError, RuntimeError) as e:
+        logger.warning(f"Failed to show the notification over D-Bus: {e}")
+        session_bus.close()
+        _session_bus = None
+        _session_bus_unavailable = True
+        return _run_notify_send(summary, text, urgency, replace_id, expire_time)
+    logger.debug(f"Showing notification with ID {notification_id}: {summary} - {text}")
+    return notification_id
+
+
+def _get_notify_send_command(
+    summary: str,
+    text: str,
+    urgency: Literal["low", "normal", "critical"],
+    replace_id: int | None,
+    expire_time: int | None,
+) -> list[str]:
     command = [
         "notify-send",
         f"--app-name={PROG_NAME}",
@@ -141,6 +375,17 @@ def _run_notify_send(
         command.append(f"--replace-id={replace_id}")
     if expire_time is not None:
         command.append(f"--expire-time={expire_time}")
+    return command
+
+
+def _run_notify_send(
+    summary: str,
+    text: str,
+    urgency: Literal["low", "normal", "critical"] = "normal",
+    replace_id: int | None = None,
+    expire_time: int | None = None,
+) -> int:
+    command = _get_notify_send_command(summary, text, urgency, replace_id, expire_time)
     result = subprocess.run(command, capture_output=True, text=True)
     result.check_returncode()
     notification_id = int(result.stdout.strip())
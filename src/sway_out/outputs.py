@@ -1,11 +1,16 @@
 """Functions to place workspaces on outputs."""
 
 import logging
-from collections.abc import Generator
 
 from i3ipc import Connection
 
-from sway_out.connection import find_cons_by_id, run_command
+from sway_out.connection import (
+    AsyncConnection,
+    SyncConnectionAdapter,
+    find_con_by_id_async,
+    run_command_on_async,
+    run_sync,
+)
 from sway_out.layout_files import WorkspaceLayout
 
 logger = logging.getLogger(__name__)
@@ -14,29 +19,104 @@ logger = logging.getLogger(__name__)
 def move_workspace_to_output(connection: Connection, workspace_layout: WorkspaceLayout):
     """Move the given workspace_layout to the output if one is specified and available."""
 
-    if workspace_layout.output is None:
-        outputs_to_try = []
-    elif isinstance(workspace_layout.output, str):
-        outputs_to_try = [workspace_layout.output]
-    else:
-        assert isinstance(workspace_layout.output, list)
-        outputs_to_try = workspace_layout.output
+    run_sync(
+        move_workspace_to_output_async(
+            SyncConnectionAdapter(connection), workspace_layout
+        )
+    )
 
-    existing_outputs = set(_get_output_names(connection))
+
+async def move_workspace_to_output_async(
+    connection: AsyncConnection, workspace_layout: WorkspaceLayout
+):
+    """Asynchronous version of [move_workspace_to_output][sway_out.outputs.move_workspace_to_output]."""
+
+    outputs_to_try = _get_outputs_to_try(workspace_layout)
+    existing_outputs = {output.name for output in await connection.get_outputs()}
     assert (
         workspace_layout._con_id is not None
     ), "The workspace needs to be populated first."
     for output in outputs_to_try:
         if output in existing_outputs:
-            run_command(connection, f"move workspace to output {output}")
+            # Sway moves the workspace of the window the command runs on, so
+            # the workspace does not need to be focused.
+            workspace_con = await find_con_by_id_async(
+                connection, workspace_layout._con_id
+            )
+            # The leaves include floating windows, so this also finds a window
+            # on a workspace without tiled ones.
+            con = next(iter(workspace_con.leaves()), None)
+            if con is None:
+                logger.warning(
+                    f"Workspace {workspace_con.name} has no windows, not moving "
+                    + f"it to {output}"
+                )
+                break
+            await run_command_on_async(
+                connection, con, f"move workspace to output {output}"
+            )
             logger.debug(f"Moved workspace to {output}")
             break
         else:
             logger.debug(f"Output {output} does not exist")
 
 
-def _get_output_names(connection: Connection) -> Generator[str]:
-    """Retrieve the names of the available outputs."""
+def is_workspace_on_output(
+    connection: Connection, workspace_layout: WorkspaceLayout
+) -> bool:
+    """Check if the workspace is on the output it would be moved to.
+
+    Parameters:
+        connection: A connection to Sway.
+        workspace_layout: The workspace layout with the con_id set.
 
-    for output in connection.get_outputs():
-        yield output.name
+    Returns:
+        `True` if
+        [move_workspace_to_output][sway_out.outputs.move_workspace_to_output]
+        would not move the workspace, `False` otherwise.
+    """
+
+    return run_sync(
+        is_workspace_on_output_async(
+            SyncConnectionAdapter(connection), workspace_layout
+        )
+    )
+
+
+async def is_workspace_on_output_async(
+    connection: AsyncConnection, workspace_layout: WorkspaceLayout
+) -> bool:
+    """Asynchronous version of [is_workspace_on_output][sway_out.outputs.is_workspace_on_output]."""
+
+    assert (
+        workspace_layout._con_id is not None
+    ), "The workspace needs to be populated first."
+    tree = await connection.get_tree()
+    for output_con in tree.nodes:
+        for workspace_con in output_con.nodes:
+            if workspace_con.id == workspace_layout._con_id:
+                current_output = output_con.name
+                break
+        else:
+            continue
+        break
+    else:
+        return False
+
+    existing_outputs = {output_con.name for output_con in tree.nodes}
+    for output in _get_outputs_to_try(workspace_layout):
+        if output in existing_outputs:
+            return output == current_output
+    return True
+
+
+def _get_outputs_to_try(workspace_layout: WorkspaceLayout) -> list[str]:
+    """Get the outputs configured for the workspace in order of preference."""
+
+    if workspace_layout.output is None:
+        return []
+    elif isinstance(workspace_layout.output, str):
+        return [workspace_layout.output]
+    else:
+        assert isinstance(workspace_layout.output, list)
+        return workspace_layout.output
@@ -0,0 +1,168 @@
+"""Information about the processes that own windows.
+
+The information is read from `/proc` by a
+[ProcessTable][sway_out.processes.ProcessTable], which reads every process at
+most once.
+"""
+
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProcessInfo:
+    """What is known about a process.
+
+    Attributes:
+        pid: The process ID.
+        cmdline: The command line arguments, empty if they cannot be read.
+        exe: The path of the executable, if it can be read.
+        ppid: The ID of the parent process.
+        session: The ID of the session of the process.
+    """
+
+    pid: int
+    cmdline: list[str]
+    exe: str | None
+    ppid: int | None
+    session: int | None
+
+
+class ProcessTable:
+    """A memoized view of `/proc`.
+
+    Processes that do not exist (anymore) or that cannot be read are
+    remembered as missing as well, so every PID is looked up at most once.
+
+    Parameters:
+        proc: The mount point of the proc file system.
+    """
+
+    def __init__(self, proc: Path = Path("/proc")):
+        super().__init__()
+        self.proc = proc
+        self._processes: dict[int, ProcessInfo | None] = {}
+        self._window_counts: Counter[int] = Counter()
+
+    def collect(self, pids: Iterable[int]) -> None:
+        """Read the processes of windows and their parents in one pass.
+
+        Parameters:
+            pids: The PIDs of the windows, once per window.
+        """
+
+        self._window_counts.update(pids)
+        for pid in self._window_counts:
+            self.get_ancestors(pid)
+        logger.debug(
+            f"Collected {len(self._processes)} processes for "
+            + f"{self._window_counts.total()} windows"
+        )
+
+    def get(self, pid: int) -> ProcessInfo | None:
+        """Get a process.
+
+        Parameters:
+            pid: The process ID.
+
+        Returns:
+            The process or `None` if it cannot be read.
+        """
+
+        try:
+            return self._processes[pid]
+        except KeyError:
+            process = self._processes[pid] = self._read(pid)
+            return process
+
+    def get_ancestors(self, pid: int) -> list[ProcessInfo]:
+        """Get the parent chain of a process within its session.
+
+        Applications launched by Sway run in their own session, so the last
+        process of the chain is usually the one Sway launched, e.g. a wrapper
+        script of the application.
+
+        Parameters:
+            pid: The process ID.
+
+        Returns:
+            The parents of the process, closest first, excluding the process
+            itself.
+        """
+
+        process = self.get(pid)
+        if process is None or process.session is None:
+            return []
+        ancestors = []
+        seen = {pid}
+        while process.ppid is not None and process.ppid not in seen:
+            parent = self.get(process.ppid)
+            if parent is None or parent.session != process.session:
+                break
+            ancestors.append(parent)
+            seen.add(parent.pid)
+            process = parent
+        return ancestors
+
+    def is_shared(self, pid: int) -> bool:
+        """Check if a process owns more than one of the collected windows.
+
+        This is the case for applications that open all their windows from a
+        single server process, like browsers, `foot --server` or
+        `gnome-terminal-server`. Their command line starts the server and not
+        a single window.
+
+        Parameters:
+            pid: The process ID.
+
+        Returns:
+            `True` if more than one window passed to
+            [collect][sway_out.processes.ProcessTable.collect] has the PID.
+        """
+
+        return self._window_counts[pid] > 1
+
+    def _read(self, pid: int) -> ProcessInfo | None:
+        directory = self.proc / str(pid)
+        try:
+            stat = (directory / "stat").read_text()
+        except FileNotFoundError:
+            logger.warning(f"Process {pid} not found at {directory}")
+            return None
+        except OSError as e:
+            logger.error(f"Error reading process {pid}: {e}")
+            return None
+
+        # The name in parentheses may contain spaces and parentheses itself.
+        fields = stat.rpartition(")")[2].split()
+        try:
+            ppid, session = int(fields[1]), int(fields[3])
+        except (IndexError, ValueError):
+            logger.error(f"Unexpected format of {directory / 'stat'}: {stat!r}")
+            ppid = session = None
+
+        try:
+            cmdline = (directory / "cmdline").read_bytes()
+        except OSError as e:
+            logger.warning(f"Error reading the command line of process {pid}: {e}")
+            cmdline = b""
+        try:
+            exe = os.readlink(directory / "exe")
+        except OSError:
+            # Only readable for processes of the same user.
+            exe = None
+
+        return ProcessInfo(
+            pid=pid,
+            # The arguments are terminated by null bytes.
+            cmdline=[a.decode(errors="replace") for a in cmdline.split(b"\0")[:-1]],
+            exe=exe,
+            ppid=ppid or None,
+            session=session,
+        )
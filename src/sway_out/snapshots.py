@@ -0,0 +1,464 @@
+"""A history of saved layouts that stores every workspace layout once.
+
+`sway-out save --snapshot [NAME]` adds the current layout to the
+[SnapshotStore][sway_out.snapshots.SnapshotStore] in
+[get_snapshot_directory][sway_out.snapshots.get_snapshot_directory] and
+`sway-out apply --snapshot NAME|latest` applies it again.
+
+The store is content-addressed: every distinct workspace layout is stored
+once in `objects`, named after the hash of its YAML text. A snapshot is only
+a manifest that maps the workspace names to these hashes, so saving a session
+in which few workspaces changed only adds a line to `snapshots.jsonl`. Named
+snapshots are additionally stored in `named/<NAME>.json` and replaced when a
+snapshot with the same name is saved.
+
+Loading a snapshot reads its manifest and one object per workspace: the
+latest snapshot is the last line of the log, which is read from the end.
+Old snapshots are removed with
+[prune][sway_out.snapshots.SnapshotStore.prune], which also removes the
+objects that no snapshot refers to anymore.
+
+Several processes may use the store at the same time, for example an
+autosaver and `sway-out snapshots prune`. Adding and pruning snapshots take
+the lock file `lock`, so no snapshot is appended while the log is rewritten.
+Objects are stored before the snapshot that refers to them is added, so
+pruning keeps unreferenced objects that are younger than
+[OBJECT_GRACE_SECONDS][sway_out.snapshots.OBJECT_GRACE_SECONDS].
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import yaml
+
+from .layout_files import YAML_LOADER, Layout, WorkspaceLayout
+from .utils import get_data_home, write_atomically
+
+logger = logging.getLogger(__name__)
+
+LATEST = "latest"
+"""The name that refers to the most recent snapshot."""
+
+NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+"""The pattern of valid snapshot names."""
+
+OBJECT_GRACE_SECONDS = 10 * 60
+"""The age below which workspace layouts are not pruned.
+
+A saver may have just stored a layout for a snapshot it has not added yet.
+"""
+
+
+def get_snapshot_directory() -> Path:
+    """Get the directory of the snapshot store.
+
+    Returns:
+        `snapshots` in [get_data_home][sway_out.utils.get_data_home].
+    """
+
+    return get_data_home() / "snapshots"
+
+
+def check_snapshot_name(name: str) -> None:
+    """Check that a snapshot name can be used for saving.
+
+    Parameters:
+        name: The name to check.
+
+    Raises:
+        ValueError: If the name is invalid.
+    """
+
+    if name == LATEST or not NAME_PATTERN.fullmatch(name):
+        raise ValueError(
+            f"Invalid snapshot name {name!r}: use letters, digits, '.', '_' and "
+            + f"'-', and not '{LATEST}'"
+        )
+
+
+@dataclass
+class Snapshot:
+    """The manifest of a saved layout.
+
+    Attributes:
+        id: The UTC time of the snapshot, which sorts chronologically.
+        time: The time of the snapshot in seconds since the epoch.
+        name: The name given when saving, if any.
+        workspaces: The workspace names and the hashes of their layouts, in
+            the order of the tree.
+    """
+
+    id: str
+    time: float
+    name: str | None = None
+    workspaces: list[tuple[str, str]] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, text: str | bytes) -> "Snapshot":
+        """Parse a manifest.
+
+        Parameters:
+            text: The JSON text of the manifest.
+
+        Raises:
+            ValueError: If the text is not a valid manifest.
+
+        Returns:
+            The snapshot.
+        """
+
+        try:
+            obj = json.loads(text)
+            return cls(
+                id=str(obj["id"]),
+                time=float(obj["time"]),
+                name=obj.get("name"),
+                workspaces=[(str(n), str(h)) for n, h in obj["workspaces"]],
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid snapshot manifest: {e}") from e
+
+    def to_json(self) -> str:
+        """Serialize the manifest as a single line of JSON."""
+
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+
+class SnapshotStore:
+    """Saved layouts with the workspace layouts stored by content.
+
+    Parameters:
+        directory: The directory of the store. Defaults to
+            [get_snapshot_directory][sway_out.snapshots.get_snapshot_directory].
+    """
+
+    def __init__(self, directory: Path | None = None):
+        super().__init__()
+        self.directory = (
+            directory if directory is not None else get_snapshot_directory()
+        )
+        self.log_path = self.directory / "snapshots.jsonl"
+        self.lock_path = self.directory / "lock"
+        self.objects_directory = self.directory / "objects"
+        self.named_directory = self.directory / "named"
+
+    def save(
+        self,
+        workspaces: Iterable[tuple[str, WorkspaceLayout]],
+        name: str | None = None,
+    ) -> Snapshot:
+        """Save a layout as a new snapshot.
+
+        The workspaces are stored as they are produced, like
+        [save_workspace_layouts][sway_out.layout_files.save_workspace_layouts]
+        writes them.
+
+        Parameters:
+            workspaces: The workspace names and their layouts.
+            name: The name of the snapshot.
+
+        Raises:
+            ValueError: If the name is invalid.
+
+        Returns:
+            The new snapshot.
+        """
+
+        if name is not None:
+            check_snapshot_name(name)
+        return self.add(
+            [
+                (workspace_name, self.put_workspace(workspace_layout))
+                for workspace_name, workspace_layout in workspaces
+            ],
+            name,
+        )
+
+    def put_workspace(self, workspace_layout: WorkspaceLayout) -> str:
+        """Store a workspace layout unless the same layout is stored already.
+
+        Parameters:
+            workspace_layout: The layout to store.
+
+        Returns:
+            The hash of the layout.
+        """
+
+        obj = workspace_layout.model_dump(exclude_none=True, exclude_unset=True)
+        text = yaml.dump(obj, None, yaml.SafeDumper, allow_unicode=True)
+        digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        path = self._get_object_path(digest)
+        try:
+            # A layout that is stored already is used again, which must keep
+            # it from being pruned before the snapshot is added.
+            os.utime(path)
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomically(path, text)
+            logger.debug(f"Stored workspace layout {digest}")
+        return digest
+
+    def add(
+        self, workspaces: Iterable[tuple[str, str]], name: str | None = None
+    ) -> Snapshot:
+        """Add a snapshot of workspace layouts that have been stored already.
+
+        Parameters:
+            workspaces: The workspace names and the hashes returned by
+                [put_workspace][sway_out.snapshots.SnapshotStore.put_workspace].
+            name: The name of the snapshot.
+
+        Raises:
+            ValueError: If the name is invalid.
+            RuntimeError: If one of the workspace layouts has been pruned
+                already.
+
+        Returns:
+            The new snapshot.
+        """
+
+        if name is not None:
+            check_snapshot_name(name)
+        workspaces = list(workspaces)
+        now = time.time()
+        snapshot = Snapshot(
+            id=time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+            + f".{int(now % 1 * 1_000_000):06d}Z",
+            time=now,
+            name=name,
+            workspaces=workspaces,
+        )
+        line = snapshot.to_json() + "\n"
+        with self._lock():
+            for workspace_name, digest in workspaces:
+                try:
+                    os.utime(self._get_object_path(digest))
+                except FileNotFoundError:
+                    raise RuntimeError(
+                        f"The layout of workspace {workspace_name} has been "
+                        + "pruned already"
+                    ) from None
+            # A single write in append mode does not interleave with the writes
+            # of other processes.
+            descriptor = os.open(
+                self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            try:
+                os.write(descriptor, line.encode())
+            finally:
+                os.close(descriptor)
+            if name is not None:
+                self.named_directory.mkdir(exist_ok=True)
+                write_atomically(self._get_named_path(name), line)
+        logger.info(
+            f"Saved snapshot {snapshot.id}"
+            + (f" as {name}" if name is not None else "")
+            + f" with {len(snapshot.workspaces)} workspace(s)"
+        )
+        return snapshot
+
+    def get(self, name: str) -> Snapshot:
+        """Get a snapshot by name.
+
+        Parameters:
+            name: The name of the snapshot or [LATEST][sway_out.snapshots.LATEST].
+
+        Raises:
+            RuntimeError: If there is no such snapshot.
+
+        Returns:
+            The snapshot.
+        """
+
+        if name == LATEST:
+            return self._get_latest()
+        try:
+            check_snapshot_name(name)
+            return Snapshot.from_json(self._get_named_path(name).read_bytes())
+        except FileNotFoundError:
+            raise RuntimeError(f"There is no snapshot named {name}") from None
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Failed to read snapshot {name}: {e}") from e
+
+    def load(self, name: str) -> Layout:
+        """Load the layout of a snapshot.
+
+        Parameters:
+            name: The name of the snapshot or [LATEST][sway_out.snapshots.LATEST].
+
+        Raises:
+            RuntimeError: If the snapshot or one of its workspace layouts
+                cannot be read.
+            pydantic.ValidationError: If a workspace layout is ill-formed.
+
+        Returns:
+            The layout.
+        """
+
+        snapshot = self.get(name)
+        workspaces = {}
+        for workspace_name, digest in snapshot.workspaces:
+            try:
+                with self._get_object_path(digest).open() as file:
+                    workspaces[workspace_name] = yaml.load(file, YAML_LOADER)
+            except (OSError, yaml.YAMLError) as e:
+                raise RuntimeError(
+                    f"Failed to read workspace {workspace_name} of snapshot "
+                    + f"{snapshot.id}: {e}"
+                ) from e
+        logger.info(f"Loaded snapshot {snapshot.id}")
+        return Layout.model_validate({"workspaces": workspaces})
+
+    def get_all(self) -> list[Snapshot]:
+        """Get all snapshots.
+
+        Lines of the log that cannot be parsed are skipped.
+
+        Returns:
+            The snapshots, oldest first.
+        """
+
+        try:
+            lines = self.log_path.read_bytes().splitlines()
+        except FileNotFoundError:
+            return []
+        snapshots = []
+        for line in lines:
+            try:
+                snapshots.append(Snapshot.from_json(line))
+            except ValueError as e:
+                logger.warning(f"Skipping a snapshot in {self.log_path}: {e}")
+        return snapshots
+
+    def get_named(self) -> list[Snapshot]:
+        """Get the named snapshots.
+
+        Returns:
+            The named snapshots, sorted by name.
+        """
+
+        snapshots = []
+        for path in sorted(self.named_directory.glob("*.json")):
+            try:
+                snapshots.append(Snapshot.from_json(path.read_bytes()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping the snapshot {path}: {e}")
+        return snapshots
+
+    def prune(
+        self,
+        keep: int | None = None,
+        max_age_seconds: float | None = None,
+        grace_seconds: float = OBJECT_GRACE_SECONDS,
+    ) -> tuple[int, int]:
+        """Remove old snapshots and the workspace layouts only they refer to.
+
+        The latest snapshot and the named snapshots are never removed.
+
+        Parameters:
+            keep: The number of most recent snapshots to keep.
+            max_age_seconds: Remove the snapshots older than this.
+            grace_seconds: Keep the unreferenced workspace layouts that have
+                been stored or used more recently than this.
+
+        Returns:
+            The number of removed snapshots and of removed workspace layouts.
+        """
+
+        with self._lock():
+            snapshots = self.get_all()
+            kept = snapshots
+            if keep is not None:
+                kept = kept[max(len(kept) - keep, 0) :]
+            if max_age_seconds is not None:
+                cutoff = time.time() - max_age_seconds
+                kept = [s for s in kept if s.time >= cutoff]
+            if snapshots and not kept:
+                kept = snapshots[-1:]
+            if len(kept) < len(snapshots):
+                write_atomically(
+                    self.log_path, "".join(s.to_json() + "\n" for s in kept)
+                )
+
+            referenced = {
+                digest
+                for snapshot in [*kept, *self.get_named()]
+                for _, digest in snapshot.workspaces
+            }
+            used_before = time.time() - grace_seconds
+            removed_objects = 0
+            for path in self.objects_directory.glob("*/*.yaml"):
+                if path.stem in referenced:
+                    continue
+                try:
+                    if path.stat().st_mtime >= used_before:
+                        continue
+                except FileNotFoundError:
+                    continue
+                path.unlink(missing_ok=True)
+                removed_objects += 1
+
+        removed = len(snapshots) - len(kept)
+        logger.info(
+            f"Removed {removed} snapshot(s) and {removed_objects} workspace layout(s)"
+        )
+        return removed, removed_objects
+
+    def _get_latest(self) -> Snapshot:
+        try:
+            line = _read_last_line(self.log_path)
+        except FileNotFoundError:
+            line = b""
+        if not line:
+            raise RuntimeError("There are no snapshots")
+        try:
+            return Snapshot.from_json(line)
+        except ValueError as e:
+            # The last line may be incomplete after a crash.
+            logger.warning(f"Ignoring the last snapshot in {self.log_path}: {e}")
+            if snapshots := self.get_all():
+                return snapshots[-1]
+            raise RuntimeError("There are no snapshots") from None
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """Hold the lock of the store against other processes."""
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as file:
+            # The lock is released when the file is closed.
+            fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def _get_object_path(self, digest: str) -> Path:
+        # Spread the objects over subdirectories to keep directories small.
+        return self.objects_directory / digest[:2] / f"{digest}.yaml"
+
+    def _get_named_path(self, name: str) -> Path:
+        return self.named_directory / f"{name}.json"
+
+
+def _read_last_line(path: Path, block_size: int = 4096) -> bytes:
+    """Read the last non-empty line of a file without reading all of it."""
+
+    with path.open("rb") as file:
+        position = file.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            file.seek(position)
+            data = file.read(size) + data
+            lines = data.rstrip(b"\n").rsplit(b"\n", 1)
+            if len(lines) == 2:
+                return lines[1]
+        return data.rstrip(b"\n")
@@ -1,7 +1,10 @@
 """Type stubs for i3ipc."""
 
+from socket import socket
 from typing import Iterator
 
+from i3ipc.aio import Connection as AioConnection
+
 class Con:
     id: int
     pid: int | None
@@ -10,6 +13,8 @@ class Con:
     layout: str
     focused: bool
     nodes: list[Con]
+    floating_nodes: list[Con]
+    parent: Con | None
     marks: list[str]
     window_title: str | None
     app_id: str | None
@@ -38,10 +43,36 @@ class CommandReply:
     error: str | None
     ipc_data: object
 
+class OutputReply:
+    name: str
+
+class TickReply:
+    success: bool
+
 class Connection:
+    _cmd_socket: socket
     def __init__(self, socket_path: str | None = None) -> None: ...
+    @property
+    def socket_path(self) -> str: ...
+    def _message(self, message_type: int, payload: str) -> str: ...
     def command(self, command: str) -> list[CommandReply]: ...
     def get_tree(self) -> Con: ...
     def get_marks(self) -> list[str]: ...
+    def get_outputs(self) -> list[OutputReply]: ...
+    def send_tick(self, payload: str = "") -> TickReply: ...
+
+class IpcBaseEvent: ...
+
+class WindowEvent(IpcBaseEvent):
+    change: str
+    container: Con
+    def __init__(
+        self, data: dict[str, object], conn: Connection | AioConnection
+    ) -> None: ...
+
+class WorkspaceEvent(IpcBaseEvent):
+    change: str
+    current: Con | None
+    old: Con | None
 
 def Event(name: str) -> type: ...
@@ -0,0 +1,23 @@
+"""Type stubs for i3ipc.aio."""
+
+from asyncio import AbstractEventLoop
+from socket import socket
+from typing import Any
+
+from i3ipc import CommandReply, Con, OutputReply, TickReply
+
+class Connection:
+    _cmd_socket: socket
+    _sub_socket: socket
+    _sub_fd: int
+    _loop: AbstractEventLoop
+    def __init__(self, socket_path: str | None = None) -> None: ...
+    @property
+    def socket_path(self) -> str: ...
+    async def connect(self) -> Connection: ...
+    async def _message(self, message_type: Any, payload: str = "") -> bytes: ...
+    async def command(self, cmd: str) -> list[CommandReply]: ...
+    async def get_tree(self) -> Con: ...
+    async def get_marks(self) -> list[str]: ...
+    async def get_outputs(self) -> list[OutputReply]: ...
+    async def send_tick(self, payload: str = "") -> TickReply: ...
@@ -0,0 +1,205 @@
+"""Tracing of the phases of a command and their IPC cost."""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TextIO
+
+from .connection import AsyncSwayConnection, IpcStatistics, SwayConnection
+
+
+@dataclass
+class Span:
+    """A phase of a command that has been traced."""
+
+    name: str
+    """The name of the span, e.g. the phase or the workspace."""
+
+    category: str
+    """The category of the span, used to group spans in the summary."""
+
+    start_seconds: float
+    """The start of the span relative to the start of the trace."""
+
+    duration_seconds: float
+    """The duration of the span."""
+
+    statistics: IpcStatistics
+    """The IPC traffic during the span."""
+
+    args: dict[str, str] = field(default_factory=dict)
+    """Additional information about the span."""
+
+
+class Tracer:
+    """Records spans and the IPC traffic of a connection within them.
+
+    The spans can be written as Chrome trace events, see
+    [write_chrome_trace][sway_out.tracing.Tracer.write_chrome_trace], which
+    can be viewed with e.g. Perfetto or `chrome://tracing`.
+
+    Arguments:
+        connection: The connection whose traffic is accounted.
+    """
+
+    def __init__(self, connection: SwayConnection | AsyncSwayConnection):
+        super().__init__()
+        self.connection = connection
+        self.spans: list[Span] = []
+        self._start = time.perf_counter()
+        self._start_statistics = connection.statistics.copy()
+        self._samples: list[tuple[float, IpcStatistics]] = []
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args: str) -> Generator[None]:
+        """Record a span while the context is active.
+
+        Spans can be nested. The span is recorded even if the context is left
+        with an exception.
+
+        Arguments:
+            name: The name of the span.
+            category: The category of the span.
+            args: Additional information to attach to the span.
+        """
+
+        statistics = self.connection.statistics.copy()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append(
+                Span(
+                    name,
+                    category,
+                    start - self._start,
+                    end - start,
+                    self.connection.statistics.difference(statistics),
+                    args,
+                )
+            )
+            self._samples.append((end - self._start, self.total))
+
+    @property
+    def total(self) -> IpcStatistics:
+        """The IPC traffic since the tracer was created."""
+
+        return self.connection.statistics.difference(self._start_statistics)
+
+    def write_chrome_trace(self, file: TextIO) -> None:
+        """Write the spans in the Chrome trace event format.
+
+        Every span becomes a complete event with its IPC traffic as arguments.
+        The IPC counters at the end of every span are added as counter events.
+
+        Arguments:
+            file: The destination file.
+        """
+
+        pid = os.getpid()
+        tid = threading.get_native_id()
+        events: list[dict[str, object]] = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": pid,
+                "args": {"name": "sway-out"},
+            }
+        ]
+        for span in sorted(self.spans, key=lambda s: s.start_seconds):
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": span.start_seconds * 1e6,
+                    "dur": span.duration_seconds * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {**span.args, **_statistics_args(span.statistics)},
+                }
+            )
+        for end_seconds, total in self._samples:
+            events.append(
+                {
+                    "name": "IPC",
+                    "ph": "C",
+                    "ts": end_seconds * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {
+                        "GET_TREE": total.messages["GET_TREE"],
+                        "RUN_COMMAND": total.messages["RUN_COMMAND"],
+                        "KiB received": total.bytes_received / 1024,
+                    },
+                }
+            )
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def summary(self) -> str:
+        """Summarize the spans per phase in a table.
+
+        Spans of the same name in the `phase` category, e.g. of different
+        workspaces, are added up.
+
+        Returns:
+            The table as text.
+        """
+
+        phases: dict[str, tuple[int, float, IpcStatistics]] = {}
+        for span in self.spans:
+            if span.category != "phase":
+                continue
+            count, seconds, statistics = phases.get(
+                span.name, (0, 0.0, IpcStatistics())
+            )
+            phases[span.name] = (
+                count + 1,
+                seconds + span.duration_seconds,
+                statistics.sum(span.statistics),
+            )
+
+        total_seconds = time.perf_counter() - self._start
+        rows = [
+            ("phase", "count", "ms", "GET_TREE", "RUN_COMMAND", "KiB recv", "IPC ms")
+        ]
+        for name, (count, seconds, statistics) in phases.items():
+            rows.append(_summary_row(name, str(count), seconds, statistics))
+        rows.append(_summary_row("total", "", total_seconds, self.total))
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+
+
+def _statistics_args(statistics: IpcStatistics) -> dict[str, int | float]:
+    return {
+        **statistics.messages,
+        "events": statistics.events,
+        "bytes_received": statistics.bytes_received,
+        "blocked_ms": statistics.blocked_seconds * 1000,
+    }
+
+
+def _summary_row(
+    name: str, count: str, seconds: float, statistics: IpcStatistics
+) -> tuple[str, str, str, str, str, str, str]:
+    return (
+        name,
+        count,
+        f"{seconds * 1000:.1f}",
+        str(statistics.messages["GET_TREE"]),
+        str(statistics.messages["RUN_COMMAND"]),
+        f"{statistics.bytes_received / 1024:.1f}",
+        f"{statistics.blocked_seconds * 1000:.1f}",
+    )
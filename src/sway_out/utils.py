@@ -1,11 +1,64 @@
 """Small utility function."""
 
-from i3ipc import Con
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from i3ipc import Con
 
 PROG_NAME = "sway-out"
 
 
-def is_window(con: Con) -> bool:
+def get_cache_home() -> Path:
+    """Get the directory for the cached data of sway-out.
+
+    Returns:
+        `sway-out` in `$XDG_CACHE_HOME`, which defaults to `~/.cache`.
+    """
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / PROG_NAME
+
+
+def get_data_home() -> Path:
+    """Get the directory for the data of sway-out.
+
+    Unlike the cached data, the data cannot be recreated.
+
+    Returns:
+        `sway-out` in `$XDG_DATA_HOME`, which defaults to `~/.local/share`.
+    """
+
+    data_home = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(data_home) / PROG_NAME
+
+
+def write_atomically(path: Path, data: str | bytes) -> None:
+    """Replace the content of a file atomically.
+
+    The data is written to a temporary file in the same directory first, so
+    readers never see a partially written file, even if the process crashes.
+
+    Parameters:
+        path: The file to write.
+        data: The new content, as text or as bytes.
+    """
+
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "wb" if isinstance(data, bytes) else "w") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def is_window(con: "Con") -> bool:
     """Check if a container is a window.
 
     Parameters:
@@ -17,7 +70,7 @@ def is_window(con: Con) -> bool:
     return con.pid is not None
 
 
-def get_con_description(con: Con) -> str:
+def get_con_description(con: "Con") -> str:
     """Get a human-readable description of a container.
 
     Parameters:
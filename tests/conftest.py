@@ -0,0 +1,123 @@
+"""Shared fixtures and the report for the IPC benchmarks."""
+
+import time
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+
+from utils import FakeSway
+
+
+@dataclass
+class BenchmarkResult:
+    """The IPC cost of one phase of a benchmark."""
+
+    shape: str
+    size: int
+    phase: str
+    round_trips: int
+    get_tree: int
+    run_command: int
+    commands: int
+    bytes_received: int
+    seconds: float
+
+
+BENCHMARK_RESULTS = pytest.StashKey[list[BenchmarkResult]]()
+
+
+class Benchmark:
+    """Measures the IPC traffic of sway-out against a fake Sway."""
+
+    def __init__(self, sway: FakeSway, results: list[BenchmarkResult]):
+        self.sway = sway
+        self.results = results
+
+    @contextmanager
+    def measure(self, shape: str, size: int, phase: str) -> Iterator[None]:
+        """Record the IPC traffic within the context as one result."""
+
+        self.sway.reset_counters()
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        messages = self.sway.messages
+        self.results.append(
+            BenchmarkResult(
+                shape=shape,
+                size=size,
+                phase=phase,
+                round_trips=sum(
+                    count for name, count in messages.items() if name != "SUBSCRIBE"
+                ),
+                get_tree=messages["GET_TREE"],
+                run_command=messages["RUN_COMMAND"],
+                commands=self.sway.commands,
+                bytes_received=self.sway.bytes_sent,
+                seconds=seconds,
+            )
+        )
+
+    @property
+    def last(self) -> BenchmarkResult:
+        return self.results[-1]
+
+
+@pytest.fixture(autouse=True)
+def cache_home(monkeypatch: pytest.MonkeyPatch, tmp_path_factory) -> Path:
+    """Keep the tests from using the cache of the user."""
+
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def data_home(monkeypatch: pytest.MonkeyPatch, tmp_path_factory) -> Path:
+    """Keep the tests from using the data of the user."""
+
+    path = tmp_path_factory.mktemp("data")
+    monkeypatch.setenv("XDG_DATA_HOME", str(path))
+    return path
+
+
+@pytest.fixture
+def fake_sway(monkeypatch: pytest.MonkeyPatch) -> Generator[FakeSway]:
+    """A running fake Sway that new connections connect to."""
+
+    with FakeSway() as sway:
+        monkeypatch.delenv("I3SOCK", raising=False)
+        monkeypatch.setenv("SWAYSOCK", sway.socket_path)
+        yield sway
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest, fake_sway: FakeSway) -> Benchmark:
+    """Record IPC costs to be reported at the end of the test session."""
+
+    results = request.config.stash.setdefault(BENCHMARK_RESULTS, [])
+    return Benchmark(fake_sway, results)
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config: pytest.Config):
+    results = config.stash.get(BENCHMARK_RESULTS, [])
+    if not results:
+        return
+
+    terminalreporter.section("IPC benchmarks")
+    header = (
+        f"{'shape':<12} {'size':>5} {'phase':<16} {'round trips':>11} "
+        + f"{'GET_TREE':>8} {'RUN_COMMAND':>11} {'commands':>8} {'KiB recv':>9} "
+        + f"{'ms':>8}"
+    )
+    terminalreporter.write_line(header)
+    for result in sorted(results, key=lambda r: (r.shape, r.size)):
+        terminalreporter.write_line(
+            f"{result.shape:<12} {result.size:>5} {result.phase:<16} "
+            + f"{result.round_trips:>11} {result.get_tree:>8} "
+            + f"{result.run_command:>11} {result.commands:>8} "
+            + f"{result.bytes_received / 1024:>9.1f} {result.seconds * 1000:>8.1f}"
+        )
@@ -0,0 +1,145 @@
+import itertools
+import random
+from pathlib import Path
+
+import pytest
+import yaml
+from click.testing import CliRunner
+from i3ipc import Con
+
+from sway_out import applications
+from sway_out.applications import _solve_assignment, match_existing_windows
+from sway_out.layout_files import WorkspaceLayout
+from sway_out.main import main
+from utils import FakeSway
+
+
+def workspace(*app_ids: str) -> Con:
+    rect = {"x": 0, "y": 0, "width": 0, "height": 0}
+    return Con(
+        {
+            "id": 1,
+            "type": "workspace",
+            "name": "1",
+            "rect": rect,
+            "floating_nodes": [],
+            "nodes": [
+                {
+                    "id": 10 + index,
+                    "type": "con",
+                    "name": app_id,
+                    "app_id": app_id,
+                    "pid": 1000 + index,
+                    "rect": rect,
+                    "nodes": [],
+                    "floating_nodes": [],
+                }
+                for index, app_id in enumerate(app_ids)
+            ],
+        },
+        None,
+        None,
+    )
+
+
+def layout(*app_id_patterns: str) -> WorkspaceLayout:
+    return WorkspaceLayout.model_validate(
+        {
+            "layout": "splith",
+            "children": [
+                {"cmd": pattern, "match": {"wayland": {"app_id": pattern}}}
+                for pattern in app_id_patterns
+            ],
+        }
+    )
+
+
+def matched_ids(workspace_layout: WorkspaceLayout) -> list[int | None]:
+    return [getattr(child, "_con_id", None) for child in workspace_layout.children]
+
+
+def test_specific_expression_gets_the_window():
+    workspace_layout = layout(".*", "firefox")
+    match_existing_windows(workspace("firefox"), workspace_layout)
+    assert matched_ids(workspace_layout) == [None, 10]
+
+
+def test_as_many_windows_as_possible_are_matched():
+    workspace_layout = layout("kitty|firefox", "firefox")
+    match_existing_windows(workspace("firefox", "kitty"), workspace_layout)
+    assert matched_ids(workspace_layout) == [11, 10]
+
+
+def test_windows_keep_their_position():
+    workspace_layout = layout("kitty", "firefox", "kitty")
+    match_existing_windows(
+        workspace("kitty", "firefox", "firefox", "kitty"), workspace_layout
+    )
+    assert matched_ids(workspace_layout) == [10, 11, 13]
+
+
+def test_specificity_wins_over_positions():
+    # Keeping every window in place would leave the last "a|d" without a
+    # window instead of the less specific "a|c|d". Moving several windows is
+    # worth a step in specificity.
+    workspace_layout = layout("a|c", "a", "d", "a|d", "a|c|d", "a|d")
+    match_existing_windows(workspace("a", "a", "d", "d", "c"), workspace_layout)
+    assert matched_ids(workspace_layout) == [14, 11, 12, 13, None, 10]
+
+
+def test_assignment_is_optimal():
+    generator = random.Random(42)
+    for _ in range(50):
+        rows = generator.randint(1, 4)
+        columns = generator.randint(rows, 6)
+        # Every row can be left unassigned for a high cost.
+        costs = [
+            [
+                None if generator.random() < 0.3 else generator.randint(0, 9)
+                for _ in range(columns)
+            ]
+            + [100] * rows
+            for _ in range(rows)
+        ]
+
+        def total(assignment) -> int:
+            return sum(costs[row][column] for row, column in enumerate(assignment))
+
+        best = min(
+            total(assignment)
+            for assignment in itertools.permutations(range(columns + rows), rows)
+            if all(
+                costs[row][column] is not None for row, column in enumerate(assignment)
+            )
+        )
+        assert total(_solve_assignment(costs)) == best
+
+
+def test_failed_launch_does_not_stop_other_workspaces(
+    fake_sway: FakeSway, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(applications, "LAUNCH_TIMEOUT_SECONDS", 0.2)
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(
+        yaml.safe_dump(
+            {
+                "workspaces": {
+                    name: {
+                        "layout": "splith",
+                        "children": [
+                            {"cmd": cmd, "match": {"wayland": {"app_id": "^a$"}}}
+                        ],
+                    }
+                    for name, cmd in [
+                        ("1", "app --app-id a --no-window"),
+                        ("2", "app --app-id a --title A"),
+                    ]
+                }
+            }
+        )
+    )
+
+    result = CliRunner().invoke(main, ["--no-notifications", "apply", str(layout_file)])
+    assert result.exception is None, result.output
+    assert "Failed to launch the applications of 1" in result.output
+    assert fake_sway.workspace_structure("2") == ("splith", ["A"])
@@ -0,0 +1,128 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+
+from sway_out import autosave
+from sway_out.autosave import WATCH_EVENTS, AutoSaver
+from sway_out.connection import SwayConnection
+from sway_out.snapshots import SnapshotStore
+from utils import FakeSway
+
+
+def wait_until(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_only_changed_workspaces_are_created_again(
+    fake_sway: FakeSway, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    fake_sway.add_window("1", app_id="a")
+    b = fake_sway.add_window("2", app_id="b")
+    created = []
+    create_workspace_layout = autosave.create_workspace_layout
+    monkeypatch.setattr(
+        autosave,
+        "create_workspace_layout",
+        lambda workspace, *args: created.append(workspace.name)
+        or create_workspace_layout(workspace, *args),
+    )
+
+    connection = SwayConnection()
+    try:
+        saver = AutoSaver(connection, split_dir=tmp_path)
+        assert saver.save()
+        assert created == ["1", "2"]
+        assert not saver.save()
+
+        c = fake_sway.add_window("2", app_id="c")
+        wait_until(saver.save)
+        assert created == ["1", "2", "2"]
+        layout = yaml.safe_load((tmp_path / "2.yaml").read_text())
+        assert len(layout["workspaces"]["2"]["children"]) == 2
+
+        fake_sway.run(f"[con_id={b}] kill; [con_id={c}] kill")
+        # The events of the commands arrive asynchronously.
+        wait_until(saver.save)
+        assert not (tmp_path / "2.yaml").exists()
+        assert (tmp_path / "1.yaml").exists()
+    finally:
+        connection.close()
+
+
+def test_watch_saves_after_events(
+    fake_sway: FakeSway, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(autosave, "DEBOUNCE_SECONDS", 0.05)
+    fake_sway.add_window("1", app_id="a")
+    layout_file = tmp_path / "layout.yaml"
+
+    connection = SwayConnection(events=WATCH_EVENTS)
+    saver = AutoSaver(connection, layout_file)
+    thread = threading.Thread(target=saver.watch)
+    thread.start()
+    try:
+        wait_until(lambda: saver.saves == 1)
+        for app_id in "bcd":
+            fake_sway.add_window("1", app_id=app_id)
+        wait_until(lambda: saver.saves == 2)
+        layout = yaml.safe_load(layout_file.read_text())
+        assert len(layout["workspaces"]["1"]["children"]) == 4
+        assert list(tmp_path.iterdir()) == [layout_file]
+    finally:
+        saver.stop()
+        thread.join()
+        saver.close()
+        connection.close()
+
+
+def test_changed_workspaces_are_added_to_the_snapshots(
+    fake_sway: FakeSway, tmp_path: Path
+):
+    fake_sway.add_window("1", app_id="a")
+    fake_sway.add_window("2", app_id="b")
+    store = SnapshotStore(tmp_path)
+
+    connection = SwayConnection()
+    try:
+        saver = AutoSaver(connection, snapshots=store, snapshot_name="auto")
+        assert saver.save()
+        fake_sway.add_window("2", app_id="c")
+        wait_until(saver.save)
+    finally:
+        connection.close()
+
+    first, second = store.get_all()
+    assert first.workspaces[0] == second.workspaces[0]
+    assert first.workspaces[1] != second.workspaces[1]
+    assert len(list(store.objects_directory.glob("*/*.yaml"))) == 3
+    layout = store.load("auto")
+    assert layout.workspaces is not None
+    assert len(layout.workspaces["2"].children) == 2
+
+
+def test_workspaces_are_stored_again_after_pruning(fake_sway: FakeSway, tmp_path: Path):
+    fake_sway.add_window("1", app_id="a")
+    fake_sway.add_window("2", app_id="b")
+    store = SnapshotStore(tmp_path)
+
+    connection = SwayConnection()
+    try:
+        saver = AutoSaver(connection, snapshots=store)
+        assert saver.save()
+        # Another process saves a snapshot without workspace 1 and prunes.
+        store.save([("2", store.load("latest").workspaces["2"])])
+        assert store.prune(keep=1, grace_seconds=0) == (1, 1)
+
+        fake_sway.add_window("2", app_id="c")
+        wait_until(saver.save)
+    finally:
+        connection.close()
+
+    layout = store.load("latest")
+    assert layout.workspaces is not None and list(layout.workspaces) == ["1", "2"]
@@ -0,0 +1,177 @@
+"""IPC cost benchmarks for `apply` and `save` against a fake Sway.
+
+Every benchmark applies a generated layout to an empty session, applies it
+again unchanged, applies it after the windows have been shuffled and finally
+saves the session. The IPC traffic of every phase is reported at the end of
+the test session. The assertions only check the results, not the costs.
+"""
+
+import itertools
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from conftest import Benchmark
+from sway_out.main import main
+from utils import FakeSway
+
+SIZES = [4, 16, 48]
+
+
+def app(index: int, percent: int | None = None) -> dict:
+    config = {
+        "cmd": ["app", "--app-id", f"app{index}", "--title", f"App {index}"],
+        "match": {"wayland": {"app_id": f"^app{index}$"}},
+    }
+    if percent is not None:
+        config["percent"] = percent
+    return config
+
+
+def flat_layout(size: int) -> dict:
+    """All windows side by side on a single workspace."""
+
+    return {
+        "workspaces": {
+            "1": {"layout": "splith", "children": [app(i) for i in range(size)]}
+        }
+    }
+
+
+def nested_layout(size: int) -> dict:
+    """Alternating horizontal and vertical 50/50 splits on a single workspace."""
+
+    counter = itertools.count()
+
+    def split(count: int, layout: str, percent: int | None = None) -> dict:
+        if count == 1:
+            return app(next(counter), percent)
+        other_layout = "splitv" if layout == "splith" else "splith"
+        container = {
+            "layout": layout,
+            "children": [
+                split(count // 2, other_layout, 50),
+                split(count - count // 2, other_layout, 50),
+            ],
+        }
+        if percent is not None:
+            container["percent"] = percent
+        return container
+
+    return {"workspaces": {"1": split(size, "splith")}}
+
+
+def tabbed_layout(size: int) -> dict:
+    """Groups of four tabbed windows side by side on a single workspace."""
+
+    indices = iter(range(size))
+    return {
+        "workspaces": {
+            "1": {
+                "layout": "splith",
+                "children": [
+                    {
+                        "layout": "tabbed",
+                        "children": [app(next(indices)) for _ in range(4)],
+                    }
+                    for _ in range(size // 4)
+                ],
+            }
+        }
+    }
+
+
+def workspaces_layout(size: int) -> dict:
+    """Two windows stacked vertically on each of several workspaces."""
+
+    return {
+        "workspaces": {
+            str(workspace + 1): {
+                "layout": "splitv",
+                "children": [app(2 * workspace, 60), app(2 * workspace + 1, 40)],
+            }
+            for workspace in range(size // 2)
+        }
+    }
+
+
+SHAPES: dict[str, Callable[[int], dict]] = {
+    "flat": flat_layout,
+    "nested": nested_layout,
+    "tabbed": tabbed_layout,
+    "workspaces": workspaces_layout,
+}
+
+
+def expected_structure(container: dict):
+    if "children" not in container:
+        return container["cmd"][-1]
+    return (
+        container["layout"],
+        [expected_structure(child) for child in container["children"]],
+    )
+
+
+def shuffle_windows(sway: FakeSway, workspace: str) -> None:
+    """Swap the first and the last window of a workspace."""
+
+    windows = sway.workspace_windows(workspace)
+    sway.run(f"[con_id={windows[0]}] swap container with con_id {windows[-1]}")
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("shape", SHAPES)
+def test_apply_and_save(
+    benchmark: Benchmark, fake_sway: FakeSway, tmp_path: Path, shape: str, size: int
+):
+    layout = SHAPES[shape](size)
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(yaml.safe_dump(layout))
+    runner = CliRunner()
+
+    def apply() -> None:
+        result = runner.invoke(main, ["--no-notifications", "apply", str(layout_file)])
+        assert result.exception is None, result.output
+        for name, workspace in layout["workspaces"].items():
+            assert fake_sway.workspace_structure(name) == expected_structure(workspace)
+        # The workspaces are built without focusing them.
+        assert fake_sway.focused.workspace().name == "1"
+
+    with benchmark.measure(shape, size, "apply (launch)"):
+        apply()
+    launch_cost = benchmark.last
+
+    with benchmark.measure(shape, size, "apply (again)"):
+        apply()
+    assert benchmark.last.commands <= launch_cost.commands
+
+    shuffle_windows(fake_sway, "1")
+    with benchmark.measure(shape, size, "apply (shuffled)"):
+        apply()
+
+    with benchmark.measure(shape, size, "save"):
+        result = runner.invoke(main, ["--no-notifications", "save"])
+    assert result.exception is None, result.output
+    saved = yaml.safe_load(result.stdout)
+    assert set(saved["workspaces"]) == set(layout["workspaces"])
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_apply_with_asyncio(fake_sway: FakeSway, tmp_path: Path, shape: str):
+    layout = SHAPES[shape](8)
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(yaml.safe_dump(layout))
+    runner = CliRunner()
+
+    for _ in range(2):
+        result = runner.invoke(
+            main,
+            ["--no-notifications", "apply", "--engine", "asyncio", str(layout_file)],
+        )
+        assert result.exception is None, result.output
+        for name, workspace in layout["workspaces"].items():
+            assert fake_sway.workspace_structure(name) == expected_structure(workspace)
+        assert fake_sway.focused.workspace().name == "1"
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from sway_out.connection import (
+    AsyncSwayConnection,
+    SwayConnection,
+    SyncConnectionAdapter,
+    find_con_by_id_async,
+    get_tree_index,
+    run_sync,
+)
+from utils import FakeSway
+
+
+def test_run_sync_returns_the_result():
+    async def add(a: int, b: int) -> int:
+        return a + b
+
+    assert run_sync(add(1, 2)) == 3
+
+
+def test_run_sync_rejects_suspending_coroutines():
+    with pytest.raises(RuntimeError, match="suspend"):
+        run_sync(asyncio.sleep(0))
+
+
+def test_sync_adapter_runs_async_functions(fake_sway: FakeSway):
+    window_id = fake_sway.add_window(title="Terminal")
+    connection = SwayConnection()
+    try:
+        window = run_sync(
+            find_con_by_id_async(SyncConnectionAdapter(connection), window_id)
+        )
+    finally:
+        connection.close()
+    assert window.name == "Terminal"
+
+
+@pytest.mark.asyncio
+async def test_async_connection_reads_large_trees(fake_sway: FakeSway):
+    window_ids = [fake_sway.add_window(title="x" * 1000) for _ in range(200)]
+    connection = await AsyncSwayConnection().connect()
+    try:
+        tree = await connection.get_tree()
+        assert [leaf.id for leaf in tree.leaves()] == window_ids
+        assert await connection.get_tree() is tree
+
+        with connection.record_window_events():
+            new_window_id = fake_sway.add_window()
+            received = await connection.wait_for_window_events(1)
+        assert ("new", new_window_id) in [
+            (event.change, event.container.id) for event in received
+        ]
+        assert await connection.get_tree() is not tree
+    finally:
+        connection.close()
+
+
+def test_tree_index_matches_the_tree(fake_sway: FakeSway):
+    first_id = fake_sway.add_window("1")
+    second_id = fake_sway.add_window("1")
+    fake_sway.run(f"[con_id={second_id}] splitv")
+    other_id = fake_sway.add_window("2")
+    connection = SwayConnection()
+    try:
+        tree = connection.get_tree()
+        index = get_tree_index(tree)
+        assert get_tree_index(tree) is index
+        for con in tree.descendants():
+            assert index.find(con.id) is con
+            assert index.parent(con.id) is con.parent
+            assert index.workspace(con.id) is con.workspace()
+        assert index.find(tree.id) is tree
+        assert index.parent(tree.id) is None
+        assert index.find(-1) is None
+
+        (workspace,) = [w for w in tree.workspaces() if w.name == "1"]
+        assert index.workspace(first_id) is workspace
+        assert index.parent(second_id) is not workspace
+        assert index.workspace(other_id) is not workspace
+
+        fake_sway.add_window("1")
+        assert get_tree_index(connection.get_tree()) is not index
+    finally:
+        connection.close()
+
+
+def test_tree_is_cached_without_events(fake_sway: FakeSway):
+    fake_sway.add_window(title="Terminal")
+    connection = SwayConnection()
+    try:
+        tree = connection.get_tree()
+        fake_sway.reset_counters()
+        assert connection.get_tree() is tree
+        connection.command("exec app --no-window")
+        assert connection.get_tree() is tree
+        assert fake_sway.messages["GET_TREE"] == 0
+    finally:
+        connection.close()
+
+
+def test_window_event_invalidates_the_tree(fake_sway: FakeSway):
+    connection = SwayConnection()
+    try:
+        tree = connection.get_tree()
+        window_id = fake_sway.add_window(title="Terminal")
+        fake_sway.reset_counters()
+        new_tree = connection.get_tree()
+        assert new_tree is not tree
+        assert new_tree.find_by_id(window_id) is not None
+        assert connection.get_tree() is new_tree
+        assert fake_sway.messages["GET_TREE"] == 1
+    finally:
+        connection.close()
+
+
+def test_own_commands_invalidate_the_tree_once(fake_sway: FakeSway):
+    window_id = fake_sway.add_window("1")
+    fake_sway.add_window("1")
+    connection = SwayConnection()
+    try:
+        connection.get_tree()
+        fake_sway.reset_counters()
+        fake_sway.late_events = True
+        connection.command(f"[con_id={window_id}] move container to workspace 2")
+        tree = connection.get_tree()
+        window = tree.find_by_id(window_id)
+        assert window is not None and window.workspace().name == "2"
+        # The events of the move arrive before the tick and are ignored.
+        assert connection.get_tree() is tree
+        assert fake_sway.messages["GET_TREE"] == 1
+        assert fake_sway.messages["SEND_TICK"] == 1
+
+        # Later events still invalidate the tree.
+        fake_sway.late_events = False
+        fake_sway.add_window("2")
+        assert connection.get_tree() is not tree
+    finally:
+        connection.close()
@@ -0,0 +1,127 @@
+import functools
+import threading
+import time
+from collections.abc import Generator
+from pathlib import Path
+
+import click
+import pytest
+import yaml
+
+from sway_out.client import forward_command
+from sway_out.daemon import Daemon, LayoutCache
+from sway_out.forwarding import GLOBAL_OPTIONS_WITH_VALUES, get_command
+from sway_out.main import GlobalState, _run_forwarded_command, main
+from utils import FakeSway
+
+LAYOUT = {
+    "workspaces": {
+        "1": {
+            "layout": "splith",
+            "children": [
+                {
+                    "cmd": ["app", "--app-id", "left", "--title", "Left"],
+                    "match": {"wayland": {"app_id": "^left$"}},
+                },
+                {
+                    "cmd": ["app", "--app-id", "right", "--title", "Right"],
+                    "match": {"wayland": {"app_id": "^right$"}},
+                },
+            ],
+        }
+    }
+}
+
+
+@pytest.fixture
+def socket_path(fake_sway: FakeSway, tmp_path: Path) -> Generator[str]:
+    """The socket of a daemon running in a thread."""
+
+    state = GlobalState(notifications=False, layouts=LayoutCache())
+    path = tmp_path / "daemon.sock"
+    daemon = Daemon(
+        state.connection, path, functools.partial(_run_forwarded_command, state)
+    )
+    thread = threading.Thread(target=daemon.serve)
+    thread.start()
+    try:
+        while not path.exists():
+            time.sleep(0.01)
+        yield str(path)
+    finally:
+        daemon.stop()
+        thread.join()
+        state.close()
+    assert not path.exists()
+
+
+def test_forwarded_commands(fake_sway: FakeSway, tmp_path: Path, socket_path: str):
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(yaml.safe_dump(LAYOUT))
+
+    reply = forward_command(["check", str(layout_file)], socket_path)
+    assert reply is not None
+    assert reply["exit_code"] == 1
+    assert "Workspace 1 does not match the layout" in reply["stdout"]
+
+    # The second time, the parsed layout is reused.
+    for _ in range(2):
+        reply = forward_command(
+            ["--no-notifications", "apply", str(layout_file)], socket_path
+        )
+        assert reply is not None
+        assert reply["exit_code"] == 0, reply["stderr"]
+        assert fake_sway.workspace_structure("1") == ("splith", ["Left", "Right"])
+
+    reply = forward_command(["check", str(layout_file)], socket_path)
+    assert reply is not None
+    assert reply["exit_code"] == 0
+    assert reply["stdout"] == "The layout is applied\n"
+
+
+def test_only_some_commands_are_forwarded(socket_path: str):
+    for args in [["daemon"], ["save", "--watch"]]:
+        reply = forward_command(args, socket_path)
+        assert reply is not None
+        assert reply["exit_code"] == 2
+
+
+@pytest.mark.parametrize(
+    "args,command",
+    [
+        (["apply", "layout.yaml"], "apply"),
+        (["--no-notifications", "save"], "save"),
+        (["--log-level", "debug", "check", "layout.yaml"], "check"),
+        (["--log-level=debug", "check"], "check"),
+        (["--log-level"], None),
+        ([], None),
+    ],
+)
+def test_get_command(args: list[str], command: str | None):
+    assert get_command(args) == command
+
+
+def test_global_options_with_values_are_known():
+    assert GLOBAL_OPTIONS_WITH_VALUES == {
+        opt
+        for param in main.params
+        if isinstance(param, click.Option) and not param.is_flag
+        for opt in param.opts
+    }
+
+
+def test_layout_cache(tmp_path: Path):
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(yaml.safe_dump(LAYOUT))
+    cache = LayoutCache(size=1)
+
+    with layout_file.open() as file:
+        first = cache.load(file)
+    with layout_file.open() as file:
+        second = cache.load(file)
+    assert first == second
+    assert first is not second
+
+    layout_file.write_text(yaml.safe_dump({"workspaces": {}}))
+    with layout_file.open() as file:
+        assert cache.load(file).workspaces == {}
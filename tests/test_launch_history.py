@@ -0,0 +1,146 @@
+from pathlib import Path
+
+import pytest
+
+from sway_out import applications, launch_history
+from sway_out.applications import launch_applications_concurrently
+from sway_out.connection import SwayConnection
+from sway_out.launch_history import LaunchHistory
+from sway_out.layout_files import ApplicationLaunchConfig, WorkspaceLayout
+from utils import FakeSway
+
+
+def config(app_id: str) -> ApplicationLaunchConfig:
+    return ApplicationLaunchConfig.model_validate(
+        {"cmd": f"{app_id} --delay 0.05", "match": {"wayland": {"app_id": app_id}}}
+    )
+
+
+def test_timeout_is_learned_from_the_launch_times(monkeypatch: pytest.MonkeyPatch):
+    history = LaunchHistory()
+    for seconds in [0.5, 0.5]:
+        history.record(config("a"), seconds)
+    assert history.get_timeout(config("a"), 10) == 10
+
+    history.record(config("a"), 4.0)
+    assert history.get_timeout(config("a"), 10) == 4.0 * 1.5 + 1.0
+    assert history.get_expected_seconds(config("a")) == 0.5
+    assert history.get_expected_seconds(config("b")) is None
+
+    monkeypatch.setattr(launch_history, "MAX_TIMEOUT_SECONDS", 5.0)
+    assert history.get_timeout(config("a"), 10) == 5.0
+
+
+def test_timeout_backs_off_after_a_miss(tmp_path: Path):
+    path = tmp_path / "history.json"
+    history = LaunchHistory(path)
+    for seconds in [0.5, 0.5, 0.5]:
+        history.record(config("a"), seconds)
+    assert history.get_timeout(config("a"), 10) == 2.0
+
+    history.record_timeout(config("a"), 2.0)
+    history.record_timeout(config("b"), 10)
+    history.save()
+    history = LaunchHistory.load(path)
+    assert history.get_timeout(config("a"), 10) == 4.0
+    assert history.get_timeout(config("b"), 10) == 20.0
+    history.record_timeout(config("a"), 40.0)
+    assert history.get_timeout(config("a"), 10) == 60.0
+
+    # The measured launch time replaces the backoff.
+    history.record(config("a"), 3.0)
+    assert history.get_samples(config("a")) == [0.5, 0.5, 0.5, 3.0]
+    assert history.get_timeout(config("a"), 10) == 3.0 * 1.5 + 1.0
+
+
+def test_history_is_saved_and_loaded(tmp_path: Path):
+    path = tmp_path / "history.json"
+    history = LaunchHistory(path)
+    history.save()
+    assert not path.exists()
+
+    history.record(config("a"), 1.0)
+    history.save()
+    assert LaunchHistory.load(path).get_samples(config("a")) == [1.0]
+    assert LaunchHistory.load(path).get_samples(config("b")) == []
+
+
+def test_unreadable_history_is_ignored(tmp_path: Path):
+    path = tmp_path / "history.json"
+    path.write_text("garbage")
+    assert LaunchHistory.load(path).get_samples(config("a")) == []
+
+
+def test_summary_shows_the_launches_of_this_run():
+    history = LaunchHistory()
+    assert history.summary(10) == ""
+
+    history.record(config("a"), 0.25)
+    lines = history.summary(10).splitlines()
+    assert len(lines) == 2
+    assert lines[1].split() == [
+        "a",
+        "--delay",
+        "0.05",
+        "250",
+        "1",
+        "250",
+        "250",
+        "10.0",
+    ]
+
+
+def test_slowest_applications_are_launched_first(fake_sway: FakeSway):
+    history = LaunchHistory()
+    history.record(config("slow"), 2.0)
+    history.record(config("fast"), 0.1)
+    layout = WorkspaceLayout.model_validate(
+        {
+            "layout": "splith",
+            "children": [
+                config("new").model_dump(),
+                config("fast").model_dump(),
+                config("slow").model_dump(),
+            ],
+        }
+    )
+
+    connection = SwayConnection()
+    try:
+        launch_applications_concurrently(connection, layout, history)
+    finally:
+        connection.close()
+
+    launched = [c.split()[1] for c in fake_sway.command_log if c.startswith("exec")]
+    assert launched == ["slow", "fast", "new"]
+    assert all(getattr(child, "_con_id", None) for child in layout.children)
+    assert len(history.get_samples(config("new"))) == 1
+    assert history.get_samples(config("slow"))[-1] < 2.0
+
+
+def test_launch_time_ends_when_the_window_matches(
+    fake_sway: FakeSway, monkeypatch: pytest.MonkeyPatch
+):
+    # Look at the tree often, so that the window is seen before it matches.
+    monkeypatch.setattr(applications, "LAUNCH_CHECK_INTERVAL_SECONDS", 0.01)
+    late = ApplicationLaunchConfig.model_validate(
+        {
+            "cmd": "late --delay 0.1 --late-title ready",
+            "match": {"wayland": {"app_id": "late", "title": "^ready$"}},
+        }
+    )
+    layout = WorkspaceLayout.model_validate(
+        {"layout": "splith", "children": [late.model_dump()]}
+    )
+    history = LaunchHistory()
+
+    connection = SwayConnection()
+    try:
+        launch_applications_concurrently(connection, layout, history)
+    finally:
+        connection.close()
+
+    # The window appears after 0.1 seconds, but only gets its title after
+    # another 0.1 seconds.
+    (seconds,) = history.get_samples(late)
+    assert seconds >= 0.2
@@ -0,0 +1,272 @@
+import pytest
+
+from sway_out.connection import SwayConnection
+from sway_out.layout import (
+    _distribute,
+    check_layout,
+    dissolve_layout,
+    get_container_size_excluding_gaps,
+    plan_resize,
+    reconcile_layout,
+    resize_layout,
+)
+from sway_out.layout_files import WorkspaceLayout, get_launch_configs
+from utils import FakeSway
+
+
+def app(index: int, percent: int | None = None) -> dict:
+    config = {"cmd": f"app{index}", "match": {"wayland": {"app_id": f"app{index}"}}}
+    if percent is not None:
+        config["percent"] = percent
+    return config
+
+
+@pytest.mark.parametrize(
+    "total_px, weights, expected",
+    [
+        (100, [1, 1, 1], [34, 33, 33]),
+        (1920, [10, 40, 30, 20], [192, 768, 576, 384]),
+        (1001, [1, 2], [334, 667]),
+        (7, [0, 0], [4, 3]),
+    ],
+)
+def test_distribute_adds_up_to_the_total(total_px, weights, expected):
+    assert _distribute(total_px, weights) == expected
+
+
+def test_resize_converges_in_one_attempt(fake_sway: FakeSway):
+    window_ids = [fake_sway.add_window("1", app_id=f"app{i}") for i in range(5)]
+    fake_sway.run(f"[con_id={window_ids[3]}] splitv")
+    fake_sway.run(f"[con_id={window_ids[4]}] move left")
+    workspace_layout = WorkspaceLayout.model_validate(
+        {
+            "layout": "splith",
+            "children": [
+                app(0, 10),
+                app(1, 40),
+                app(2, 30),
+                {"layout": "splitv", "percent": 20, "children": [app(3, 70), app(4)]},
+            ],
+        }
+    )
+    connection = SwayConnection()
+    try:
+        tree = connection.get_tree()
+        workspace_con = next(w for w in tree.workspaces() if w.name == "1")
+        workspace_layout._con_id = workspace_con.id
+        container_con = workspace_con.nodes[3]
+        assert [c.id for c in container_con.nodes] == window_ids[3:]
+        workspace_layout.children[3]._con_id = container_con.id
+        for child, con_id in zip(workspace_layout.children[:3], window_ids):
+            child._con_id = con_id
+        for child, con_id in zip(workspace_layout.children[3].children, window_ids[3:]):
+            child._con_id = con_id
+
+        fake_sway.reset_counters()
+        resize_layout(connection, workspace_layout)
+
+        # The cached snapshot is reused, so only the check fetches the tree.
+        # The containers are resized with one message per level.
+        assert fake_sway.messages["GET_TREE"] == 1
+        assert fake_sway.messages["RUN_COMMAND"] == 2
+        assert check_layout(connection, workspace_layout)
+        assert plan_resize(connection.get_tree(), workspace_layout) == [[], []]
+        widths = [
+            get_container_size_excluding_gaps(con)[0]
+            for con in connection.get_tree().find_by_id(workspace_con.id).nodes
+        ]
+        assert widths == [192, 768, 576, 384]
+    finally:
+        connection.close()
+
+
+def move_into(sway: FakeSway, target_id: int, con_id: int) -> None:
+    """Move a container behind a window, into the parent of the window."""
+
+    sway.run(
+        f"[con_id={target_id}] mark target; "
+        + f"[con_id={con_id}] move container to mark target; "
+        + f"[con_id={target_id}] unmark target"
+    )
+
+
+def nest_first(sway: FakeSway, ids: list[int]) -> None:
+    sway.run(f"[con_id={ids[0]}] splitv")
+    move_into(sway, ids[0], ids[1])
+    sway.run(f"[con_id={ids[1]}] splith")
+    move_into(sway, ids[1], ids[2])
+
+
+def nest_first_and_last(sway: FakeSway, ids: list[int]) -> None:
+    nest_first(sway, ids)
+    sway.run(f"[con_id={ids[4]}] splitv")
+    move_into(sway, ids[4], ids[3])
+
+
+def nest_before_window(sway: FakeSway, ids: list[int]) -> None:
+    sway.run(f"[con_id={ids[0]}] splitv")
+    move_into(sway, ids[0], ids[2])
+    sway.run(f"[con_id={ids[0]}] splith")
+    move_into(sway, ids[0], ids[1])
+
+
+def nest_middle(sway: FakeSway, ids: list[int]) -> None:
+    sway.run(f"[con_id={ids[1]}] splitv")
+    move_into(sway, ids[1], ids[2])
+
+
+@pytest.mark.parametrize(
+    "nest, nested_structure, flat_structure",
+    [
+        (
+            nest_first,
+            [("splitv", ["w0", ("splith", ["w1", "w2"])]), "w3", "w4"],
+            ["w0", "w1", "w2", "w3", "w4"],
+        ),
+        (
+            nest_first_and_last,
+            [("splitv", ["w0", ("splith", ["w1", "w2"])]), ("splitv", ["w4", "w3"])],
+            ["w0", "w1", "w2", "w4", "w3"],
+        ),
+        (
+            nest_before_window,
+            [("splitv", [("splith", ["w0", "w1"]), "w2"]), "w3", "w4"],
+            ["w0", "w1", "w2", "w3", "w4"],
+        ),
+        (
+            nest_middle,
+            ["w0", ("splitv", ["w1", "w2"]), "w3", "w4"],
+            ["w0", "w1", "w2", "w3", "w4"],
+        ),
+    ],
+)
+def test_dissolve_layout_keeps_the_window_order(
+    fake_sway: FakeSway, nest, nested_structure, flat_structure
+):
+    ids = [fake_sway.add_window("1", title=f"w{i}") for i in range(5)]
+    fake_sway.add_window("2")
+    nest(fake_sway, ids)
+    assert fake_sway.workspace_structure("1") == ("splith", nested_structure)
+
+    connection = SwayConnection()
+    try:
+        workspace_con = next(
+            w for w in connection.get_tree().workspaces() if w.name == "1"
+        )
+        fake_sway.reset_counters()
+        dissolve_layout(connection, workspace_con)
+        assert fake_sway.messages["RUN_COMMAND"] == 1
+        assert fake_sway.workspace_structure("1") == ("splith", flat_structure)
+        assert [w.name for w in connection.get_tree().workspaces()] == ["1", "2"]
+        assert not connection.get_marks()
+    finally:
+        connection.close()
+
+
+def test_dissolve_layout_of_a_single_window(fake_sway: FakeSway):
+    window_id = fake_sway.add_window("1", title="w0")
+    other_id = fake_sway.add_window("1")
+    fake_sway.add_window("2")
+    fake_sway.run(f"[con_id={window_id}] splitv")
+    fake_sway.run(f"[con_id={other_id}] move container to workspace 2")
+    assert fake_sway.workspace_structure("1") == ("splith", [("splitv", ["w0"])])
+
+    connection = SwayConnection()
+    try:
+        workspace_con = next(
+            w for w in connection.get_tree().workspaces() if w.name == "1"
+        )
+        dissolve_layout(connection, workspace_con)
+        assert fake_sway.workspace_structure("1") == ("splith", ["w0"])
+    finally:
+        connection.close()
+
+
+def test_dissolve_layout_of_a_deeply_nested_single_window(fake_sway: FakeSway):
+    ids = [fake_sway.add_window("1", title=f"w{i}") for i in range(3)]
+    fake_sway.add_window("2")
+    nest_first(fake_sway, ids)
+    for other_id in ids[:2]:
+        fake_sway.run(f"[con_id={other_id}] move container to workspace 2")
+    assert fake_sway.workspace_structure("1") == (
+        "splith",
+        [("splitv", [("splith", ["w2"])])],
+    )
+
+    connection = SwayConnection()
+    try:
+        workspace_con = next(
+            w for w in connection.get_tree().workspaces() if w.name == "1"
+        )
+        fake_sway.reset_counters()
+        dissolve_layout(connection, workspace_con)
+        # The nesting depth does not matter.
+        assert fake_sway.commands == 2
+        assert fake_sway.workspace_structure("1") == ("splith", ["w2"])
+    finally:
+        connection.close()
+
+
+def reconcile(sway: FakeSway, ids: list[int], layout: dict) -> None:
+    workspace_layout = WorkspaceLayout.model_validate(layout)
+    for launch_config in get_launch_configs(workspace_layout):
+        launch_config._con_id = ids[int(launch_config.cmd[3:])]
+
+    connection = SwayConnection()
+    try:
+        workspace_con = next(
+            w for w in connection.get_tree().workspaces() if w.name == "1"
+        )
+        workspace_layout._con_id = workspace_con.id
+        sway.reset_counters()
+        reconcile_layout(connection, workspace_layout)
+    finally:
+        connection.close()
+
+
+def test_reconcile_swaps_windows_between_containers(fake_sway: FakeSway):
+    ids = [fake_sway.add_window("1", title=f"w{i}") for i in range(5)]
+    nest_first_and_last(fake_sway, ids)
+    fake_sway.run(f"[con_id={ids[0]}] swap container with con_id {ids[3]}")
+
+    reconcile(
+        fake_sway,
+        ids,
+        {
+            "layout": "splith",
+            "children": [
+                {
+                    "layout": "splitv",
+                    "children": [
+                        app(0),
+                        {"layout": "splith", "children": [app(1), app(2)]},
+                    ],
+                },
+                {"layout": "tabbed", "children": [app(3), app(4)]},
+            ],
+        },
+    )
+    # Two swaps and a layout change, independent of the size of the layout.
+    assert fake_sway.messages["RUN_COMMAND"] == 1
+    assert fake_sway.commands == 3
+    assert fake_sway.workspace_structure("1") == (
+        "splith",
+        [("splitv", ["w0", ("splith", ["w1", "w2"])]), ("tabbed", ["w3", "w4"])],
+    )
+
+
+def test_reconcile_unwraps_windows(fake_sway: FakeSway):
+    ids = [fake_sway.add_window("1", title=f"w{i}") for i in range(4)]
+    fake_sway.run(f"[con_id={ids[2]}] splitv")
+    fake_sway.run(f"[con_id={ids[0]}] swap container with con_id {ids[3]}")
+    assert fake_sway.workspace_structure("1") == (
+        "splith",
+        ["w3", "w1", ("splitv", ["w2"]), "w0"],
+    )
+
+    reconcile(
+        fake_sway, ids, {"layout": "splith", "children": [app(i) for i in range(4)]}
+    )
+    assert fake_sway.messages["RUN_COMMAND"] == 1
+    assert fake_sway.commands == 2
+    assert fake_sway.workspace_structure("1") == ("splith", ["w0", "w1", "w2", "w3"])
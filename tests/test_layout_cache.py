@@ -0,0 +1,85 @@
+import io
+import os
+import types
+from pathlib import Path
+
+import pytest
+import yaml
+
+from sway_out import layout_cache
+from sway_out.layout_cache import load_layout_configuration_cached
+from sway_out.layout_files import Layout
+
+
+def layout_text(app_id: str) -> str:
+    return yaml.safe_dump(
+        {
+            "workspaces": {
+                "1": {
+                    "layout": "splith",
+                    "children": [
+                        {"cmd": app_id, "match": {"wayland": {"app_id": app_id}}}
+                    ],
+                }
+            }
+        }
+    )
+
+
+def test_unchanged_layout_is_not_validated_again(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    first = load_layout_configuration_cached(io.StringIO(layout_text("a")), tmp_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The layout should have been loaded from the cache")
+
+    monkeypatch.setattr(Layout, "model_validate", fail)
+    second = load_layout_configuration_cached(io.StringIO(layout_text("a")), tmp_path)
+    assert second == first
+    with pytest.raises(AssertionError):
+        load_layout_configuration_cached(io.StringIO(layout_text("b")), tmp_path)
+
+
+def test_unreadable_entries_are_ignored(tmp_path: Path):
+    load_layout_configuration_cached(io.StringIO(layout_text("a")), tmp_path)
+    (entry,) = tmp_path.glob("*.pickle")
+    entry.write_bytes(b"garbage")
+
+    layout = load_layout_configuration_cached(io.StringIO(layout_text("a")), tmp_path)
+    assert layout.workspaces is not None
+    assert entry.read_bytes() != b"garbage"
+
+
+def test_least_recently_used_entries_are_evicted(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    load_layout_configuration_cached(io.StringIO(layout_text("a")), tmp_path)
+    (entry,) = tmp_path.glob("*.pickle")
+    os.utime(entry, (0, 0))
+    monkeypatch.setattr(layout_cache, "CACHE_SIZE_BYTES", 2 * entry.stat().st_size)
+
+    for app_id in "bcd":
+        load_layout_configuration_cached(io.StringIO(layout_text(app_id)), tmp_path)
+    assert len(list(tmp_path.glob("*.pickle"))) == 2
+    assert not entry.exists()
+
+
+def test_changed_sources_invalidate_the_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    source = tmp_path / "module.py"
+    module = types.ModuleType("module")
+    module.__file__ = str(source)
+    modules = (*layout_cache._SCHEMA_MODULES, module)
+    monkeypatch.setattr(layout_cache, "_SCHEMA_MODULES", modules)
+    directory = tmp_path / "cache"
+
+    try:
+        for version in [1, 2]:
+            source.write_text(f"VERSION = {version}\n")
+            layout_cache._get_schema_version.cache_clear()
+            load_layout_configuration_cached(io.StringIO(layout_text("a")), directory)
+    finally:
+        layout_cache._get_schema_version.cache_clear()
+    assert len(list(directory.glob("*.pickle"))) == 2
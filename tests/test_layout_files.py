@@ -0,0 +1,101 @@
+import io
+from pathlib import Path
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from sway_out import layout_creation
+from sway_out.layout_files import (
+    Layout,
+    WorkspaceLayout,
+    load_layout_configuration,
+    save_layout_configuration,
+    save_workspace_layouts,
+)
+from sway_out.main import main
+from utils import FakeSway
+
+
+def workspace_layout(title: str) -> WorkspaceLayout:
+    return WorkspaceLayout.model_validate(
+        {
+            "layout": "splith",
+            "children": [
+                {
+                    "cmd": ["kitty", "--title", title],
+                    "match": {"wayland": {"app_id": "kitty", "title": title}},
+                    "percent": 100,
+                }
+            ],
+        }
+    )
+
+
+def test_streamed_layout_matches_the_saved_one():
+    workspaces = {
+        "1": workspace_layout("plain"),
+        "2: wörk": workspace_layout("multi\nline: 'quoted' " + "long " * 30),
+    }
+    expected = io.StringIO()
+    save_layout_configuration(Layout(workspaces=workspaces), expected)
+    streamed = io.StringIO()
+    assert save_workspace_layouts(workspaces.items(), streamed) == 2
+
+    assert yaml.safe_load(streamed.getvalue()) == yaml.safe_load(expected.getvalue())
+    streamed.seek(0)
+    assert load_layout_configuration(streamed).workspaces == workspaces
+
+    empty = io.StringIO()
+    assert save_workspace_layouts([], empty) == 0
+    assert yaml.safe_load(empty.getvalue()) == {"workspaces": {}}
+
+
+def test_workspaces_are_saved_to_separate_files(fake_sway: FakeSway, tmp_path: Path):
+    fake_sway.add_window("1", app_id="a")
+    fake_sway.add_window("2/b", app_id="b")
+    fake_sway.add_window("2_b", app_id="c")
+    fake_sway.add_window("100%", app_id="d")
+
+    result = CliRunner().invoke(
+        main, ["--no-notifications", "save", "--split-dir", str(tmp_path / "out")]
+    )
+    assert result.exception is None, result.output
+    files = {path.name: path for path in (tmp_path / "out").iterdir()}
+    assert set(files) == {"1.yaml", "2%2Fb.yaml", "2_b.yaml", "100%25.yaml"}
+    with files["2%2Fb.yaml"].open() as file:
+        layout = load_layout_configuration(file)
+    assert layout.workspaces is not None and list(layout.workspaces) == ["2/b"]
+
+
+def test_failed_save_keeps_the_layout_file(
+    fake_sway: FakeSway, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    fake_sway.add_window("1", app_id="a")
+    fake_sway.add_window("2", app_id="b")
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text("workspaces: {}\n")
+
+    create_workspace_layout = layout_creation.create_workspace_layout
+
+    def fail_on_second_workspace(workspace, *args):
+        if workspace.name == "2":
+            raise RuntimeError("Unexpected con")
+        return create_workspace_layout(workspace, *args)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(
+            layout_creation, "create_workspace_layout", fail_on_second_workspace
+        )
+        result = CliRunner().invoke(
+            main, ["--no-notifications", "save", str(layout_file)]
+        )
+    assert isinstance(result.exception, RuntimeError)
+    assert layout_file.read_text() == "workspaces: {}\n"
+    assert list(tmp_path.iterdir()) == [layout_file]
+
+    result = CliRunner().invoke(main, ["--no-notifications", "save", str(layout_file)])
+    assert result.exception is None, result.output
+    with layout_file.open() as file:
+        layout = load_layout_configuration(file)
+    assert layout.workspaces is not None and list(layout.workspaces) == ["1", "2"]
@@ -0,0 +1,102 @@
+import pytest
+from i3ipc import Con
+
+from sway_out.connection import SwayConnection
+from sway_out.layout_files import WindowMatchExpression
+from sway_out.matching import (
+    WindowIndex,
+    find_windows_on_workspace,
+    get_literal_prefix,
+    get_window_index,
+    is_window_matching,
+)
+from utils import FakeSway
+
+
+def window(con_id: int, name: str, app_id=None, window_class=None, instance=None):
+    data = {
+        "id": con_id,
+        "type": "con",
+        "name": name,
+        "nodes": [],
+        "floating_nodes": [],
+        "pid": 1000 + con_id,
+        "rect": {"x": 0, "y": 0, "width": 0, "height": 0},
+    }
+    if app_id is not None:
+        data["app_id"] = app_id
+    else:
+        data["window_properties"] = {
+            "class": window_class,
+            "instance": instance,
+            "title": name,
+        }
+    return Con(data, None, None)
+
+
+WINDOWS = [
+    window(1, "Terminal", app_id="kitty"),
+    window(2, "Mozilla Firefox", app_id="firefox"),
+    window(3, "Terminal 2", app_id="kitty"),
+    window(4, "Chat", window_class="Chat", instance="chat"),
+    window(5, "Files", app_id="org.gnome.Nautilus"),
+    window(6, "Firefox dev", app_id="firefox-dev"),
+    window(7, "Editor", window_class="Code", instance="code"),
+]
+
+
+@pytest.mark.parametrize(
+    "expression,prefix",
+    [
+        ("^firefox$", "firefox"),
+        (r"org\.gnome\..*", "org.gnome."),
+        ("kitty?", "kitt"),
+        ("a{2}b", ""),
+        ("firefox|kitty", ""),
+        ("(?i)kitty", ""),
+        (r"\d+", ""),
+        (".*", ""),
+    ],
+)
+def test_literal_prefix(expression: str, prefix: str):
+    assert get_literal_prefix(expression) == prefix
+
+
+@pytest.mark.parametrize(
+    "match",
+    [
+        {"wayland": {"app_id": "^firefox$"}},
+        {"wayland": {"app_id": "firefox"}},
+        {"wayland": {"app_id": "kitty", "title": "Terminal 2"}},
+        {"wayland": {"title": ".*e"}},
+        {"wayland": {"app_id": r"org\.gnome\."}},
+        {"x11": {"class": "Chat"}},
+        {"x11": {"instance": "co"}},
+        {"x11": {"title": "Chat"}},
+        {"wayland": {"app_id": "kitty"}, "x11": {"class": "Code|Chat"}},
+    ],
+)
+def test_index_finds_matching_windows_in_order(match: dict):
+    expression = WindowMatchExpression.model_validate(match)
+    expected = [w.id for w in WINDOWS if is_window_matching(w, expression)]
+    assert expected
+    assert [w.id for w in WindowIndex(WINDOWS).find(expression)] == expected
+
+
+def test_window_index_is_built_once_per_workspace(fake_sway: FakeSway):
+    fake_sway.add_window("1", app_id="kitty")
+    connection = SwayConnection()
+    try:
+        (workspace,) = connection.get_tree().workspaces()
+        index = get_window_index(workspace)
+        assert get_window_index(workspace) is index
+        kitty = WindowMatchExpression.model_validate({"wayland": {"app_id": "kitty"}})
+        assert len(list(find_windows_on_workspace(kitty, workspace))) == 1
+        assert get_window_index(workspace) is index
+
+        fake_sway.add_window("1", app_id="kitty")
+        (workspace,) = connection.get_tree().workspaces()
+        assert get_window_index(workspace) is not index
+        assert len(list(find_windows_on_workspace(kitty, workspace))) == 2
+    finally:
+        connection.close()
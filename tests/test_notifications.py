@@ -0,0 +1,162 @@
+import asyncio
+import time
+from collections.abc import Generator
+
+import pytest
+
+from sway_out import notifications
+from sway_out.dbus import Message
+from sway_out.notifications import (
+    error_notification,
+    flush_notifications,
+    progress_notification,
+    wait_for_notifications,
+)
+from utils import FakeNotificationBus
+
+
+@pytest.fixture(autouse=True)
+def session_bus(monkeypatch: pytest.MonkeyPatch):
+    """Open a new session bus connection in every test."""
+
+    monkeypatch.setattr(notifications, "_session_bus", None)
+    monkeypatch.setattr(notifications, "_session_bus_unavailable", False)
+    yield
+    assert flush_notifications(timeout=None)
+    if notifications._session_bus is not None:
+        notifications._session_bus.close()
+
+
+@pytest.fixture
+def notification_bus(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[FakeNotificationBus]:
+    with FakeNotificationBus() as bus:
+        monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", bus.address)
+        yield bus
+
+
+@pytest.fixture
+def notify_send(monkeypatch: pytest.MonkeyPatch) -> list[tuple]:
+    calls = []
+
+    def run_notify_send(summary, text, urgency, replace_id, expire_time):
+        calls.append((summary, text, replace_id))
+        return 42
+
+    monkeypatch.setattr(notifications, "_run_notify_send", run_notify_send)
+    return calls
+
+
+def test_progress_replaces_the_notification(notification_bus: FakeNotificationBus):
+    with progress_notification("Apply", "Launching") as notification:
+        notification.start()
+        assert flush_notifications()
+        notification.update(1, 2)
+        notification.update(2, 2)
+    assert flush_notifications()
+    error_notification("Save", "Failed")
+    assert flush_notifications()
+
+    assert notification_bus.connections == 1
+    shown = notification_bus.notifications
+    assert shown[0].body == "Launching ..."
+    assert shown[0].replaces_id == 0
+    assert shown[0].expire_timeout == 60_000
+    assert shown[-2].body == "Completed successfully."
+    assert shown[-2].expire_timeout == -1
+    assert {n.id for n in shown[:-1]} == {1}
+    assert {n.replaces_id for n in shown[1:-1]} == {1}
+    assert shown[-1].body == "Failed"
+    assert shown[-1].replaces_id == 0
+    assert shown[-1].hints == {"urgency": 2}
+
+
+def test_updates_do_not_wait_for_the_server(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    with FakeNotificationBus(delay=0.2) as bus:
+        monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", bus.address)
+        start = time.perf_counter()
+        with progress_notification("Apply", "Launching") as notification:
+            notification.start()
+            for i in range(50):
+                notification.update(i + 1, 50)
+        assert time.perf_counter() - start < 0.1
+
+        assert flush_notifications(timeout=None)
+        assert len(bus.notifications) <= 3
+        assert bus.notifications[-1].body == "Completed successfully."
+
+
+def test_updates_are_rate_limited(notification_bus: FakeNotificationBus):
+    with progress_notification("Apply", "Launching") as notification:
+        notification.start()
+        for i in range(10):
+            notification.update(i + 1, 10)
+            time.sleep(0.05)
+    assert flush_notifications()
+
+    # One update per interval at most, and the final state.
+    shown = notification_bus.notifications
+    assert len(shown) <= 4
+    assert shown[-1].body == "Completed successfully."
+
+
+def test_progress_in_the_background(notification_bus: FakeNotificationBus):
+    async def run():
+        with progress_notification("Apply", "Launching") as notification:
+            notification.start()
+            for i in range(5):
+                notification.update(i + 1, 5)
+        assert await wait_for_notifications()
+
+    asyncio.run(run())
+
+    shown = notification_bus.notifications
+    assert shown[-1].body == "Completed successfully."
+    assert {n.id for n in shown} == {1}
+
+
+def test_falls_back_to_notify_send(
+    monkeypatch: pytest.MonkeyPatch, tmp_path, notify_send: list[tuple]
+):
+    monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", f"unix:path={tmp_path}/missing")
+
+    with progress_notification("Apply", "Launching") as notification:
+        notification.start()
+        assert flush_notifications()
+    assert flush_notifications()
+
+    assert notify_send == [
+        ("Apply", "Launching ...", None),
+        ("Apply", "Completed successfully.", 42),
+    ]
+
+
+def test_falls_back_to_notify_send_if_the_bus_fails(
+    notification_bus: FakeNotificationBus, notify_send: list[tuple]
+):
+    error_notification("Apply", "First")
+    assert flush_notifications()
+    assert notifications._session_bus is not None
+    # Breaks the connection.
+    notifications._session_bus.close()
+
+    error_notification("Apply", "Second")
+    assert flush_notifications()
+
+    assert [n.body for n in notification_bus.notifications] == ["First"]
+    assert notify_send == [("Apply", "Second", None)]
+
+
+def test_message_roundtrip():
+    message = Message(
+        1,
+        7,
+        {1: "/a", 3: "M", 8: "sa{sv}"},
+        ["abc", {"k": ("u", 5)}],
+    )
+    encoded = message.encode()
+    assert b"\x03\x00\x00\x00abc\x00" in encoded
+    assert Message.decode(encoded).body == ["abc", {"k": 5}]
@@ -0,0 +1,49 @@
+from sway_out.connection import SwayConnection
+from sway_out.layout import move_windows_to_workspace
+from sway_out.layout_files import WorkspaceLayout
+from sway_out.outputs import move_workspace_to_output
+from utils import FakeSway
+
+
+def test_workspace_with_only_floating_windows_is_moved():
+    with FakeSway(outputs=("FAKE-1", "FAKE-2")) as sway:
+        window_ids = [sway.add_window("2", app_id=f"app{i}") for i in range(2)]
+        for window_id in window_ids:
+            sway.run(f"[con_id={window_id}] floating enable")
+        workspace = sway.find(window_ids[0]).workspace()
+        assert workspace is not None and not workspace.nodes
+        workspace_layout = WorkspaceLayout.model_validate(
+            {
+                "layout": "splith",
+                "output": ["MISSING-1", "FAKE-2"],
+                "children": [
+                    {"cmd": f"app{i}", "match": {"wayland": {"app_id": f"app{i}"}}}
+                    for i in range(2)
+                ],
+            }
+        )
+        workspace_layout._con_id = workspace.id
+
+        connection = SwayConnection(sway.socket_path)
+        try:
+            move_workspace_to_output(connection, workspace_layout)
+        finally:
+            connection.close()
+
+        assert workspace.parent is not None
+        assert workspace.parent.name == "FAKE-2"
+        assert [w.id for w in workspace.floating_nodes] == window_ids
+
+
+def test_layout_without_windows_is_not_moved(fake_sway: FakeSway):
+    workspace_layout = WorkspaceLayout.model_validate(
+        {"layout": "splith", "children": []}
+    )
+    connection = SwayConnection()
+    try:
+        move_windows_to_workspace(connection, "2", workspace_layout)
+    finally:
+        connection.close()
+
+    assert not hasattr(workspace_layout, "_con_id") or workspace_layout._con_id is None
+    assert fake_sway.messages["RUN_COMMAND"] == 0
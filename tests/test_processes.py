@@ -0,0 +1,60 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from sway_out.processes import ProcessTable
+
+
+def add_process(
+    proc: Path,
+    pid: int,
+    cmdline: list[str],
+    ppid: int = 1,
+    session: int | None = None,
+    name: str = "a (b) c",
+) -> None:
+    directory = proc / str(pid)
+    directory.mkdir()
+    (directory / "stat").write_text(
+        f"{pid} ({name}) S {ppid} {pid} {session or pid} 0 -1 4194560\n"
+    )
+    (directory / "cmdline").write_bytes(b"".join(a.encode() + b"\0" for a in cmdline))
+
+
+def test_own_process_is_read():
+    process = ProcessTable().get(os.getpid())
+    assert process is not None
+    assert process.ppid == os.getppid()
+    assert process.exe is not None
+    assert "pytest" in " ".join(process.cmdline)
+
+
+def test_processes_are_read_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    add_process(tmp_path, 100, ["launcher"], session=100)
+    add_process(tmp_path, 200, ["browser", "--flag"], ppid=100, session=100)
+    table = ProcessTable(tmp_path)
+    table.collect([200, 200, 300])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The process should have been memoized")
+
+    monkeypatch.setattr(table, "_read", fail)
+    assert table.get(200) is not None and table.get(200).cmdline == [
+        "browser",
+        "--flag",
+    ]
+    assert table.get(300) is None
+    assert [p.cmdline for p in table.get_ancestors(200)] == [["launcher"]]
+    assert table.is_shared(200)
+    assert not table.is_shared(100)
+
+
+def test_ancestors_end_at_the_session(tmp_path: Path):
+    add_process(tmp_path, 1, ["init"])
+    add_process(tmp_path, 100, ["sway"], ppid=1, session=50)
+    add_process(tmp_path, 200, ["sh", "wrapper"], ppid=100, session=200)
+    add_process(tmp_path, 300, ["app"], ppid=200, session=200)
+    table = ProcessTable(tmp_path)
+    assert [p.pid for p in table.get_ancestors(300)] == [200]
+    assert table.get_ancestors(1) == []
@@ -0,0 +1,137 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from sway_out import snapshots
+from sway_out.layout_files import WorkspaceLayout
+from sway_out.main import main
+from sway_out.snapshots import Snapshot, SnapshotStore
+from utils import FakeSway
+
+
+def workspace_layout(app_id: str) -> WorkspaceLayout:
+    return WorkspaceLayout.model_validate(
+        {
+            "layout": "splith",
+            "children": [{"cmd": app_id, "match": {"wayland": {"app_id": app_id}}}],
+        }
+    )
+
+
+def objects(store: SnapshotStore) -> list[Path]:
+    return list(store.objects_directory.glob("*/*.yaml"))
+
+
+def test_unchanged_workspaces_are_stored_once(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    store.save([("1", workspace_layout("a")), ("2", workspace_layout("b"))])
+    store.save([("1", workspace_layout("a")), ("2", workspace_layout("c"))], "work")
+    store.save([("1", workspace_layout("a")), ("3", workspace_layout("a"))])
+    assert len(objects(store)) == 3
+    assert len(store.get_all()) == 3
+
+    latest = store.load("latest")
+    assert latest.workspaces == {"1": workspace_layout("a"), "3": workspace_layout("a")}
+    named = store.load("work")
+    assert named.workspaces == {"1": workspace_layout("a"), "2": workspace_layout("c")}
+    with pytest.raises(RuntimeError):
+        store.load("home")
+    with pytest.raises(ValueError):
+        store.save([], "latest")
+
+
+def test_latest_is_read_from_the_end_of_the_log(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    store = SnapshotStore(tmp_path)
+    for app_id in "abc":
+        store.save([("1", workspace_layout(app_id))])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The whole log should not be read")
+
+    monkeypatch.setattr(SnapshotStore, "get_all", fail)
+    assert store.load("latest").workspaces == {"1": workspace_layout("c")}
+    assert snapshots._read_last_line(store.log_path, block_size=7) == (
+        store.log_path.read_bytes().splitlines()[-1]
+    )
+
+    # An incomplete line after a crash is skipped.
+    with store.log_path.open("a") as file:
+        file.write('{"id": "2')
+    monkeypatch.undo()
+    assert store.load("latest").workspaces == {"1": workspace_layout("c")}
+
+
+def test_prune_removes_old_snapshots_and_their_workspaces(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    store.save([("1", workspace_layout("a"))], "keep")
+    for app_id in "bcd":
+        store.save([("1", workspace_layout(app_id))])
+
+    assert store.prune(keep=2, grace_seconds=0) == (2, 1)
+    assert [s.workspaces for s in store.get_all()] == [
+        [("1", store.put_workspace(workspace_layout(app_id)))] for app_id in "cd"
+    ]
+    assert len(objects(store)) == 3
+    assert store.load("keep").workspaces == {"1": workspace_layout("a")}
+
+    # The latest snapshot survives any age.
+    time.sleep(0.01)
+    assert store.prune(max_age_seconds=0, grace_seconds=0) == (1, 1)
+    assert len(store.get_all()) == 1
+    assert isinstance(store.get("latest"), Snapshot)
+
+
+def test_prune_keeps_recently_used_workspaces(tmp_path: Path):
+    store = SnapshotStore(tmp_path)
+    old = store.put_workspace(workspace_layout("a"))
+    os.utime(store._get_object_path(old), (0, 0))
+    store.save([("1", workspace_layout("b"))])
+    # A saver is about to add a snapshot with these.
+    fresh = store.put_workspace(workspace_layout("c"))
+    reused = store.put_workspace(workspace_layout("d"))
+    os.utime(store._get_object_path(reused), (0, 0))
+    assert store.put_workspace(workspace_layout("d")) == reused
+
+    assert store.prune(keep=1) == (0, 1)
+    store.add([("1", fresh), ("2", reused)])
+    with pytest.raises(RuntimeError):
+        store.add([("1", old)])
+    assert len(store.get_all()) == 2
+
+
+def test_snapshot_is_saved_and_applied(fake_sway: FakeSway, tmp_path: Path):
+    fake_sway.add_window("1", app_id="a")
+    runner = CliRunner()
+    result = runner.invoke(main, ["--no-notifications", "save", "--snapshot"])
+    assert result.exception is None, result.output
+    result = runner.invoke(main, ["--no-notifications", "save", "--snapshot", "s"])
+    assert result.exception is None, result.output
+
+    result = runner.invoke(main, ["snapshots", "list"])
+    assert result.exception is None, result.output
+    assert len(result.output.splitlines()) == 2
+    layout = SnapshotStore().load("s")
+    assert layout.workspaces is not None and list(layout.workspaces) == ["1"]
+
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(
+        yaml.safe_dump(
+            {"workspaces": {"2": workspace_layout("b").model_dump(exclude_unset=True)}}
+        )
+    )
+    result = runner.invoke(main, ["--no-notifications", "apply", str(layout_file)])
+    assert result.exception is None, result.output
+    assert fake_sway.workspace_windows("2")
+
+    result = runner.invoke(
+        main, ["--no-notifications", "apply", "--snapshot", "latest"]
+    )
+    assert result.exception is None, result.output
+    result = runner.invoke(main, ["--no-notifications", "apply"])
+    assert result.exit_code == 2
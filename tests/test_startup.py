@@ -0,0 +1,111 @@
+"""Cold-start budgets for the subcommands, measured with `python -X importtime`.
+
+Every command runs in a fresh interpreter. The time spent importing modules
+is the sum of the top-level entries of the import time log. The budgets are
+generous to tolerate slow machines; the modules that must not be imported are
+checked exactly.
+"""
+
+import importlib.metadata
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+from utils import FakeSway
+
+HEAVY_MODULES = {"pydantic", "yaml", "i3ipc", "asyncio"}
+"""Modules that commands which do not talk to Sway must not import."""
+
+LAYOUT = {
+    "workspaces": {
+        "1": {
+            "layout": "splith",
+            "children": [
+                {"cmd": "app --app-id app0", "match": {"wayland": {"app_id": "app0"}}}
+            ],
+        }
+    }
+}
+
+
+def run_with_importtime(*args: str) -> tuple[float, set[str]]:
+    """Run the command line interface in a new interpreter.
+
+    Returns:
+        The import time in milliseconds and the imported top-level packages.
+    """
+
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from sway_out.main import main; main()",
+            *args,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode in (0, 1), result.stderr
+
+    microseconds = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        packages.add(name.strip().split(".")[0])
+        # Nested imports are indented, their time is part of their parent's.
+        if not name.startswith("  "):
+            microseconds += int(cumulative)
+    return microseconds / 1000, packages
+
+
+@pytest.mark.parametrize(
+    "args,budget_ms",
+    [
+        (["--help"], 200),
+        (["apply", "--help"], 200),
+        (["save", "--help"], 200),
+    ],
+)
+def test_help_does_not_import_dependencies(args: list[str], budget_ms: float):
+    milliseconds, packages = run_with_importtime(*args)
+    assert not packages & HEAVY_MODULES
+    assert milliseconds < budget_ms
+
+
+def test_version_does_not_import_dependencies():
+    try:
+        importlib.metadata.version("sway-out")
+    except importlib.metadata.PackageNotFoundError:
+        pytest.skip("--version requires sway-out to be installed")
+    milliseconds, packages = run_with_importtime("--version")
+    assert not packages & HEAVY_MODULES
+    assert milliseconds < 200
+
+
+@pytest.mark.parametrize(
+    "command,budget_ms",
+    [
+        ("apply", 1000),
+        ("check", 1000),
+        ("save", 1000),
+    ],
+)
+def test_command_startup_budget(
+    fake_sway: FakeSway, tmp_path: Path, command: str, budget_ms: float
+):
+    fake_sway.add_window("1", app_id="app0")
+    args = ["--no-notifications", command]
+    if command != "save":
+        layout_file = tmp_path / "layout.yaml"
+        layout_file.write_text(yaml.safe_dump(LAYOUT))
+        args.append(str(layout_file))
+
+    milliseconds, _ = run_with_importtime(*args)
+    assert milliseconds < budget_ms
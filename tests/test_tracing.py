@@ -0,0 +1,89 @@
+import json
+
+import yaml
+from click.testing import CliRunner
+
+from sway_out.main import main
+from utils import FakeSway
+
+
+def test_apply_writes_a_trace(fake_sway: FakeSway, tmp_path):
+    layout_file = tmp_path / "layout.yaml"
+    layout_file.write_text(
+        yaml.safe_dump(
+            {
+                "workspaces": {
+                    "1": {
+                        "layout": "splith",
+                        "children": [
+                            {
+                                "cmd": f"app --app-id {name} --title {name}",
+                                "match": {"wayland": {"app_id": f"^{name}$"}},
+                            }
+                            for name in ("a", "b")
+                        ],
+                    }
+                }
+            }
+        )
+    )
+    trace_file = tmp_path / "trace.json"
+
+    result = CliRunner().invoke(
+        main,
+        ["--no-notifications", "apply", "--trace", str(trace_file), str(layout_file)],
+    )
+    assert result.exception is None, result.output
+    assert fake_sway.workspace_structure("1") == ("splith", ["a", "b"])
+
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert events[0]["ph"] == "M"
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert list(spans) == [
+        "load",
+        "map workspaces",
+        "workspace 1",
+        "match",
+        "check applied",
+        "launch",
+        "gather",
+        "reconcile",
+        "resize",
+        "marks",
+        "output",
+        "check",
+        "focus",
+    ]
+    assert all(span["ts"] >= 0 and span["dur"] >= 0 for span in spans.values())
+    assert spans["workspace 1"]["cat"] == "workspace"
+    assert spans["launch"]["cat"] == "phase"
+    assert spans["launch"]["args"]["RUN_COMMAND"] == 2
+
+    # The phases of the workspace are nested in its span and add up to it.
+    workspace = spans.pop("workspace 1")
+    nested = [
+        span
+        for span in spans.values()
+        if span["ts"] >= workspace["ts"]
+        and span["ts"] + span["dur"] <= workspace["ts"] + workspace["dur"]
+    ]
+    assert [span["name"] for span in nested] == list(spans)[2:-1]
+    assert workspace["args"]["RUN_COMMAND"] == sum(
+        span["args"].get("RUN_COMMAND", 0) for span in nested
+    )
+
+    # There is a counter sample at the end of every span.
+    counters = [event for event in events if event["ph"] == "C"]
+    assert len(counters) == len(spans) + 1
+    assert [counter["ts"] for counter in counters] == sorted(
+        counter["ts"] for counter in counters
+    )
+    assert counters[-1]["args"]["RUN_COMMAND"] == fake_sway.messages["RUN_COMMAND"]
+
+    header, *rows = result.stderr.splitlines()
+    assert header.split()[:3] == ["phase", "count", "ms"]
+    summary = {row.split()[0]: row.split() for row in rows if row[:1] != " "}
+    assert summary["launch"][1] == "1"
+    assert summary["launch"][4] == "2"
+    # The count column of the total is empty.
+    assert summary["total"][3] == str(fake_sway.messages["RUN_COMMAND"])
@@ -0,0 +1,1477 @@
+"""A stand-in for the Sway IPC server.
+
+`FakeSway` listens on a Unix socket and speaks enough of
+the i3/Sway IPC protocol for `i3ipc.Connection` (and therefore sway-out) to
+talk to it via `SWAYSOCK`. It models the container tree, the commands used by
+sway-out and the `window`/`workspace` events.
+
+The model follows Sway's behavior where sway-out depends on it, but it is not
+a complete reimplementation:
+
+- There are no gaps or borders.
+- Floating windows are as large as their workspace, and tiling a floating
+  window again always appends it to its workspace.
+- Title bars are only drawn in tabbed and stacked containers, unless
+  `titlebar_height` is set, in which case every window gets one.
+- `exec` does not run anything. Instead, a fake window is mapped after a short
+  delay. The command line is parsed for `--app-id`, `--class`, `--instance`,
+  `--title`, `--late-title`, `--delay` and `--no-window`.
+
+`FakeNotificationBus` is a stand-in for the D-Bus session bus with a
+notification server on it, for use via `DBUS_SESSION_BUS_ADDRESS`.
+"""
+
+import itertools
+import json
+import os
+import re
+import selectors
+import shlex
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+MAGIC = b"i3-ipc"
+HEADER = struct.Struct("=6sII")
+
+COMMAND = 0
+GET_WORKSPACES = 1
+SUBSCRIBE = 2
+GET_OUTPUTS = 3
+GET_TREE = 4
+GET_MARKS = 5
+GET_VERSION = 7
+SEND_TICK = 10
+
+MESSAGE_NAMES = {
+    COMMAND: "RUN_COMMAND",
+    GET_WORKSPACES: "GET_WORKSPACES",
+    SUBSCRIBE: "SUBSCRIBE",
+    GET_OUTPUTS: "GET_OUTPUTS",
+    GET_TREE: "GET_TREE",
+    GET_MARKS: "GET_MARKS",
+    GET_VERSION: "GET_VERSION",
+    SEND_TICK: "SEND_TICK",
+}
+
+EVENT_TYPES = {
+    "workspace": 0,
+    "output": 1,
+    "mode": 2,
+    "window": 3,
+    "barconfig_update": 4,
+    "binding": 5,
+    "shutdown": 6,
+    "tick": 7,
+}
+
+OUTPUT_WIDTH = 1920
+OUTPUT_HEIGHT = 1080
+MIN_SIZE_PX = 20
+
+RESIZE_DIRECTIONS = {
+    "width": (True, (-1, 1)),
+    "horizontal": (True, (-1, 1)),
+    "left": (True, (-1,)),
+    "right": (True, (1,)),
+    "height": (False, (-1, 1)),
+    "vertical": (False, (-1, 1)),
+    "up": (False, (-1,)),
+    "down": (False, (1,)),
+}
+
+
+class CommandError(Exception):
+    """A command failed."""
+
+
+@dataclass(eq=False)
+class Node:
+    """A node in the fake container tree."""
+
+    id: int
+    type: str
+    name: str | None = None
+    layout: str = "none"
+    parent: "Node | None" = None
+    nodes: list["Node"] = field(default_factory=list)
+    floating_nodes: list["Node"] = field(default_factory=list)
+    marks: list[str] = field(default_factory=list)
+    fraction: float = 1.0
+    pid: int | None = None
+    app_id: str | None = None
+    window_class: str | None = None
+    window_instance: str | None = None
+    num: int = -1
+    last_focused: "Node | None" = None
+
+    @property
+    def is_window(self) -> bool:
+        return self.pid is not None
+
+    @property
+    def is_floating(self) -> bool:
+        return self.parent is not None and self in self.parent.floating_nodes
+
+    def index(self) -> int:
+        assert self.parent is not None
+        return self.parent.nodes.index(self)
+
+    def workspace(self) -> "Node | None":
+        node: Node | None = self
+        while node is not None and node.type != "workspace":
+            node = node.parent
+        return node
+
+    def walk(self):
+        yield self
+        for child in [*self.nodes, *self.floating_nodes]:
+            yield from child.walk()
+
+    def windows(self) -> list["Node"]:
+        return [node for node in self.walk() if node.is_window]
+
+
+@dataclass
+class FakeApp:
+    """What a fake `exec` maps as a window."""
+
+    app_id: str | None
+    window_class: str | None
+    window_instance: str | None
+    title: str
+    late_title: str | None
+    delay: float
+    maps_window: bool
+
+    @classmethod
+    def parse(cls, command: str) -> "FakeApp":
+        argv = shlex.split(command)
+        options: dict[str, str | None] = {}
+        positional: list[str] = []
+        arguments = iter(argv[1:])
+        for argument in arguments:
+            if argument == "--no-window":
+                options["no-window"] = None
+            elif argument.startswith("--") and argument[2:] in {
+                "app-id",
+                "class",
+                "instance",
+                "title",
+                "late-title",
+                "delay",
+            }:
+                options[argument[2:]] = next(arguments, "")
+            else:
+                positional.append(argument)
+        name = os.path.basename(argv[0]) if argv else "fake"
+        window_class = options.get("class")
+        app_id = options.get("app-id")
+        if app_id is None and window_class is None:
+            app_id = name
+        return cls(
+            app_id=app_id,
+            window_class=window_class,
+            window_instance=options.get("instance", window_class),
+            title=options.get("title") or " ".join([name, *positional]),
+            late_title=options.get("late-title"),
+            delay=float(options.get("delay") or 0.02),
+            maps_window="no-window" not in options,
+        )
+
+
+class FakeSway:
+    """A fake Sway IPC server running in a background thread.
+
+    Use it as a context manager. While it runs, `socket_path` can be passed to
+    `i3ipc.Connection` or exported as `SWAYSOCK`.
+
+    Attributes:
+        messages: The number of messages received per message type name.
+        commands: The number of individual commands executed.
+        bytes_sent: The number of bytes sent in replies and events.
+        command_log: All command strings received, in order.
+        late_events: If set, the events caused by a message are only sent
+            when the next message is handled, i.e. after the reply. Sway
+            does not guarantee that they arrive earlier.
+    """
+
+    def __init__(
+        self,
+        outputs: tuple[str, ...] = ("FAKE-1",),
+        titlebar_height: int = 0,
+    ):
+        self._ids = itertools.count(1)
+        self._pids = itertools.count(1000)
+        self._lock = threading.RLock()
+        self._directory = tempfile.TemporaryDirectory(prefix="fake-sway-")
+        self.socket_path = os.path.join(self._directory.name, "ipc.sock")
+        self.titlebar_height = titlebar_height
+        self.messages: Counter[str] = Counter()
+        self.commands = 0
+        self.bytes_sent = 0
+        self.command_log: list[str] = []
+        self.late_events = False
+        self._late_events: list[tuple[socket.socket, int, dict]] | None = None
+        self._subscribers: dict[socket.socket, set[str]] = {}
+        self._buffers: dict[socket.socket, bytes] = {}
+        self._timers: list[threading.Timer] = []
+
+        self.root = Node(next(self._ids), "root", name="root", layout="splith")
+        self.outputs: list[Node] = []
+        for output_name in outputs:
+            output = Node(next(self._ids), "output", name=output_name, parent=self.root)
+            self.root.nodes.append(output)
+            self.outputs.append(output)
+        self.focused: Node = self._create_workspace("1", self.outputs[0])
+
+        self._server: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._running = False
+
+    # Lifecycle
+
+    def __enter__(self) -> "FakeSway":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self) -> None:
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen()
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        for timer in self._timers:
+            timer.cancel()
+        self._wakeup_w.send(b"x")
+        if self._thread is not None:
+            self._thread.join()
+        if self._server is not None:
+            self._server.close()
+        self._directory.cleanup()
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.messages.clear()
+            self.commands = 0
+            self.bytes_sent = 0
+            self.command_log.clear()
+
+    # Test helpers
+
+    def add_window(
+        self,
+        workspace: str | None = None,
+        app_id: str | None = "fake",
+        title: str = "fake",
+        window_class: str | None = None,
+        window_instance: str | None = None,
+        pid: int | None = None,
+    ) -> int:
+        """Map a window as if an application had opened it.
+
+        Returns:
+            The con_id of the new window.
+        """
+
+        with self._lock:
+            workspace_node = (
+                self._find_workspace(workspace) if workspace else None
+            ) or (self._create_workspace(workspace) if workspace else None)
+            window = self._map_window(
+                FakeApp(
+                    app_id=app_id if window_class is None else None,
+                    window_class=window_class,
+                    window_instance=window_instance or window_class,
+                    title=title,
+                    late_title=None,
+                    delay=0,
+                    maps_window=True,
+                ),
+                workspace_node,
+                pid,
+            )
+            return window.id
+
+    def run(self, command: str) -> list[dict]:
+        """Run a command as if it was sent over IPC, without counting it."""
+
+        with self._lock:
+            return self._run_commands(command)
+
+    def find(self, con_id: int) -> Node | None:
+        with self._lock:
+            return self._find_by_id(con_id)
+
+    def workspace_windows(self, name: str) -> list[int]:
+        """Return the con_ids of the windows on a workspace in tree order."""
+
+        with self._lock:
+            workspace = self._find_workspace(name)
+            assert workspace is not None, f"No workspace {name}"
+            return [window.id for window in workspace.windows()]
+
+    def workspace_structure(self, name: str):
+        """Return a compact representation of the tree of a workspace.
+
+        Windows are represented by their title, containers by a tuple of their
+        layout and children.
+        """
+
+        def go(node: Node):
+            if node.is_window:
+                return node.name
+            return (node.layout, [go(child) for child in node.nodes])
+
+        with self._lock:
+            workspace = self._find_workspace(name)
+            assert workspace is not None, f"No workspace {name}"
+            return go(workspace)
+
+    # Serving
+
+    def _serve(self) -> None:
+        assert self._server is not None
+        selector = selectors.DefaultSelector()
+        selector.register(self._server, selectors.EVENT_READ)
+        selector.register(self._wakeup_r, selectors.EVENT_READ)
+        while self._running:
+            for key, _ in selector.select():
+                sock = key.fileobj
+                assert isinstance(sock, socket.socket)
+                if sock is self._wakeup_r:
+                    sock.recv(1024)
+                elif sock is self._server:
+                    client, _ = self._server.accept()
+                    self._buffers[client] = b""
+                    selector.register(client, selectors.EVENT_READ)
+                else:
+                    try:
+                        data = sock.recv(65536)
+                    except OSError:
+                        data = b""
+                    if not data:
+                        selector.unregister(sock)
+                        with self._lock:
+                            self._subscribers.pop(sock, None)
+                        self._buffers.pop(sock, None)
+                        sock.close()
+                        continue
+                    self._buffers[sock] += data
+                    self._handle_buffer(sock)
+        for key in list(selector.get_map().values()):
+            if key.fileobj not in (self._server, self._wakeup_r):
+                key.fileobj.close()  # type: ignore[union-attr]
+        selector.close()
+
+    def _handle_buffer(self, sock: socket.socket) -> None:
+        while len(self._buffers[sock]) >= HEADER.size:
+            magic, length, message_type = HEADER.unpack_from(self._buffers[sock])
+            assert magic == MAGIC, "Invalid magic string"
+            if len(self._buffers[sock]) < HEADER.size + length:
+                return
+            payload = self._buffers[sock][HEADER.size : HEADER.size + length]
+            self._buffers[sock] = self._buffers[sock][HEADER.size + length :]
+            with self._lock:
+                late_events, self._late_events = self._late_events, None
+                for event in late_events or ():
+                    self._send(*event)
+                if self.late_events:
+                    self._late_events = []
+                self.messages[MESSAGE_NAMES.get(message_type, str(message_type))] += 1
+                reply = self._handle_message(sock, message_type, payload.decode())
+                self._send(sock, message_type, reply)
+
+    def _send(self, sock: socket.socket, message_type: int, obj) -> None:
+        payload = json.dumps(obj).encode()
+        message = MAGIC + struct.pack("=II", len(payload), message_type) + payload
+        self.bytes_sent += len(message)
+        try:
+            if message_type & 0x80000000:
+                # Like Sway, disconnect subscribers that do not keep up with the
+                # events instead of blocking.
+                if sock.send(message, socket.MSG_DONTWAIT) < len(message):
+                    raise BlockingIOError()
+            else:
+                sock.sendall(message)
+        except BlockingIOError:
+            self._subscribers.pop(sock, None)
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _emit(self, event: str, make_payload) -> None:
+        """Send an event to all subscribers.
+
+        The payload is only created if anybody is subscribed to the event.
+        """
+
+        subscribers = [
+            sock for sock, events in self._subscribers.items() if event in events
+        ]
+        if not subscribers:
+            return
+        payload = make_payload()
+        for sock in subscribers:
+            if self.late_events and self._late_events is not None:
+                self._late_events.append(
+                    (sock, 0x80000000 | EVENT_TYPES[event], payload)
+                )
+            else:
+                self._send(sock, 0x80000000 | EVENT_TYPES[event], payload)
+
+    def _handle_message(self, sock: socket.socket, message_type: int, payload: str):
+        match message_type:
+            case 0:  # COMMAND
+                self.command_log.append(payload)
+                return self._run_commands(payload)
+            case 1:  # GET_WORKSPACES
+                return [
+                    self._serialize_workspace_reply(ws) for ws in self._all_workspaces()
+                ]
+            case 2:  # SUBSCRIBE
+                events = json.loads(payload)
+                if any(event not in EVENT_TYPES for event in events):
+                    return {"success": False}
+                self._subscribers.setdefault(sock, set()).update(events)
+                return {"success": True}
+            case 3:  # GET_OUTPUTS
+                return [
+                    {
+                        "name": output.name,
+                        "active": True,
+                        "focused": self.focused.workspace() in output.nodes,
+                        "current_workspace": (
+                            output.nodes[0].name if output.nodes else None
+                        ),
+                        "rect": self._output_rect(output),
+                    }
+                    for output in self.outputs
+                ]
+            case 4:  # GET_TREE
+                return self._serialize(self.root, self._output_rect(None))
+            case 5:  # GET_MARKS
+                return [mark for node in self.root.walk() for mark in node.marks]
+            case 7:  # GET_VERSION
+                return {
+                    "major": 1,
+                    "minor": 10,
+                    "patch": 0,
+                    "human_readable": "fake",
+                    "loaded_config_file_name": "",
+                }
+            case 10:  # SEND_TICK
+                self._emit("tick", lambda: {"first": False, "payload": payload})
+                return {"success": True}
+            case _:
+                return {"success": False, "error": "Unsupported message"}
+
+    # Serialization
+
+    def _output_rect(self, output: Node | None) -> dict:
+        index = self.outputs.index(output) if output is not None else 0
+        return {
+            "x": index * OUTPUT_WIDTH,
+            "y": 0,
+            "width": OUTPUT_WIDTH,
+            "height": OUTPUT_HEIGHT,
+        }
+
+    def _serialize_workspace_reply(self, workspace: Node) -> dict:
+        output = workspace.parent
+        assert output is not None
+        return {
+            "num": workspace.num,
+            "name": workspace.name,
+            "visible": output.nodes and output.last_focused is workspace,
+            "focused": self.focused.workspace() is workspace,
+            "urgent": False,
+            "rect": self._output_rect(output),
+            "output": output.name,
+        }
+
+    def _serialize(self, node: Node, rect: dict, deco_height: int = 0) -> dict:
+        content_rect = dict(rect)
+        if node.is_window and self.titlebar_height and not deco_height:
+            deco_height = self.titlebar_height
+        if deco_height:
+            content_rect["y"] += deco_height
+            content_rect["height"] -= deco_height
+        data = {
+            "id": node.id,
+            "type": node.type,
+            "name": node.name,
+            "layout": node.layout,
+            "orientation": {"splith": "horizontal", "splitv": "vertical"}.get(
+                node.layout, "none"
+            ),
+            "marks": list(node.marks),
+            "focused": node is self.focused,
+            "focus": [child.id for child in node.nodes],
+            "rect": content_rect,
+            "window_rect": {"x": 0, "y": 0, "width": 0, "height": 0},
+            "deco_rect": {
+                "x": 0,
+                "y": 0,
+                "width": rect["width"] if deco_height else 0,
+                "height": deco_height,
+            },
+            "geometry": {"x": 0, "y": 0, "width": 0, "height": 0},
+            "percent": node.fraction,
+            "nodes": [],
+            "floating_nodes": [],
+        }
+        if node.type == "workspace":
+            data["num"] = node.num
+        if node.type == "output":
+            data["rect"] = self._output_rect(node)
+            data["layout"] = "output"
+        if node.is_window:
+            data["pid"] = node.pid
+            data["window"] = None if node.app_id is not None else node.id
+            if node.app_id is not None:
+                data["app_id"] = node.app_id
+            else:
+                data["window_properties"] = {
+                    "class": node.window_class,
+                    "instance": node.window_instance,
+                    "title": node.name,
+                }
+        data["nodes"] = [
+            self._serialize(child, child_rect, child_deco)
+            for child, child_rect, child_deco in self._child_rects(node, rect)
+        ]
+        # Floating windows are simply as large as their workspace.
+        data["floating_nodes"] = [
+            self._serialize(child, rect) for child in node.floating_nodes
+        ]
+        return data
+
+    def _child_rects(self, node: Node, rect: dict):
+        if node.type == "root":
+            for output in node.nodes:
+                yield output, self._output_rect(output), 0
+            return
+        if node.type == "output":
+            for workspace in node.nodes:
+                yield workspace, self._output_rect(node), 0
+            return
+        children = node.nodes
+        if not children:
+            return
+        if node.layout in ("tabbed", "stacking"):
+            bar_height = self.titlebar_height or 24
+            if node.layout == "stacking":
+                bar_height *= len(children)
+            for child in children:
+                yield child, rect, bar_height
+            return
+        horizontal = node.layout == "splith"
+        total = sum(child.fraction for child in children) or 1.0
+        available = rect["width"] if horizontal else rect["height"]
+        offset = 0
+        for index, child in enumerate(children):
+            if index == len(children) - 1:
+                size = available - offset
+            else:
+                size = round(available * child.fraction / total)
+            child_rect = dict(rect)
+            if horizontal:
+                child_rect["x"] = rect["x"] + offset
+                child_rect["width"] = size
+            else:
+                child_rect["y"] = rect["y"] + offset
+                child_rect["height"] = size
+            offset += size
+            yield child, child_rect, 0
+
+    def _rect_of(self, target: Node) -> dict:
+        """Compute the rectangle of a node (including its decoration)."""
+
+        def go(node: Node, rect: dict, deco: int) -> dict | None:
+            if node is target:
+                return rect | {"deco": deco}
+            if target in node.floating_nodes:
+                return rect | {"deco": 0}
+            for child, child_rect, child_deco in self._child_rects(node, rect):
+                result = go(child, child_rect, child_deco)
+                if result is not None:
+                    return result
+            return None
+
+        result = go(self.root, self._output_rect(None), 0)
+        assert result is not None
+        return result
+
+    # Tree helpers
+
+    def _all_workspaces(self) -> list[Node]:
+        return [ws for output in self.outputs for ws in output.nodes]
+
+    def _find_workspace(self, name: str) -> Node | None:
+        for workspace in self._all_workspaces():
+            if workspace.name == name:
+                return workspace
+        return None
+
+    def _find_by_id(self, con_id: int) -> Node | None:
+        for node in self.root.walk():
+            if node.id == con_id:
+                return node
+        return None
+
+    def _create_workspace(self, name: str, output: Node | None = None) -> Node:
+        if output is None:
+            focused_workspace = self.focused.workspace()
+            output = focused_workspace.parent if focused_workspace else None
+            output = output or self.outputs[0]
+        workspace = Node(
+            next(self._ids),
+            "workspace",
+            name=name,
+            layout="splith",
+            parent=output,
+            num=int(name) if name.isdigit() else -1,
+        )
+        output.nodes.append(workspace)
+        output.nodes.sort(key=lambda ws: (ws.num < 0, ws.num, ws.name))
+        self._emit(
+            "workspace",
+            lambda: {"change": "init", "current": self._serialize_plain(workspace)},
+        )
+        return workspace
+
+    def _serialize_plain(self, node: Node) -> dict:
+        return self._serialize(node, self._rect_of(node))
+
+    def _focus(self, node: Node) -> None:
+        old_workspace = self.focused.workspace()
+        self.focused = node
+        workspace = node.workspace()
+        if workspace is not None:
+            workspace.last_focused = node if node.is_window else None
+            assert workspace.parent is not None
+            workspace.parent.last_focused = workspace
+        if node.is_window:
+            self._emit(
+                "window",
+                lambda: {"change": "focus", "container": self._serialize_plain(node)},
+            )
+        if workspace is not old_workspace and workspace is not None:
+            self._emit(
+                "workspace",
+                lambda: {
+                    "change": "focus",
+                    "current": self._serialize_plain(workspace),
+                    "old": None,
+                },
+            )
+            if old_workspace is not None:
+                self._reap_workspace(old_workspace)
+
+    def _reap_workspace(self, workspace: Node) -> None:
+        if (
+            workspace.nodes
+            or workspace.floating_nodes
+            or self.focused.workspace() is workspace
+            or workspace.parent is None
+        ):
+            return
+        workspace.parent.nodes.remove(workspace)
+        workspace.parent = None
+        self._emit(
+            "workspace", lambda: {"change": "empty", "current": {"id": workspace.id}}
+        )
+
+    def _detach(self, node: Node) -> None:
+        parent = node.parent
+        assert parent is not None
+        if node.is_floating:
+            parent.floating_nodes.remove(node)
+        else:
+            parent.nodes.remove(node)
+        node.parent = None
+        self._normalize(parent)
+
+    def _attach(self, node: Node, parent: Node, index: int | None = None) -> None:
+        if index is None:
+            index = len(parent.nodes)
+        node.parent = parent
+        node.fraction = (
+            sum(c.fraction for c in parent.nodes) / len(parent.nodes)
+            if parent.nodes
+            else 1.0
+        )
+        parent.nodes.insert(index, node)
+
+    def _normalize(self, node: Node) -> None:
+        """Reap empty split containers, like Sway does."""
+
+        if node.type == "con" and not node.is_window and not node.nodes:
+            parent = node.parent
+            assert parent is not None
+            parent.nodes.remove(node)
+            node.parent = None
+            self._normalize(parent)
+        elif node.type == "workspace":
+            self._reap_workspace(node)
+
+    def _focus_inactive_window(self, node: Node) -> Node | None:
+        workspace = node.workspace()
+        if (
+            workspace is not None
+            and workspace.last_focused is not None
+            and workspace.last_focused.workspace() is workspace
+        ):
+            return workspace.last_focused
+        windows = node.windows()
+        return windows[-1] if windows else None
+
+    def _map_window(
+        self, app: FakeApp, workspace: Node | None, pid: int | None = None
+    ) -> Node:
+        if workspace is None or workspace.parent is None:
+            workspace = self.focused.workspace()
+        assert workspace is not None
+        window = Node(
+            next(self._ids),
+            "con",
+            name=app.title,
+            pid=pid if pid is not None else next(self._pids),
+            app_id=app.app_id,
+            window_class=app.window_class,
+            window_instance=app.window_instance,
+        )
+        sibling = self._focus_inactive_window(workspace)
+        if sibling is not None and not sibling.is_floating:
+            assert sibling.parent is not None
+            self._attach(window, sibling.parent, sibling.index() + 1)
+        else:
+            self._attach(window, workspace)
+        self._emit(
+            "window",
+            lambda: {"change": "new", "container": self._serialize_plain(window)},
+        )
+        if self.focused.workspace() is workspace:
+            self._focus(window)
+        else:
+            workspace.last_focused = window
+        return window
+
+    # Commands
+
+    def _run_commands(self, payload: str) -> list[dict]:
+        replies = []
+        for command in _split_commands(payload):
+            for criteria, action in command:
+                self.commands += 1
+                try:
+                    self._run_command(criteria, action)
+                except CommandError as e:
+                    replies.append(
+                        {"success": False, "parse_error": False, "error": str(e)}
+                    )
+                else:
+                    replies.append({"success": True})
+        return replies
+
+    def _select(self, criteria: str | None) -> Node:
+        if criteria is None:
+            return self.focused
+        match = re.fullmatch(r'\s*(con_id|con_mark)\s*=\s*"?([^"\]]*)"?\s*', criteria)
+        if match is None:
+            raise CommandError(f"Unsupported criteria: {criteria}")
+        key, value = match.groups()
+        if key == "con_id":
+            node = self._find_by_id(int(value))
+        else:
+            node = next((n for n in self.root.walk() if value in n.marks), None)
+        if node is None:
+            raise CommandError("No matching node.")
+        return node
+
+    def _run_command(self, criteria: str | None, action: str) -> None:
+        argv = shlex.split(action)
+        if not argv:
+            return
+        node = self._select(criteria)
+        verb, args = argv[0], argv[1:]
+        match verb:
+            case "nop":
+                pass
+            case "exec":
+                self._exec(" ".join(shlex.quote(a) for a in args))
+            case "workspace":
+                name = " ".join(a for a in args if a != "--no-auto-back-and-forth")
+                workspace = self._find_workspace(name) or self._create_workspace(name)
+                self._focus(self._focus_inactive_window(workspace) or workspace)
+            case "focus":
+                self._focus(node)
+            case "kill":
+                self._kill(node)
+            case "mark":
+                self._mark(node, args)
+            case "unmark":
+                for other in self.root.walk():
+                    if (other is node and criteria) or not criteria:
+                        if args:
+                            if args[0] in other.marks:
+                                other.marks.remove(args[0])
+                        else:
+                            other.marks.clear()
+            case "split" | "splith" | "splitv":
+                mode = args[0] if args else verb[-1]
+                self._split(node, mode)
+            case "layout":
+                self._layout(node, args[0] if args else "")
+            case "swap":
+                if args[:3] != ["container", "with", "con_id"] or len(args) != 4:
+                    raise CommandError(f"Unsupported swap: {action}")
+                other = self._find_by_id(int(args[3]))
+                if other is None:
+                    raise CommandError("Failed to find con_id")
+                self._swap(node, other)
+            case "move":
+                self._move(node, args)
+            case "resize":
+                self._resize(node, args)
+            case "floating":
+                self._float(node, args[0] if args else "")
+            case "title_format" | "border":
+                pass
+            case _:
+                raise CommandError(f"Unknown/invalid command '{verb}'")
+
+    def _exec(self, command: str) -> None:
+        app = FakeApp.parse(command)
+        if not app.maps_window:
+            return
+        workspace = self.focused.workspace()
+
+        def map_window():
+            with self._lock:
+                if not self._running:
+                    return
+                window = self._map_window(app, workspace)
+                if app.late_title is not None:
+                    late_title = app.late_title
+
+                    def set_title():
+                        with self._lock:
+                            if not self._running or window.parent is None:
+                                return
+                            window.name = late_title
+                            self._emit(
+                                "window",
+                                lambda: {
+                                    "change": "title",
+                                    "container": self._serialize_plain(window),
+                                },
+                            )
+
+                    self._start_timer(app.delay, set_title)
+
+        self._start_timer(app.delay, map_window)
+
+    def _start_timer(self, delay: float, callback) -> None:
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        self._timers.append(timer)
+        timer.start()
+
+    def _float(self, node: Node, mode: str) -> None:
+        if mode == "toggle":
+            mode = "disable" if node.is_floating else "enable"
+        if mode not in ("enable", "disable"):
+            raise CommandError(f"Invalid floating mode: {mode}")
+        if not node.is_window or node.is_floating == (mode == "enable"):
+            return
+        workspace = node.workspace()
+        assert workspace is not None
+        parent = node.parent
+        assert parent is not None
+        if mode == "enable":
+            parent.nodes.remove(node)
+            node.parent = workspace
+            workspace.floating_nodes.append(node)
+            # The window keeps the workspace alive.
+            self._normalize(parent)
+        else:
+            workspace.floating_nodes.remove(node)
+            self._attach(node, workspace)
+
+    def _kill(self, node: Node) -> None:
+        if not node.is_window:
+            for window in node.windows():
+                self._kill(window)
+            return
+        workspace = node.workspace()
+        self._detach(node)
+        self._emit("window", lambda: {"change": "close", "container": {"id": node.id}})
+        if self.focused is node and workspace is not None:
+            self.focused = workspace
+            replacement = self._focus_inactive_window(workspace)
+            workspace.last_focused = None
+            self._focus(replacement or workspace)
+
+    def _mark(self, node: Node, args: list[str]) -> None:
+        add = "--add" in args
+        toggle = "--toggle" in args
+        names = [a for a in args if not a.startswith("--")]
+        if len(names) != 1:
+            raise CommandError("Expected a single mark")
+        (name,) = names
+        if toggle and name in node.marks:
+            node.marks.remove(name)
+            return
+        for other in self.root.walk():
+            if name in other.marks:
+                other.marks.remove(name)
+        if not add:
+            node.marks.clear()
+        node.marks.append(name)
+        self._emit(
+            "window",
+            lambda: {"change": "mark", "container": self._serialize_plain(node)},
+        )
+
+    def _split(self, node: Node, mode: str) -> None:
+        if node.type == "workspace":
+            raise CommandError("Cannot split a workspace in the fake")
+        parent = node.parent
+        assert parent is not None
+        if mode in ("n", "none"):
+            if len(parent.nodes) == 1 and parent.type != "workspace":
+                self._flatten(parent)
+            return
+        layout = {
+            "h": "splith",
+            "horizontal": "splith",
+            "v": "splitv",
+            "vertical": "splitv",
+        }.get(mode)
+        if mode in ("t", "toggle"):
+            layout = "splitv" if parent.layout == "splith" else "splith"
+        if layout is None:
+            raise CommandError(f"Invalid split mode: {mode}")
+        if len(parent.nodes) == 1 and parent.layout in ("splith", "splitv"):
+            # Sway does not split singleton split containers.
+            parent.layout = layout
+            return
+        self._wrap(node, layout)
+
+    def _wrap(self, node: Node, layout: str) -> Node:
+        parent = node.parent
+        assert parent is not None
+        index = node.index()
+        container = Node(next(self._ids), "con", layout=layout, parent=parent)
+        container.fraction = node.fraction
+        parent.nodes[index] = container
+        node.parent = container
+        node.fraction = 1.0
+        container.nodes.append(node)
+        return container
+
+    def _flatten(self, container: Node) -> None:
+        while container.type == "con" and len(container.nodes) == 1:
+            (child,) = container.nodes
+            parent = container.parent
+            assert parent is not None
+            child.fraction = container.fraction
+            child.parent = parent
+            parent.nodes[container.index()] = child
+            container.parent = None
+            container = parent
+
+    def _layout(self, node: Node, layout: str) -> None:
+        if layout not in ("splith", "splitv", "stacking", "tabbed"):
+            raise CommandError(f"Unsupported layout: {layout}")
+        target = node if node.type == "workspace" else node.parent
+        assert target is not None
+        target.layout = layout
+
+    def _swap(self, node: Node, other: Node) -> None:
+        if node is other:
+            raise CommandError("Cannot swap a container with itself")
+        if node in list(other.walk()) or other in list(node.walk()):
+            raise CommandError("Cannot swap ancestor and descendant")
+        node_parent, other_parent = node.parent, other.parent
+        assert node_parent is not None and other_parent is not None
+        node_index, other_index = node.index(), other.index()
+        node.fraction, other.fraction = other.fraction, node.fraction
+        node_parent.nodes[node_index] = other
+        other_parent.nodes[other_index] = node
+        node.parent, other.parent = other_parent, node_parent
+
+    def _move(self, node: Node, args: list[str]) -> None:
+        if node.type in ("workspace", "root", "output") and args[:1] != ["workspace"]:
+            raise CommandError("Cannot move a workspace like this")
+        if args and args[0] in ("left", "right", "up", "down"):
+            self._move_in_direction(node, args[0])
+            return
+        if args[:1] == ["workspace"] and args[1:3] == ["to", "output"]:
+            self._move_workspace_to_output(node, args[3])
+            return
+        if args and args[0] in ("container", "window"):
+            args = args[1:]
+        if args[:1] == ["to"]:
+            args = args[1:]
+        if args[:1] == ["workspace"]:
+            name = " ".join(args[1:])
+            workspace = self._find_workspace(name) or self._create_workspace(name)
+            self._move_to_workspace(node, workspace)
+        elif args[:1] == ["mark"] and len(args) == 2:
+            target = next((n for n in self.root.walk() if args[1] in n.marks), None)
+            if target is None:
+                raise CommandError(f"Mark '{args[1]}' not found")
+            self._move_to_container(node, target)
+        else:
+            raise CommandError(f"Unsupported move: {' '.join(args)}")
+
+    def _move_workspace_to_output(self, node: Node, output_name: str) -> None:
+        workspace = node.workspace()
+        output = next((o for o in self.outputs if o.name == output_name), None)
+        if workspace is None or output is None:
+            raise CommandError("No such output")
+        assert workspace.parent is not None
+        workspace.parent.nodes.remove(workspace)
+        workspace.parent = output
+        output.nodes.append(workspace)
+
+    def _move_to_workspace(self, node: Node, workspace: Node) -> None:
+        old_workspace = node.workspace()
+        if old_workspace is workspace:
+            return
+        was_focused = self.focused is node or self.focused in list(node.walk())
+        if was_focused and old_workspace is not None:
+            # The focus stays on the old workspace, which keeps it alive.
+            self.focused = old_workspace
+        floating = node.is_floating
+        self._detach(node)
+        node.fraction = 1.0
+        if floating:
+            node.parent = workspace
+            workspace.floating_nodes.append(node)
+        else:
+            self._attach(node, workspace)
+        self._emit(
+            "window",
+            lambda: {"change": "move", "container": self._serialize_plain(node)},
+        )
+        if was_focused and old_workspace is not None:
+            replacement = self._focus_inactive_window(old_workspace)
+            self.focused = replacement or old_workspace
+            old_workspace.last_focused = replacement
+        if old_workspace is not None:
+            self._reap_workspace(old_workspace)
+
+    def _move_to_container(self, node: Node, target: Node) -> None:
+        if target is node or target in list(node.walk()):
+            raise CommandError("Cannot move a container into itself")
+        old_workspace = node.workspace()
+        self._detach(node)
+        if target.is_window:
+            assert target.parent is not None
+            self._attach(node, target.parent, target.index() + 1)
+        else:
+            self._attach(node, target)
+        self._emit(
+            "window",
+            lambda: {"change": "move", "container": self._serialize_plain(node)},
+        )
+        if old_workspace is not None:
+            self._reap_workspace(old_workspace)
+
+    def _move_in_direction(self, node: Node, direction: str) -> None:
+        horizontal = direction in ("left", "right")
+        offset = -1 if direction in ("left", "up") else 1
+
+        def is_parallel(layout: str) -> bool:
+            if horizontal:
+                return layout in ("splith", "tabbed")
+            return layout in ("splitv", "stacking")
+
+        # If the container is alone in a split container, move out of it.
+        parent = node.parent
+        assert parent is not None
+        if parent.type == "con" and len(parent.nodes) == 1:
+            self._flatten(parent)
+            return
+
+        current = node
+        while current.type != "workspace":
+            parent = current.parent
+            assert parent is not None
+            index = parent.nodes.index(current)
+            desired = index + offset
+            if is_parallel(parent.layout):
+                if 0 <= desired < len(parent.nodes):
+                    self._move_to_sibling(node, parent.nodes[desired], offset)
+                    break
+                if current is not node:
+                    # Reparent the container next to its ancestor.
+                    old_parent = node.parent
+                    assert old_parent is not None
+                    self._detach(node)
+                    self._attach(
+                        node,
+                        parent,
+                        parent.nodes.index(current) + (0 if offset < 0 else 1),
+                    )
+                    break
+            current = parent
+        else:
+            workspace = current
+            if not is_parallel(workspace.layout):
+                # Sway "rejiggers" the workspace: the existing children are
+                # wrapped and the workspace gets the orientation of the move.
+                self._detach(node)
+                if workspace.nodes:
+                    wrapper = Node(
+                        next(self._ids),
+                        "con",
+                        layout=workspace.layout,
+                        parent=workspace,
+                    )
+                    wrapper.nodes = workspace.nodes
+                    for child in wrapper.nodes:
+                        child.parent = wrapper
+                    workspace.nodes = [wrapper]
+                    self._flatten(wrapper)
+                workspace.layout = "splith" if horizontal else "splitv"
+                self._attach(node, workspace, 0 if offset < 0 else len(workspace.nodes))
+        self._emit(
+            "window",
+            lambda: {"change": "move", "container": self._serialize_plain(node)},
+        )
+
+    def _move_to_sibling(self, node: Node, destination: Node, offset: int) -> None:
+        """Move a container towards a neighbour, see Sway's
+        `container_move_to_container_from_direction`."""
+
+        old_parent = node.parent
+        assert old_parent is not None
+        if destination.is_window:
+            if destination.parent is old_parent:
+                index, destination_index = node.index(), destination.index()
+                old_parent.nodes[index], old_parent.nodes[destination_index] = (
+                    destination,
+                    node,
+                )
+            else:
+                self._detach(node)
+                assert destination.parent is not None
+                self._attach(
+                    node,
+                    destination.parent,
+                    destination.index() + (1 if offset < 0 else 0),
+                )
+            return
+        horizontal = old_parent.layout in ("splith", "tabbed")
+        parallel_layouts = (
+            ("splith", "tabbed") if horizontal else ("splitv", "stacking")
+        )
+        old_parent.nodes.remove(node)
+        node.parent = None
+        target = destination
+        while True:
+            if target.layout in parallel_layouts or not target.nodes:
+                self._attach(node, target, 0 if offset > 0 else len(target.nodes))
+                break
+            inactive = self._focus_inactive_window(target)
+            child = target.nodes[-1]
+            if inactive is not None:
+                child = next(c for c in target.nodes if inactive in list(c.walk()))
+            if child.is_window:
+                self._attach(node, target, child.index() + (1 if offset < 0 else 0))
+                break
+            target = child
+        self._normalize(old_parent)
+
+    def _resize(self, node: Node, args: list[str]) -> None:
+        if args[:1] in (["grow"], ["shrink"]) and len(args) >= 3:
+            if args[1] not in RESIZE_DIRECTIONS:
+                raise CommandError(f"Unsupported resize: {' '.join(args)}")
+            amount = _parse_px(args[2:]) * (1 if args[0] == "grow" else -1)
+            horizontal, edges = RESIZE_DIRECTIONS[args[1]]
+            self._resize_by(node, horizontal, amount, edges)
+            return
+        if args[:1] != ["set"]:
+            raise CommandError(f"Unsupported resize: {' '.join(args)}")
+        args = args[1:]
+        if len(args) >= 2 and args[0] in ("width", "height"):
+            self._resize_axis(node, args[0] == "width", _parse_px(args[1:]))
+        elif args and args[0] not in ("width", "height"):
+            self._resize_axis(node, True, _parse_px(args[:2]))
+            if len(args) > 2:
+                self._resize_axis(node, False, _parse_px(args[2:]))
+        else:
+            raise CommandError(f"Unsupported resize: {' '.join(args)}")
+
+    def _resize_axis(self, node: Node, horizontal: bool, size_px: int) -> None:
+        rect = self._rect_of(node)
+        current_px = rect["width"] if horizontal else rect["height"] + rect["deco"]
+        self._resize_by(node, horizontal, size_px - current_px, (-1, 1))
+
+    def _resize_by(
+        self, node: Node, horizontal: bool, amount: int, edges: tuple[int, ...]
+    ) -> None:
+        """Resize a node, taking the space from its neighbours at the edges.
+
+        The edges are -1 for the previous and 1 for the following neighbour.
+        Like Sway, the opposite neighbour is used if there is none at an edge.
+        """
+
+        layout = "splith" if horizontal else "splitv"
+        current = node
+        while current.parent is not None and current.parent.type != "output":
+            parent = current.parent
+            if parent.layout == layout and len(parent.nodes) > 1:
+                break
+            current = parent
+        else:
+            return
+        parent = current.parent
+        assert parent is not None
+        parent_rect = self._rect_of(parent)
+        parent_px = parent_rect["width"] if horizontal else parent_rect["height"]
+        total = sum(child.fraction for child in parent.nodes)
+        index = current.index()
+        previous = parent.nodes[index - 1] if index > 0 else None
+        following = parent.nodes[index + 1] if index + 1 < len(parent.nodes) else None
+        neighbours = [
+            n
+            for edge, n in ((-1, previous), (1, following))
+            if n is not None and edge in edges
+        ] or [n for n in (previous, following) if n is not None][:1]
+        amount_fraction = amount / parent_px * total
+        for neighbour in neighbours:
+            share = amount_fraction / len(neighbours)
+            if neighbour.fraction - share < MIN_SIZE_PX / parent_px * total:
+                return
+        if current.fraction + amount_fraction < MIN_SIZE_PX / parent_px * total:
+            return
+        current.fraction += amount_fraction
+        for neighbour in neighbours:
+            neighbour.fraction -= amount_fraction / len(neighbours)
+
+
+@dataclass
+class FakeNotification:
+    """A notification shown through `FakeNotificationBus`."""
+
+    id: int
+    app_name: str
+    replaces_id: int
+    summary: str
+    body: str
+    hints: dict
+    expire_timeout: int
+
+
+class FakeNotificationBus:
+    """A stand-in for the session bus with a notification server on it.
+
+    It accepts `EXTERNAL` authentication, answers `Hello` after sending a
+    `NameAcquired` signal like dbus-daemon does and records the `Notify` calls.
+    Other method calls get an error reply. `Notify` is answered after `delay`
+    seconds, like a slow notification server.
+    """
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self._directory = tempfile.TemporaryDirectory(prefix="fake-bus-")
+        self.socket_path = os.path.join(self._directory.name, "bus")
+        self.address = f"unix:path={self.socket_path},guid=0123456789abcdef"
+        self.notifications: list[FakeNotification] = []
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._serials = itertools.count(1)
+        self._server: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self) -> "FakeNotificationBus":
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        assert self._server is not None and self._thread is not None
+        # Wakes up the blocking accept().
+        self._server.shutdown(socket.SHUT_RDWR)
+        self._server.close()
+        self._thread.join()
+        self._directory.cleanup()
+
+    def _serve(self) -> None:
+        assert self._server is not None
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(client,), daemon=True).start()
+
+    def _handle(self, client: socket.socket) -> None:
+        from sway_out.dbus import (
+            ERROR,
+            FIELD_DESTINATION,
+            FIELD_ERROR_NAME,
+            FIELD_MEMBER,
+            FIELD_REPLY_SERIAL,
+            FIELD_SIGNATURE,
+            METHOD_RETURN,
+            SIGNAL,
+            Message,
+            get_message_length,
+        )
+
+        def reply(call: Message, message_type: int, fields: dict, body: list):
+            fields = {
+                FIELD_REPLY_SERIAL: call.serial,
+                FIELD_DESTINATION: ":1.1",
+            } | fields
+            message = Message(message_type, next(self._serials), fields, body)
+            client.sendall(message.encode())
+
+        with client:
+            data = b""
+            while b"\r\n" not in data:
+                chunk = client.recv(4096)
+                if not chunk:
+                    return
+                data += chunk
+            assert data.startswith(b"\0AUTH EXTERNAL ")
+            client.sendall(b"OK 0123456789abcdef\r\n")
+            while b"BEGIN\r\n" not in data:
+                chunk = client.recv(4096)
+                if not chunk:
+                    return
+                data += chunk
+            data = data.split(b"BEGIN\r\n", 1)[1]
+
+            while True:
+                length = get_message_length(data)
+                if length is None or len(data) < length:
+                    chunk = client.recv(65536)
+                    if not chunk:
+                        return
+                    data += chunk
+                    continue
+                call, data = Message.decode(data[:length]), data[length:]
+                member = call.fields.get(FIELD_MEMBER)
+                if member == "Hello":
+                    signal = Message(
+                        SIGNAL,
+                        next(self._serials),
+                        {FIELD_MEMBER: "NameAcquired", FIELD_SIGNATURE: "s"},
+                        [":1.1"],
+                    )
+                    client.sendall(signal.encode())
+                    reply(call, METHOD_RETURN, {FIELD_SIGNATURE: "s"}, [":1.1"])
+                elif member == "Notify":
+                    time.sleep(self.delay)
+                    app_name, replaces_id, _, summary, body, _, hints, expire = (
+                        call.body
+                    )
+                    notification_id = replaces_id or next(self._ids)
+                    self.notifications.append(
+                        FakeNotification(
+                            notification_id,
+                            app_name,
+                            replaces_id,
+                            summary,
+                            body,
+                            hints,
+                            expire,
+                        )
+                    )
+                    reply(
+                        call, METHOD_RETURN, {FIELD_SIGNATURE: "u"}, [notification_id]
+                    )
+                else:
+                    reply(
+                        call,
+                        ERROR,
+                        {
+                            FIELD_ERROR_NAME: "org.freedesktop.DBus.Error.UnknownMethod",
+                            FIELD_SIGNATURE: "s",
+                        },
+                        [f"Unknown method {member}"],
+                    )
+
+
+def _parse_px(args: list[str]) -> int:
+    if not args:
+        raise CommandError("Missing size")
+    value = args[0]
+    if value.endswith("px"):
+        value = value[:-2]
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError(f"Invalid size: {args[0]}")
+
+
+def _split_commands(payload: str) -> list[list[tuple[str | None, str]]]:
+    """Split a command string into commands and their criteria.
+
+    Commands separated by `;` have their own criteria, commands separated by
+    `,` share the criteria of the first command.
+    """
+
+    result: list[list[tuple[str | None, str]]] = []
+    for command in _split_outside_quotes(payload, ";"):
+        command = command.strip()
+        if not command:
+            continue
+        criteria = None
+        if command.startswith("["):
+            end = command.index("]")
+            criteria = command[1:end]
+            command = command[end + 1 :]
+        result.append(
+            [
+                (criteria, part.strip())
+                for part in _split_outside_quotes(command, ",")
+                if part.strip()
+            ]
+        )
+    return result
+
+
+def _split_outside_quotes(text: str, separator: str) -> list[str]:
+    parts = []
+    current = ""
+    quoted = False
+    bracketed = False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif char == "[" and not quoted:
+            bracketed = True
+        elif char == "]" and not quoted:
+            bracketed = False
+        if char == separator and not quoted and not bracketed:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return parts